@@ -0,0 +1,313 @@
+"""Offline bulk design: every structure in a directory or glob, no HTTP.
+
+Structures are validated in this process and designed on a warm worker
+pool. Each target's designs are written to ``<out>/<name>.fa`` as soon as
+they finish, and a line is appended to ``<out>/summary.jsonl``. Targets
+whose FASTA already exists are skipped, so an interrupted run resumes
+where it stopped; failed targets are retried. The summary keeps one line
+per target, its latest outcome. Only a few jobs per worker are in flight at a time, so
+memory doesn't grow with the number of inputs.
+
+    python -m app.bulk structures/ 'more/**/*.cif' --out designs/ \\
+        [--chains A B] [--num-sequences 10] [--workers 4]
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from app.config import (
+    DEFAULT_NUM_SEQUENCES,
+    DEFAULT_SAMPLING_TEMP,
+    MIN_CA_ATOMS,
+    MODEL_WEIGHTS_FILE,
+    WORKER_POOL_SIZE,
+)
+from app.proteinmpnn.parser import (
+    ParsedFasta,
+    parse_fasta,
+    read_designed_chains,
+    write_fasta,
+)
+from app.proteinmpnn.pool import WorkerPool
+from app.proteinmpnn.tuning import check_memory_budget
+from app.structure import Backbone, crop_context, num_positions
+from app.structure.formats import FORMAT_SUFFIXES
+from app.validation import PDBValidationError, validate_pdb, validate_structure
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FILE = "summary.jsonl"
+# Jobs queued per worker; enough to keep workers busy while results are written
+JOBS_PER_WORKER = 2
+
+
+class Target(NamedTuple):
+    name: str
+    path: Path
+
+
+def find_targets(patterns: Iterable[str]) -> list[Target]:
+    """Structure files under each directory or matching each glob, sorted.
+
+    Output files are named after the input's stem, so two inputs with the
+    same stem are an error.
+    """
+    paths: set[Path] = set()
+    for pattern in patterns:
+        if Path(pattern).is_dir():
+            matches = (p for p in Path(pattern).rglob("*") if p.is_file())
+        else:
+            matches = (Path(p) for p in glob.iglob(pattern, recursive=True))
+        paths.update(p for p in matches if _structure_suffix(p) in FORMAT_SUFFIXES)
+
+    targets: dict[str, Target] = {}
+    for path in sorted(paths):
+        name = path.name.removesuffix(".gz").rsplit(".", 1)[0]
+        if name in targets:
+            raise ValueError(f"Two inputs named {name!r}: {targets[name].path} and {path}")
+        targets[name] = Target(name, path)
+    return list(targets.values())
+
+
+def _structure_suffix(path: Path) -> str:
+    return Path(path.name.lower().removesuffix(".gz")).suffix
+
+
+def _validate(path: Path, chains: list[str]) -> Backbone:
+    """``validate_pdb``, decompressing gzipped files first as uploads are."""
+    if not path.name.lower().endswith(".gz"):
+        return validate_pdb(path, chains)
+    try:
+        data = gzip.decompress(path.read_bytes())
+    except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+        raise PDBValidationError(f"Corrupt gzip file: {e}") from e
+    return validate_structure(data, path.name[: -len(".gz")], chains)
+
+
+def load_target(path: Path, chains: list[str] | None) -> tuple[Backbone, list[str]]:
+    """Validate a structure as ``/design`` does; ``chains=None`` designs every
+    chain with enough resolved residues."""
+    if chains is None:
+        backbone = _validate(path, [])
+        chains = [c for c, chain in backbone.chains.items() if chain.num_ca >= MIN_CA_ATOMS]
+        if not chains:
+            raise PDBValidationError(f"No chain has {MIN_CA_ATOMS} or more CA atoms")
+    else:
+        backbone = _validate(path, chains)
+    backbone = crop_context(backbone, chains)
+    check_memory_budget(num_positions(backbone))
+    return backbone, chains
+
+
+def summary_row(
+    target: Target, chains: list[str], result: ParsedFasta, seconds: float | None
+) -> dict:
+    scores = result.scores or []
+    recoveries = result.seq_recoveries or []
+    return {
+        "target": target.name,
+        "path": str(target.path),
+        "status": "ok",
+        "chains": chains,
+        "num_sequences": len(result.designed_sequences),
+        "fasta": f"{target.name}.fa",
+        "best_score": min(scores) if scores else None,
+        "mean_score": sum(scores) / len(scores) if scores else None,
+        "mean_seq_recovery": sum(recoveries) / len(recoveries) if recoveries else None,
+        "seconds": seconds,
+    }
+
+
+class Progress:
+    """One status line per finished target, with the overall rate."""
+
+    def __init__(self, total: int, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start = time.monotonic()
+
+    def update(self, name: str, status: str) -> None:
+        self.done += 1
+        self.failed += status.startswith("failed")
+        self.skipped += status == "skipped"
+        elapsed = time.monotonic() - self.start
+        rate = (self.done - self.skipped) / elapsed if elapsed else 0.0
+        print(
+            f"[{self.done}/{self.total}] {name}: {status} ({rate:.2f} targets/s)",
+            file=self.stream,
+            flush=True,
+        )
+
+
+def _submit(pool: WorkerPool, **kwargs) -> Future:
+    """``pool.submit``, waiting out the moment a crashed worker is replaced."""
+    while True:
+        try:
+            return pool.submit(**kwargs)
+        except RuntimeError:
+            if pool.load_failed_count == pool.size:
+                raise
+            time.sleep(0.5)
+
+
+def _compact_summary(summary_path: Path, out_dir: Path, rerun: set[str]) -> set[str]:
+    """Rewrite the summary with one row per target, dropping the rows of
+    targets in ``rerun`` that will be designed again (failed, or FASTA
+    gone). Returns the targets still summarized."""
+    if not summary_path.exists():
+        return set()
+    rows: dict[str, dict] = {}
+    with open(summary_path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                rows[row["target"]] = row
+    kept = [
+        row for name, row in rows.items()
+        if name not in rerun
+        or (row["status"] == "ok" and (out_dir / row["fasta"]).exists())
+    ]
+    partial = summary_path.with_suffix(".jsonl.tmp")
+    partial.write_text("".join(json.dumps(row) + "\n" for row in kept))
+    os.replace(partial, summary_path)
+    return {row["target"] for row in kept}
+
+
+def run(
+    targets: list[Target],
+    out_dir: Path,
+    pool: WorkerPool,
+    chains: list[str] | None = None,
+    num_sequences: int = DEFAULT_NUM_SEQUENCES,
+    sampling_temp: float = DEFAULT_SAMPLING_TEMP,
+    progress: Progress | None = None,
+) -> Progress:
+    """Design every target not already in ``out_dir``; returns the final counts."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    progress = progress or Progress(len(targets))
+    summary_path = out_dir / SUMMARY_FILE
+    summarized = _compact_summary(summary_path, out_dir, {t.name for t in targets})
+
+    in_flight: dict[Future, tuple[Target, list[str], float]] = {}
+    with open(summary_path, "a") as summary:
+
+        def record(row: dict) -> None:
+            summary.write(json.dumps(row) + "\n")
+            summary.flush()
+
+        def finish(future: Future) -> None:
+            target, target_chains, started = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                record({"target": target.name, "path": str(target.path),
+                        "status": "failed", "error": f"{type(e).__name__}: {e}"})
+                progress.update(target.name, f"failed ({e})")
+                return
+            # Written under a temporary name so a half-written file never
+            # counts as done on resume
+            fasta = out_dir / f"{target.name}.fa"
+            partial = fasta.with_suffix(".fa.tmp")
+            write_fasta(partial, target.name, result, target_chains, sampling_temp)
+            os.replace(partial, fasta)
+            record(summary_row(target, target_chains, result, time.monotonic() - started))
+            progress.update(target.name, f"ok ({len(result.designed_sequences)} sequences)")
+
+        for target in targets:
+            fasta = out_dir / f"{target.name}.fa"
+            if fasta.exists():
+                if target.name not in summarized:
+                    # Interrupted after the FASTA was written
+                    fasta_chains = read_designed_chains(fasta) or chains or []
+                    record(summary_row(target, fasta_chains, parse_fasta(fasta), None))
+                progress.update(target.name, "skipped")
+                continue
+
+            try:
+                backbone, target_chains = load_target(target.path, chains)
+            except Exception as e:
+                # One unreadable target (or an OSError) fails only itself
+                error = (
+                    str(e) if isinstance(e, PDBValidationError)
+                    else f"{type(e).__name__}: {e}"
+                )
+                record({"target": target.name, "path": str(target.path),
+                        "status": "failed", "error": error})
+                progress.update(target.name, f"failed ({e})")
+                continue
+
+            while len(in_flight) >= JOBS_PER_WORKER * pool.size:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future)
+            future = _submit(
+                pool,
+                backbone=backbone,
+                chains=target_chains,
+                num_sequences=num_sequences,
+                sampling_temp=sampling_temp,
+            )
+            in_flight[future] = (target, target_chains, time.monotonic())
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish(future)
+    return progress
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="directories or glob patterns")
+    parser.add_argument("--out", type=Path, required=True, help="output directory")
+    parser.add_argument("--chains", nargs="*", help="chains to design (default: all)")
+    parser.add_argument("--num-sequences", type=int, default=DEFAULT_NUM_SEQUENCES)
+    parser.add_argument("--sampling-temp", type=float, default=DEFAULT_SAMPLING_TEMP)
+    parser.add_argument("--workers", type=int, default=WORKER_POOL_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+
+    try:
+        targets = find_targets(args.inputs)
+    except ValueError as e:
+        parser.error(str(e))
+    if not targets:
+        parser.error("no structure files found")
+
+    pool = WorkerPool(size=args.workers, weights_path=MODEL_WEIGHTS_FILE)
+    pool.start()
+    try:
+        while pool.warm_count + pool.load_failed_count < pool.size:
+            time.sleep(0.1)
+        if not pool.warm_count:
+            print("No worker could load the model", file=sys.stderr)
+            return 2
+        progress = run(
+            targets, args.out, pool, args.chains, args.num_sequences, args.sampling_temp
+        )
+    finally:
+        pool.shutdown()
+
+    print(
+        f"{progress.done - progress.skipped - progress.failed} designed, "
+        f"{progress.skipped} skipped, {progress.failed} failed -> {args.out}",
+        file=sys.stderr,
+    )
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
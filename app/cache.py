@@ -0,0 +1,278 @@
+"""Content-addressed caches of design results and featurized structures.
+
+ProteinMPNN runs with a fixed seed, so the same structure, chains and
+sampling parameters always produce the same sequences on the same engine
+settings. Results are keyed by a hash of the normalized coordinate records
+plus those parameters and settings.
+Featurized structures are keyed by structure and chains only, so reruns
+with another temperature or sequence count skip featurization.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from app.config import (
+    CACHE_DIR,
+    CACHE_DISK_MAX_MB,
+    CACHE_MAX_ENTRIES,
+    CONTEXT_RADIUS,
+    DESIGN_SEED,
+    FEATURE_CACHE_MB,
+    INFERENCE_COMPILE,
+    INFERENCE_PRECISION,
+    LARGE_STRUCTURE_RESIDUES,
+    MAX_SAMPLE_BATCH,
+    MODEL_WEIGHTS_FILE,
+    SAMPLE_BATCH_MEMORY_MB,
+)
+
+_COORD_RECORDS = (b"ATOM  ", b"HETATM")
+
+
+def structure_digest(data: bytes, fmt: str = "pdb") -> str:
+    """Hash the parts of a PDB that ProteinMPNN actually reads.
+
+    Only ATOM/HETATM records count, and within them only record type, atom
+    name, altloc, residue, chain and coordinates. Serial numbers, occupancy,
+    B-factors, headers and remarks don't change the design, so re-exported
+    copies of the same structure share a key. mmCIF and BinaryCIF files are
+    hashed whole.
+    """
+    if fmt != "pdb":
+        return hashlib.sha256(data).hexdigest()
+    h = hashlib.sha256()
+    for line in data.splitlines():
+        if line.startswith(_COORD_RECORDS):
+            h.update(line[:6])
+            h.update(line[12:54].rstrip())
+            h.update(b"\n")
+    return h.hexdigest()
+
+
+def design_cache_key(
+    data: bytes,
+    chains: list[str],
+    num_sequences: int,
+    sampling_temp: float,
+    fmt: str = "pdb",
+    include_log_probs: bool = False,
+    constraints: dict | None = None,
+) -> str:
+    return digest_cache_key(
+        structure_digest(data, fmt),
+        chains,
+        num_sequences,
+        sampling_temp,
+        include_log_probs,
+        constraints,
+    )
+
+
+def digest_cache_key(
+    digest: str,
+    chains: list[str],
+    num_sequences: int,
+    sampling_temp: float,
+    include_log_probs: bool = False,
+    constraints: dict | None = None,
+) -> str:
+    """``design_cache_key`` for a structure whose ``structure_digest`` is known."""
+    params = json.dumps(
+        {
+            "chains": chains,
+            "num_sequences": num_sequences,
+            "sampling_temp": sampling_temp,
+            "include_log_probs": include_log_probs,
+            "constraints": constraints,
+            "seed": DESIGN_SEED,
+            "model": MODEL_WEIGHTS_FILE.name,
+            # Large structures are cropped before design
+            "crop": [LARGE_STRUCTURE_RESIDUES, CONTEXT_RADIUS],
+            # Engine settings that change the sampled sequences; the disk
+            # tier outlives a restart with different ones
+            "engine": {
+                "precision": INFERENCE_PRECISION,
+                "compile": INFERENCE_COMPILE,
+                "sample_batch_memory_mb": SAMPLE_BATCH_MEMORY_MB,
+                "max_sample_batch": MAX_SAMPLE_BATCH,
+            },
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(f"{digest}:{params}".encode()).hexdigest()
+
+
+class DesignCache:
+    """Two-tier cache: an in-memory LRU plus an optional on-disk tier.
+
+    Values are serialized responses (strings). The disk tier stores one file
+    per key and evicts least-recently-used files once ``disk_max_mb`` is
+    exceeded; a disk hit is promoted back into memory.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        disk_dir: Path | None = CACHE_DIR,
+        disk_max_mb: float = CACHE_DISK_MAX_MB,
+    ):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir is not None:
+            disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, value)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._memory_put(key, value)
+        if self.disk_dir is not None:
+            self._disk_put(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+                "memory_entries": len(self._memory),
+                "disk_enabled": self.disk_dir is not None,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+        if self.disk_dir is not None:
+            for path in self.disk_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def _memory_put(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key: str) -> str | None:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            value = path.read_text()
+            os.utime(path)  # mtime doubles as last-access time for eviction
+        except FileNotFoundError:
+            # Evicted by another request, possibly between the two calls
+            return None
+        return value
+
+    def _disk_put(self, key: str, value: str) -> None:
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_text(value)
+        tmp.replace(path)
+        self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        files = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+class FeatureCache:
+    """In-memory LRU bounded by total size, for per-worker featurized inputs.
+
+    Callers pass each value's size in bytes; values larger than the whole
+    budget are not stored.
+    """
+
+    def __init__(self, max_mb: float = FEATURE_CACHE_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: OrderedDict[Any, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+
+    def discard(self, key) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
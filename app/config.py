@@ -1,4 +1,6 @@
 """Storing hard-coded vals and paths"""
+import os
+import tempfile
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -14,7 +16,98 @@ MODEL_WEIGHTS_EXPECTED_SIZE = 6681301
 
 # Runtime defaults
 DEFAULT_NUM_SEQUENCES = 5
-MAX_SEQUENCES = 10
+MAX_SEQUENCES = int(os.environ.get("MAX_SEQUENCES", "500"))
 MAX_PDB_SIZE_MB = 10
+UPLOAD_CHUNK_BYTES = 64 * 1024
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024  # multipart headers + other form fields
+# Uploads are held in memory up to this size, then spilled to a temp file
+UPLOAD_SPILL_MB = float(os.environ.get("UPLOAD_SPILL_MB", "4"))
+# Subprocess inputs and outputs; tmpfs when available, so they never hit disk
+SCRATCH_DIR = Path(
+    os.environ.get("SCRATCH_DIR")
+    or ("/dev/shm" if os.access("/dev/shm", os.W_OK) else tempfile.gettempdir())
+)
+# Scratch entries of a live PID older than this are swept anyway (PID reused)
+SCRATCH_MAX_AGE_SECONDS = 24 * 3600
 MIN_CA_ATOMS = 10  # dna backbone 
-REQUEST_TIMEOUT_SECONDS = 120
\ No newline at end of file
+REQUEST_TIMEOUT_SECONDS = 120
+VALIDATION_PARSER = os.environ.get("VALIDATION_PARSER", "fast")  # "fast" or "biopython"
+
+# Worker pool (in-process ProteinMPNN, weights loaded once per worker)
+CPU_COUNT = os.cpu_count() or 1
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", str(CPU_COUNT)))
+DESIGN_SEED = 42
+# "forkserver" forks workers from a server that has already imported torch,
+# so its pages are shared copy-on-write; "spawn" starts each from scratch
+WORKER_START_METHOD = os.environ.get("WORKER_START_METHOD", "forkserver")
+WORKER_CHECK_INTERVAL_SECONDS = 1.0  # how often dead workers are looked for
+# Designed once on every worker at startup, before /ready reports ready
+WARMUP_PDB = Path(os.environ.get("WARMUP_PDB", str(TEST_PDBS_DIR / "1UBQ.pdb")))
+WARMUP_CHAINS = ["A"]
+
+# CPU execution profile for in-process inference (see app/proteinmpnn/tuning.py)
+TORCH_THREADS = int(os.environ.get("TORCH_THREADS", "0"))  # per worker; 0 = CPUs / workers
+TORCH_INTEROP_THREADS = int(os.environ.get("TORCH_INTEROP_THREADS", "1"))
+INFERENCE_PRECISION = os.environ.get("INFERENCE_PRECISION", "fp32")  # "fp32", "bf16" or "int8"
+INFERENCE_COMPILE = os.environ.get("INFERENCE_COMPILE", "none")  # "none" or "compile"
+# Samples decoded together; sized from residue count against this budget
+SAMPLE_BATCH_MEMORY_MB = int(os.environ.get("SAMPLE_BATCH_MEMORY_MB", "1024"))
+MAX_SAMPLE_BATCH = 32
+# Featurized structures kept by each warm worker; 0 disables
+FEATURE_CACHE_MB = int(os.environ.get("FEATURE_CACHE_MB", "256"))
+# Large-structure mode: above this many residue positions, fixed chains are
+# cropped to CONTEXT_RADIUS (Å) around the designed chains
+LARGE_STRUCTURE_RESIDUES = int(os.environ.get("LARGE_STRUCTURE_RESIDUES", "3000"))
+CONTEXT_RADIUS = float(os.environ.get("CONTEXT_RADIUS", "25"))
+# Estimated peak inference memory a single design may need
+DESIGN_MEMORY_BUDGET_MB = int(os.environ.get("DESIGN_MEMORY_BUDGET_MB", "8192"))
+
+# Request concurrency (blocking work runs on bounded executors). Design
+# requests in flight (waiting for a scheduler slot or running) before 429s;
+# above the worker count, which is the scheduler's slot count, so the
+# scheduler has a queue to order shortest first
+MAX_CONCURRENT_DESIGNS = int(
+    os.environ.get("MAX_CONCURRENT_DESIGNS", str(2 * WORKER_POOL_SIZE))
+)
+VALIDATION_THREADS = 4
+BUSY_RETRY_AFTER_SECONDS = 10
+# MessagePack responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+CANCEL_POLL_SECONDS = 0.5
+# Cost-based scheduling of designs onto the engine (see app/scheduler.py)
+CLIENT_MAX_RUNNING = int(os.environ.get("CLIENT_MAX_RUNNING", "2"))  # per client, at once
+# Starting design time estimate per slot: a fixed overhead plus one decoding
+# pass over the structure's positions per sample batch; both are refit from
+# finished designs
+SCHEDULER_OVERHEAD_SECONDS = float(os.environ.get("SCHEDULER_OVERHEAD_SECONDS", "1"))
+SCHEDULER_RESIDUES_PER_SECOND = float(os.environ.get("SCHEDULER_RESIDUES_PER_SECOND", "300"))
+# Finished designs the estimate needs before a too-slow design is refused
+# outright (400); until then it is only deferred (429)
+SCHEDULER_MIN_OBSERVATIONS = int(os.environ.get("SCHEDULER_MIN_OBSERVATIONS", "5"))
+CLIENT_ID_HEADER = "X-Client-ID"
+
+# Async job API
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", str(WORKER_POOL_SIZE)))
+JOB_STORE = os.environ.get("JOB_STORE", "memory")  # "memory" or a SQLite file path
+# Finished jobs, and their results, are dropped this long after finishing
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# The in-memory store also keeps at most this many finished jobs
+JOB_MAX_FINISHED = int(os.environ.get("JOB_MAX_FINISHED", "1000"))
+JOB_TIMEOUT_SECONDS = 3600
+
+# Batch design
+BATCH_MAX_ITEMS = 500
+BATCH_MAX_RESIDUES = 4000  # padded residues per ProteinMPNN forward pass
+BATCH_TIMEOUT_SECONDS = 1800
+BATCH_ARCHIVE_MAX_MB = 512
+
+# Result cache
+DEFAULT_SAMPLING_TEMP = 0.1
+MAX_SAMPLING_TEMP = 1.0
+CACHE_MAX_ENTRIES = 1024
+CACHE_DIR = Path(os.environ["CACHE_DIR"]) if os.environ.get("CACHE_DIR") else None
+CACHE_DISK_MAX_MB = float(os.environ.get("CACHE_DISK_MAX_MB", "512"))
+
+# Registered structures (POST /structures)
+STRUCTURE_STORE_DIR = Path(os.environ.get("STRUCTURE_STORE_DIR", str(PROJECT_ROOT / "structures")))
+STRUCTURE_STORE_HOT_MB = float(os.environ.get("STRUCTURE_STORE_HOT_MB", "256"))  # mapped backbones kept
@@ -1,26 +1,266 @@
 """FastAPI dependencies for file upload handling."""
 
+import io
 import json
-import tempfile
-import uuid
-from pathlib import Path
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
 
 from fastapi import UploadFile
 
+from app.config import (
+    BATCH_MAX_ITEMS,
+    DEFAULT_SAMPLING_TEMP,
+    MAX_PDB_SIZE_MB,
+    UPLOAD_CHUNK_BYTES,
+    UPLOAD_SPILL_MB,
+)
 from app.schemas import DesignParams
+from app.scratch import temp_path
+from app.structure import FORMAT_LABELS, FORMAT_SUFFIXES, structure_format
+from app.validation import PDBValidationError
+from app.validation.pdb import ATOM_RECORD_MARKERS
 
+STRUCTURE_SUFFIXES = tuple(FORMAT_SUFFIXES)
 
-async def save_upload(upload: UploadFile) -> Path:
-    """Save an UploadFile to a uniquely-named temp file. Caller must delete."""
-    suffix = Path(upload.filename or "upload.pdb").suffix or ".pdb"
-    tmp = Path(tempfile.gettempdir()) / f"mpnn_{uuid.uuid4().hex}{suffix}"
-    content = await upload.read()
-    tmp.write_bytes(content)
-    return tmp
+_GZIP_MAGIC = b"\x1f\x8b"
 
 
-def parse_design_params(chains: str, num_sequences: int) -> DesignParams:
-    """Parse and validate the chains JSON string + num_sequences."""
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds its size limit. Maps to HTTP 413"""
+
+
+class SpooledUpload:
+    """An uploaded file held in memory, or in a temp file if it was large.
+
+    ``name`` keeps the structure suffix (``.gz`` removed) so the format can
+    be detected. ``path`` is None unless the upload spilled to disk. Call
+    ``close`` when done to remove a spilled file.
+    """
+
+    def __init__(self, name: str, data: bytes | None = None, path: Path | None = None):
+        self.name = name
+        self.data = data
+        self.path = path
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.name).stem
+
+    def read_bytes(self) -> bytes:
+        return self.data if self.path is None else self.path.read_bytes()
+
+    def open(self):
+        """A binary file object over the contents."""
+        return io.BytesIO(self.data) if self.path is None else open(self.path, "rb")
+
+    def close(self) -> None:
+        if self.path is not None:
+            cleanup(self.path)
+
+
+class _Spool:
+    """Collects chunks in memory, moving them to a temp file once more than
+    ``spill_bytes`` have been written."""
+
+    def __init__(self, suffix: str, spill_bytes: int):
+        self.suffix = suffix
+        self.spill_bytes = spill_bytes
+        self.buffer: io.BytesIO | None = io.BytesIO()
+        self.path: Path | None = None
+        self.file = None
+
+    def write(self, chunk: bytes) -> None:
+        if self.buffer is not None and self.buffer.tell() + len(chunk) > self.spill_bytes:
+            self.path = temp_path(self.suffix)
+            self.file = open(self.path, "wb")
+            self.file.write(self.buffer.getbuffer())
+            self.buffer = None
+        (self.buffer or self.file).write(chunk)
+
+    def finish(self, name: str) -> SpooledUpload:
+        if self.file is None:
+            return SpooledUpload(name, data=self.buffer.getvalue())
+        self.file.close()
+        return SpooledUpload(name, path=self.path)
+
+    def discard(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            cleanup(self.path)
+
+
+async def save_upload(
+    upload: UploadFile,
+    max_size_mb: float | None = MAX_PDB_SIZE_MB,
+    require_atom_records: bool = False,
+    spill_mb: float = UPLOAD_SPILL_MB,
+) -> SpooledUpload:
+    """Read an UploadFile into memory, spilling to a temp file past ``spill_mb``.
+
+    The upload is copied in ``UPLOAD_CHUNK_BYTES`` chunks, so memory stays
+    bounded by ``spill_mb`` whatever the client sends, and typical
+    structures never touch disk. Gzip uploads (``.pdb.gz``, ``.cif.gz``)
+    are decompressed on the fly, and ``max_size_mb`` applies to the
+    decompressed size so a small archive can't expand past the limit.
+    Caller must ``close`` the result.
+
+    Raises:
+        UploadTooLargeError: As soon as more than ``max_size_mb`` is written.
+        PDBValidationError: If ``require_atom_records`` and the upload has
+            no ATOM records.
+    """
+    name = upload.filename or "upload.pdb"
+    if name.lower().endswith(".gz"):
+        name = name[:-3]
+    if not Path(name).suffix:
+        name += ".pdb"
+    spool = _Spool(Path(name).suffix, int(spill_mb * 1024 * 1024))
+    max_bytes = None if max_size_mb is None else int(max_size_mb * 1024 * 1024)
+
+    fmt = structure_format(name)
+    # BinaryCIF has no text marker; validation checks it after decoding
+    marker = ATOM_RECORD_MARKERS.get(fmt)
+    written = 0
+    seen_atom = not require_atom_records or marker is None
+    if marker is not None:
+        marker = b"\n" + marker
+    tail = b"\n"  # a file that starts with ATOM counts as a match
+    decompressor = None
+
+    def write(chunk: bytes) -> None:
+        nonlocal written, seen_atom, tail
+        written += len(chunk)
+        if max_bytes is not None and written > max_bytes:
+            raise UploadTooLargeError(f"PDB file exceeds {max_size_mb} MB limit")
+        if not seen_atom:
+            # Carry a few bytes over so a record split across chunks is found
+            window = tail + chunk
+            seen_atom = marker in window
+            tail = window[-(len(marker) - 1):]
+        spool.write(chunk)
+
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+            if decompressor is None and written == 0 and chunk.startswith(_GZIP_MAGIC):
+                decompressor = zlib.decompressobj(wbits=31)
+            if decompressor is not None:
+                chunk = _inflate(decompressor, chunk, max_bytes, written)
+            write(chunk)
+        if decompressor is not None:
+            write(decompressor.flush())
+            if not decompressor.eof:
+                raise zlib.error("truncated stream")
+    except zlib.error as e:
+        spool.discard()
+        raise PDBValidationError(f"Corrupt gzip upload: {e}") from e
+    except Exception:
+        spool.discard()
+        raise
+
+    if not seen_atom:
+        spool.discard()
+        raise PDBValidationError(f"{FORMAT_LABELS[fmt]} file contains no ATOM records")
+    return spool.finish(name)
+
+
+def _inflate(decompressor, chunk: bytes, max_bytes: int | None, written: int) -> bytes:
+    """Decompress one chunk, never producing more than the remaining budget."""
+    if max_bytes is None:
+        return decompressor.decompress(chunk)
+    # One byte over the budget is enough to trip the size check
+    return decompressor.decompress(chunk, max_bytes - written + 1)
+
+
+def extract_archive(
+    archive: SpooledUpload,
+    max_items: int = BATCH_MAX_ITEMS,
+    spill_mb: float = UPLOAD_SPILL_MB,
+) -> list[tuple[str, SpooledUpload]]:
+    """Extract structure files from a zip or tar(.gz) archive.
+
+    Members are read into memory like uploads, spilling past ``spill_mb``.
+    Member paths are never used on disk, so archive entries can't escape the
+    temp dir. Returns ``(member basename, upload)`` pairs; caller must
+    close the uploads.
+
+    Raises:
+        ValueError: If the archive is unreadable or holds too many structures.
+    """
+    extracted: list[tuple[str, SpooledUpload]] = []
+
+    def add(name: str, open_member) -> None:
+        basename = PurePosixPath(name).name
+        if not basename.lower().endswith(STRUCTURE_SUFFIXES):
+            return
+        if len(extracted) >= max_items:
+            raise ValueError(f"Archive holds more than {max_items} structures")
+        spool = _Spool(PurePosixPath(basename).suffix, int(spill_mb * 1024 * 1024))
+        try:
+            with open_member() as src:
+                while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                    spool.write(chunk)
+        except BaseException:
+            spool.discard()
+            raise
+        extracted.append((basename, spool.finish(basename)))
+
+    try:
+        with archive.open() as f:
+            if zipfile.is_zipfile(f):
+                with zipfile.ZipFile(f) as zf:
+                    for info in zf.infolist():
+                        if not info.is_dir():
+                            add(info.filename, lambda info=info: zf.open(info))
+            else:
+                f.seek(0)  # is_zipfile leaves it at the end record
+                if not tarfile.is_tarfile(f):
+                    raise ValueError("Archive must be a zip or tar file")
+                with tarfile.open(fileobj=f) as tf:
+                    for member in tf:
+                        if member.isfile():
+                            add(member.name, lambda m=member: tf.extractfile(m))
+    except (zipfile.BadZipFile, tarfile.TarError, ValueError) as e:
+        for _, upload in extracted:
+            upload.close()
+        if isinstance(e, ValueError):
+            raise
+        raise ValueError(f"Unreadable archive: {e}") from e
+    return extracted
+
+
+def parse_batch_chains(chains: str, names: list[str]) -> dict[str, list[str]]:
+    """Parse batch chains: one JSON array for every entry, or an object
+    mapping entry filename to its own array.
+    """
+    try:
+        parsed = json.loads(chains)
+    except (json.JSONDecodeError, TypeError) as e:
+        raise ValueError(f"Invalid chains JSON: {e}") from e
+
+    def check(value) -> list[str]:
+        if not isinstance(value, list) or not all(isinstance(c, str) for c in value):
+            raise ValueError("chains must be a JSON array of strings")
+        return value
+
+    if isinstance(parsed, dict):
+        missing = sorted(set(names) - set(parsed))
+        if missing:
+            raise ValueError(f"No chains given for: {missing}")
+        return {name: check(parsed[name]) for name in names}
+    return {name: check(parsed) for name in names}
+
+
+def parse_design_params(
+    chains: str,
+    num_sequences: int,
+    sampling_temp: float = DEFAULT_SAMPLING_TEMP,
+    include_log_probs: bool = False,
+    constraints: str | None = None,
+) -> DesignParams:
+    """Parse and validate the chains and constraints JSON strings and the
+    other design fields."""
     try:
         chains_list = json.loads(chains)
     except (json.JSONDecodeError, TypeError) as e:
@@ -31,7 +271,20 @@ def parse_design_params(chains: str, num_sequences: int) -> DesignParams:
     ):
         raise ValueError("chains must be a JSON array of strings")
 
-    return DesignParams(chains=chains_list, num_sequences=num_sequences)
+    constraints_dict = None
+    if constraints:
+        try:
+            constraints_dict = json.loads(constraints)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid constraints JSON: {e}") from e
+
+    return DesignParams(
+        chains=chains_list,
+        num_sequences=num_sequences,
+        sampling_temp=sampling_temp,
+        include_log_probs=include_log_probs,
+        constraints=constraints_dict,
+    )
 
 
 def cleanup(path: Path) -> None:
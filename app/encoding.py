@@ -0,0 +1,144 @@
+"""Compact MessagePack encoding of design responses.
+
+Large libraries repeat a full-length string per sequence in JSON. Here the
+designed sequences become a uint8 matrix of residue indices into
+``ALPHABET`` (one row per sequence, chain separators dropped), or just the
+mutations relative to the native sequence. Either is built in one
+vectorized pass over all sequences. Numeric arrays are raw little-endian
+bytes; everything else keeps the JSON field names.
+
+    {"format": 1, "status", "metadata", "native_sequence", "alphabet",
+     "chain_lengths": [...], "sequences": {...},
+     "scores", "global_scores", "seq_recoveries", "log_probs"}
+
+``sequences`` is ``{"encoding": "matrix", "shape": [N, L], "data"}`` or
+``{"encoding": "mutations", "count": N, "offsets", "positions",
+"residues"}``, where sequence ``i``'s mutations are entries
+``offsets[i]:offsets[i + 1]`` (uint32) of ``positions`` (uint32) and
+``residues`` (uint8). ``decode_design`` turns either back into the JSON
+response shape.
+"""
+
+import base64
+
+import numpy as np
+
+from app.proteinmpnn.parser import ALPHABET
+from app.schemas import DesignResponse
+
+try:
+    import msgpack
+except ImportError:  # the compact format is optional; JSON always works
+    msgpack = None
+
+FORMAT_VERSION = 1
+MEDIA_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+SEQUENCE_ENCODINGS = ("matrix", "mutations")
+
+# ASCII byte -> residue index; 255 for anything outside the alphabet
+_INDEX = np.full(256, 255, dtype=np.uint8)
+_INDEX[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET))
+_LETTERS = np.frombuffer(ALPHABET.encode(), dtype="S1")
+
+
+def negotiate(accept: str) -> str | None:
+    """Sequence encoding requested by an ``Accept`` header, or None for JSON.
+
+    ``Accept: application/x-msgpack`` selects the matrix encoding; add
+    ``; sequences=mutations`` for mutations.
+    """
+    if msgpack is None:
+        return None
+    for part in accept.split(","):
+        media_type, *params = (p.strip() for p in part.split(";"))
+        if media_type.lower() not in MEDIA_TYPES:
+            continue
+        options = dict(p.split("=", 1) for p in params if "=" in p)
+        if options.get("q", "1").strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        encoding = options.get("sequences", "matrix").strip('"')
+        return encoding if encoding in SEQUENCE_ENCODINGS else "matrix"
+    return None
+
+
+def residue_matrix(sequences: list[str]) -> np.ndarray:
+    """(N, L) residue indices of equally long sequences, '/' removed.
+
+    Raises:
+        ValueError: If the sequences differ in length or hold a letter
+            outside ``ALPHABET``.
+    """
+    if not sequences:
+        return np.zeros((0, 0), dtype=np.uint8)
+    joined = "".join(sequences).replace("/", "").encode("ascii")
+    flat = _INDEX[np.frombuffer(joined, dtype=np.uint8)]
+    if flat.size % len(sequences):
+        raise ValueError("Designed sequences differ in length")
+    if (flat == 255).any():
+        raise ValueError("Sequence holds a letter outside the alphabet")
+    return flat.reshape(len(sequences), -1)
+
+
+def _sequences(matrix: np.ndarray, native: np.ndarray, encoding: str) -> dict:
+    if encoding == "matrix":
+        return {"encoding": "matrix", "shape": list(matrix.shape), "data": matrix.tobytes()}
+    rows, positions = np.nonzero(matrix != native)  # row-major: grouped by sequence
+    offsets = np.zeros(len(matrix) + 1, dtype="<u4")
+    np.cumsum(np.bincount(rows, minlength=len(matrix)), out=offsets[1:])
+    return {
+        "encoding": "mutations",
+        "count": len(matrix),
+        "offsets": offsets.tobytes(),
+        "positions": positions.astype("<u4").tobytes(),
+        "residues": matrix[rows, positions].tobytes(),
+    }
+
+
+def encode_design(response: DesignResponse, encoding: str = "matrix") -> bytes:
+    """MessagePack bytes of ``response`` with sequences in ``encoding``."""
+    native = residue_matrix([response.native_sequence])[0]
+    matrix = residue_matrix(response.sequences).reshape(-1, native.size)
+    return msgpack.packb({
+        "format": FORMAT_VERSION,
+        "status": response.status,
+        "metadata": response.metadata.model_dump(),
+        "native_sequence": response.native_sequence,
+        "alphabet": ALPHABET,
+        "chain_lengths": [len(c) for c in response.native_sequence.split("/")],
+        "sequences": _sequences(matrix, native, encoding),
+        "scores": response.scores,
+        "global_scores": response.global_scores,
+        "seq_recoveries": response.seq_recoveries,
+        "log_probs": None if response.log_probs is None else [
+            {"shape": e.shape, "data": base64.b64decode(e.data)}
+            for e in response.log_probs
+        ],
+    })
+
+
+def decode_design(data: bytes) -> dict:
+    """The JSON-shaped response (``log_probs`` as arrays) from ``encode_design`` bytes."""
+    doc = msgpack.unpackb(data, raw=False)
+    native = residue_matrix([doc["native_sequence"]])[0]
+    seqs = doc.pop("sequences")
+    if seqs["encoding"] == "matrix":
+        matrix = np.frombuffer(seqs["data"], dtype=np.uint8).reshape(seqs["shape"])
+    else:
+        offsets = np.frombuffer(seqs["offsets"], dtype="<u4")
+        rows = np.repeat(np.arange(seqs["count"]), np.diff(offsets))
+        matrix = np.tile(native, (seqs["count"], 1))
+        matrix[rows, np.frombuffer(seqs["positions"], dtype="<u4")] = np.frombuffer(
+            seqs["residues"], dtype=np.uint8
+        )
+
+    letters = _LETTERS[matrix]
+    bounds = np.cumsum([0, *doc.pop("chain_lengths")])
+    doc["sequences"] = [
+        "/".join(row[a:b].tobytes().decode() for a, b in zip(bounds, bounds[1:]))
+        for row in letters
+    ]
+    if doc["log_probs"] is not None:
+        doc["log_probs"] = [
+            np.frombuffer(e["data"], dtype="<f2").reshape(e["shape"]) for e in doc["log_probs"]
+        ]
+    return doc
@@ -0,0 +1,70 @@
+"""Bounded executors and admission limits for blocking request work.
+
+BioPython parsing and ProteinMPNN inference are blocking; running them
+directly in an ``async def`` route would stall the whole event loop.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.config import MAX_CONCURRENT_DESIGNS, VALIDATION_THREADS
+
+T = TypeVar("T")
+
+validation_executor = ThreadPoolExecutor(
+    max_workers=VALIDATION_THREADS, thread_name_prefix="validate"
+)
+inference_executor = ThreadPoolExecutor(
+    max_workers=MAX_CONCURRENT_DESIGNS, thread_name_prefix="inference"
+)
+
+
+class ConcurrencyLimiter:
+    """Non-blocking counter of in-flight requests.
+
+    Callers that fail ``try_acquire`` should be turned away (HTTP 429)
+    rather than queued, so the service sheds load instead of piling it up.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENT_DESIGNS):
+        self.limit = limit
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._active >= self.limit:
+                return False
+            self._active += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = max(0, self._active - 1)
+
+
+async def run_blocking(
+    executor: Executor,
+    call: Callable[[], T],
+    timeout: float | None = None,
+) -> T:
+    """Run ``call`` on ``executor`` and await it, optionally with a timeout.
+
+    Bind arguments with ``functools.partial``. ``call`` runs in a copy of the
+    caller's context, so context variables (e.g. request timings) carry over.
+
+    Raises:
+        TimeoutError: If ``timeout`` elapses first.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await asyncio.wait_for(
+        loop.run_in_executor(executor, ctx.run, call), timeout
+    )
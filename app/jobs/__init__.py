@@ -0,0 +1,15 @@
+from app.jobs.manager import JobManager
+from app.jobs.store import (
+    InMemoryJobStore,
+    JobStore,
+    SQLiteJobStore,
+    create_job_store,
+)
+
+__all__ = [
+    "InMemoryJobStore",
+    "JobManager",
+    "JobStore",
+    "SQLiteJobStore",
+    "create_job_store",
+]
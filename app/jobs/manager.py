@@ -0,0 +1,136 @@
+"""Runs design jobs in the background and records their state."""
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Callable
+
+from pydantic import BaseModel
+
+from app.config import JOB_WORKERS
+from app.jobs.store import JobStore
+from app.schemas import JobInfo, JobProgress, JobStatus
+
+logger = logging.getLogger(__name__)
+
+_UNFINISHED = (JobStatus.QUEUED, JobStatus.RUNNING)
+
+# A job task receives a progress callback and a cancellation event, and
+# returns the response model to store as the job result.
+JobTask = Callable[[Callable[[int, int], None], threading.Event], BaseModel]
+
+
+class JobManager:
+    """Queues job tasks on a local thread pool and tracks them in a JobStore.
+
+    Every submitted task is eventually called, even if the job was cancelled
+    while queued, so tasks can release their inputs (e.g. temp files). Tasks
+    should check the cancellation event and raise ``CancelledError``.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job"
+        )
+        self._cancel_events: dict[str, threading.Event] = {}
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs submitted but not yet picked up by a job thread."""
+        return self._queued
+
+    def submit(self, task: JobTask, total: int) -> JobInfo:
+        """Queue ``task`` and return its initial job record."""
+        job = JobInfo(
+            job_id=uuid.uuid4().hex,
+            progress=JobProgress(total=total),
+            created_at=time.time(),
+        )
+        self.store.create(job)
+        event = threading.Event()
+        with self._lock:
+            self._cancel_events[job.job_id] = event
+            self._queued += 1
+        self._executor.submit(self._run, job.job_id, task, event)
+        return job
+
+    def get(self, job_id: str) -> JobInfo | None:
+        return self.store.get(job_id)
+
+    def get_result(self, job_id: str) -> str | None:
+        return self.store.get_result(job_id)
+
+    def cancel(self, job_id: str) -> JobInfo | None:
+        """Cancel a job. Finished jobs are returned unchanged."""
+        # Only from queued or running, so a job that just finished keeps its outcome
+        job = self.store.update(
+            job_id, expected=_UNFINISHED,
+            status=JobStatus.CANCELLED, finished_at=time.time(),
+        )
+        if job is None:
+            return self.store.get(job_id)
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and stop accepting new ones."""
+        with self._lock:
+            job_ids = list(self._cancel_events)
+        for job_id in job_ids:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=False)
+
+    def _run(self, job_id: str, task: JobTask, event: threading.Event) -> None:
+        with self._lock:
+            self._queued -= 1
+        if not event.is_set():
+            self.store.update(
+                job_id, expected=(JobStatus.QUEUED,),
+                status=JobStatus.RUNNING, started_at=time.time(),
+            )
+
+        def progress(completed: int, total: int) -> None:
+            if not event.is_set():
+                self.store.update(
+                    job_id, expected=(JobStatus.RUNNING,),
+                    progress=JobProgress(completed=completed, total=total),
+                )
+
+        try:
+            result = task(progress, event)
+        except CancelledError:
+            pass
+        except Exception as e:
+            if not event.is_set():
+                logger.exception("Job %s failed", job_id)
+                self.store.update(
+                    job_id,
+                    expected=_UNFINISHED,
+                    status=JobStatus.FAILED,
+                    error=str(e) or type(e).__name__,
+                    finished_at=time.time(),
+                )
+        else:
+            if not event.is_set():
+                self.store.set_result(job_id, result.model_dump_json())
+                job = self.store.get(job_id)
+                self.store.update(
+                    job_id,
+                    expected=_UNFINISHED,
+                    status=JobStatus.SUCCEEDED,
+                    progress=JobProgress(
+                        completed=job.progress.total, total=job.progress.total
+                    ),
+                    finished_at=time.time(),
+                )
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
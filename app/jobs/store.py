@@ -0,0 +1,193 @@
+"""Job state backends for the asynchronous job API.
+
+``JobStore`` is the extension point: the manager only talks to this
+interface, so a Redis or database-backed store can be dropped in later.
+Both stores drop finished jobs ``JOB_RETENTION_SECONDS`` after they finish.
+"""
+
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Collection
+from pathlib import Path
+
+from app.config import JOB_MAX_FINISHED, JOB_RETENTION_SECONDS
+from app.schemas import JobInfo, JobStatus
+
+
+class JobStore(ABC):
+    """Persists job metadata and serialized results."""
+
+    @abstractmethod
+    def create(self, job: JobInfo) -> None: ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> JobInfo | None: ...
+
+    @abstractmethod
+    def update(
+        self, job_id: str, expected: Collection[JobStatus] | None = None, **fields
+    ) -> JobInfo | None:
+        """Apply ``fields`` to the stored job and return the updated copy.
+
+        With ``expected``, the check and the update are atomic: nothing is
+        applied, and None is returned, unless the job's status is one of them.
+        """
+
+    @abstractmethod
+    def set_result(self, job_id: str, result_json: str) -> None: ...
+
+    @abstractmethod
+    def get_result(self, job_id: str) -> str | None: ...
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local store. Jobs are lost on restart.
+
+    Besides the retention period, at most ``max_finished`` finished jobs
+    are kept, oldest dropped first.
+    """
+
+    def __init__(
+        self,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+        max_finished: int = JOB_MAX_FINISHED,
+    ):
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._jobs: dict[str, JobInfo] = {}
+        self._results: dict[str, str] = {}
+        # Finished job IDs and when they finished, in finishing order
+        self._finished: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job: JobInfo) -> None:
+        with self._lock:
+            self._evict(time.time())
+            self._jobs[job.job_id] = job
+
+    def get(self, job_id: str) -> JobInfo | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy(deep=True) if job is not None else None
+
+    def update(
+        self, job_id: str, expected: Collection[JobStatus] | None = None, **fields
+    ) -> JobInfo | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or (expected is not None and job.status not in expected):
+                return None
+            job = job.model_copy(update=fields, deep=True)
+            self._jobs[job_id] = job
+            if job.status.finished and job_id not in self._finished:
+                self._finished[job_id] = job.finished_at or time.time()
+            return job.model_copy(deep=True)
+
+    def set_result(self, job_id: str, result_json: str) -> None:
+        with self._lock:
+            self._results[job_id] = result_json
+
+    def get_result(self, job_id: str) -> str | None:
+        with self._lock:
+            return self._results.get(job_id)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired and surplus finished jobs. Holds the lock."""
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if (
+                finished_at > now - self.retention_seconds
+                and len(self._finished) <= self.max_finished
+            ):
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """Single-file store that survives restarts.
+
+    Jobs that were queued or running when the process stopped are marked
+    failed on startup, since their in-memory work is gone.
+    """
+
+    def __init__(
+        self, path: Path | str, retention_seconds: float = JOB_RETENTION_SECONDS
+    ):
+        self.retention_seconds = retention_seconds
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, info TEXT NOT NULL, result TEXT)"
+            )
+        for (info,) in self._conn.execute("SELECT info FROM jobs").fetchall():
+            job = JobInfo.model_validate_json(info)
+            if not job.status.finished:
+                self.update(
+                    job.job_id,
+                    status=JobStatus.FAILED,
+                    error="Interrupted by service restart",
+                )
+
+    def create(self, job: JobInfo) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE json_extract(info, '$.finished_at') < ?",
+                (time.time() - self.retention_seconds,),
+            )
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, info) VALUES (?, ?)",
+                (job.job_id, job.model_dump_json()),
+            )
+
+    def get(self, job_id: str) -> JobInfo | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return JobInfo.model_validate_json(row[0]) if row else None
+
+    def update(
+        self, job_id: str, expected: Collection[JobStatus] | None = None, **fields
+    ) -> JobInfo | None:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT info FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = JobInfo.model_validate_json(row[0])
+            if expected is not None and job.status not in expected:
+                return None
+            job = job.model_copy(update=fields)
+            self._conn.execute(
+                "UPDATE jobs SET info = ? WHERE job_id = ?",
+                (job.model_dump_json(), job_id),
+            )
+        return job
+
+    def set_result(self, job_id: str, result_json: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET result = ? WHERE job_id = ?", (result_json, job_id)
+            )
+
+    def get_result(self, job_id: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+
+def create_job_store(spec: str) -> JobStore:
+    """Build a store from a ``JOB_STORE`` setting: "memory" or a SQLite path."""
+    if spec == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(spec)
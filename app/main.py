@@ -1,35 +1,195 @@
 """FastAPI main app logic"""
 
+import asyncio
+import gzip
+import json
 import logging
+import math
 import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError
 from contextlib import asynccontextmanager
+from dataclasses import asdict
+from functools import partial
+from pathlib import Path
 
-from fastapi import FastAPI, File, Form, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, Form, Request, UploadFile
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
+from starlette.formparsers import MultiPartParser
 
-from app.config import APP_DIR, DEFAULT_NUM_SEQUENCES, MODEL_WEIGHTS_FILE
-from app.dependencies import cleanup, parse_design_params, save_upload
-from app.proteinmpnn.wrapper import design_sequences
-from app.schemas import DesignMetadata, DesignResponse
-from app.validation import PDBValidationError, validate_pdb
+from app.cache import DesignCache, digest_cache_key, structure_digest
+from app.config import (
+    APP_DIR,
+    BATCH_ARCHIVE_MAX_MB,
+    BATCH_MAX_ITEMS,
+    BATCH_TIMEOUT_SECONDS,
+    BUSY_RETRY_AFTER_SECONDS,
+    CLIENT_ID_HEADER,
+    DEFAULT_NUM_SEQUENCES,
+    DEFAULT_SAMPLING_TEMP,
+    GZIP_MIN_BYTES,
+    JOB_STORE,
+    JOB_TIMEOUT_SECONDS,
+    MAX_PDB_SIZE_MB,
+    MIN_CA_ATOMS,
+    MODEL_WEIGHTS_FILE,
+    REQUEST_TIMEOUT_SECONDS,
+    UPLOAD_FORM_OVERHEAD_BYTES,
+    UPLOAD_SPILL_MB,
+    WARMUP_CHAINS,
+    WARMUP_PDB,
+    WORKER_POOL_SIZE,
+)
+from app.dependencies import (
+    SpooledUpload,
+    UploadTooLargeError,
+    extract_archive,
+    parse_batch_chains,
+    parse_design_params,
+    save_upload,
+)
+from app.encoding import encode_design, negotiate
+from app.executors import (
+    ConcurrencyLimiter,
+    inference_executor,
+    run_blocking,
+    validation_executor,
+)
+from app.jobs import JobManager, create_job_store
+from app.metrics import (
+    FEATURE_CACHE_LOOKUPS,
+    REQUEST_SECONDS,
+    RESPONSES,
+    STAGE_SECONDS,
+    STREAM_ERRORS,
+    TIME_TO_FIRST_SEQUENCE,
+    Gauge,
+    Timings,
+    children_max_rss_bytes,
+    current_timings,
+    process_age_seconds,
+    pss_bytes,
+    record_stage,
+    record_throughput,
+    registry,
+    rss_bytes,
+    timed,
+)
+from app.proteinmpnn.constraints import CompiledConstraints, compile_constraints
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta
+from app.proteinmpnn.pool import WorkerPool
+from app.proteinmpnn.tuning import check_memory_budget
+from app.proteinmpnn.wrapper import BatchItem, design_batch, design_sequences
+from app.scheduler import DesignScheduler, SchedulerBusyError, design_work
+from app.scratch import sweep_scratch
+from app.schemas import (
+    BatchDesignResponse,
+    BatchItemResult,
+    DesignMetadata,
+    DesignParams,
+    DesignResponse,
+    DesignedSequence,
+    JobInfo,
+    ResidueLogProbs,
+    StructureInfo,
+)
+from app.structure import (
+    Backbone,
+    StoredStructure,
+    StructureNotFoundError,
+    StructureStore,
+    crop_context,
+    num_positions,
+    structure_format,
+)
+from app.validation import (
+    PDBValidationError,
+    validate_backbone,
+    validate_pdb,
+    validate_structure,
+)
 
 logger = logging.getLogger(__name__)
 
 
+async def _warm_up(pool: WorkerPool, started: float) -> None:
+    """Mark the app ready once every worker has loaded the model and run one
+    design of ``WARMUP_PDB``, so the first real request isn't the slow one.
+
+    ``started`` is the ``time.monotonic()`` the cold start is measured from.
+    """
+    while pool.warm_count < pool.size:
+        await asyncio.sleep(0.1)
+
+    if WARMUP_PDB.is_file():
+        start = time.monotonic()
+        try:
+            backbone = await run_blocking(
+                validation_executor, partial(_load_backbone, WARMUP_PDB, WARMUP_CHAINS)
+            )
+            # Least-loaded routing gives each idle worker one of these
+            futures = [
+                pool.submit(
+                    backbone=backbone,
+                    chains=WARMUP_CHAINS,
+                    num_sequences=1,
+                    sampling_temp=DEFAULT_SAMPLING_TEMP,
+                )
+                for _ in range(pool.size)
+            ]
+            await asyncio.gather(*map(asyncio.wrap_future, futures))
+        except Exception:
+            logger.exception("Warm-up design failed; /ready stays unready")
+            return
+        STAGE_SECONDS.observe(time.monotonic() - start, "warmup")
+    else:
+        logger.warning("Warm-up structure %s not found; skipping warm-up", WARMUP_PDB)
+
+    app.state.cold_start_seconds = time.monotonic() - started
+    app.state.model_ready = True
+    logger.info("Ready %.1fs after process start", app.state.cold_start_seconds)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup/shutdown events"""
+    started = time.monotonic() - (process_age_seconds() or 0.0)
     if not MODEL_WEIGHTS_FILE.exists():
         raise RuntimeError(
             f"Model weights not found at {MODEL_WEIGHTS_FILE}. "
             "Run: python scripts/download_weights.py"
         )
-    app.state.model_ready = True
-    print(f"Model ready: {MODEL_WEIGHTS_FILE}")
+    swept = sweep_scratch()
+    if swept:
+        logger.info("Removed %d scratch files left by stopped processes", swept)
+
+    pool = WorkerPool(size=WORKER_POOL_SIZE, weights_path=MODEL_WEIGHTS_FILE)
+    pool.start()
+    app.state.worker_pool = pool
+    # One running design per worker; the rest wait in cost order
+    scheduler.slots = pool.size
+    if design_limiter.limit <= scheduler.slots:
+        logger.warning(
+            "MAX_CONCURRENT_DESIGNS (%d) is not above the %d design slots; "
+            "designs can't queue for the scheduler to order",
+            design_limiter.limit, scheduler.slots,
+        )
+    warm_up = asyncio.create_task(_warm_up(pool, started))
 
     yield
 
+    warm_up.cancel()
+    job_manager.shutdown()
+    app.state.worker_pool = None
+    pool.shutdown()
+
 
 app = FastAPI(
     title="ProteinMPNN Mini-Service",
@@ -37,77 +197,1068 @@ app = FastAPI(
     lifespan=lifespan,
 )
 app.state.model_ready = False
+app.state.cold_start_seconds = None
+app.state.worker_pool = None
+
+design_limiter = ConcurrencyLimiter()
+scheduler = DesignScheduler()
+job_manager = JobManager(create_job_store(JOB_STORE))
+design_cache = DesignCache()
+structure_store = StructureStore()
+
+# Endpoints taking a single structure; a larger body can't hold a valid one
+_SINGLE_UPLOAD_PATHS = {"/design", "/design/stream", "/jobs", "/structures"}
+_MAX_SINGLE_UPLOAD_BYTES = int(MAX_PDB_SIZE_MB * 1024 * 1024) + UPLOAD_FORM_OVERHEAD_BYTES
+# Starlette spools multipart file parts to disk past 1 MB; keep parts in
+# memory up to the same threshold save_upload spills at
+MultiPartParser.max_file_size = int(UPLOAD_SPILL_MB * 1024 * 1024)
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """413 from Content-Length alone, before the multipart body is read."""
+    if request.method == "POST" and request.url.path in _SINGLE_UPLOAD_PATHS:
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > _MAX_SINGLE_UPLOAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"PDB file exceeds {MAX_PDB_SIZE_MB} MB limit"},
+            )
+    return await call_next(request)
+
+
+_in_flight = 0
+
+
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Latency, status and in-flight metrics for every request.
+
+    Stage spans recorded while handling the request are collected too, and
+    returned in an ``X-Timing`` header when the client sends ``X-Timing: 1``.
+    """
+    global _in_flight
+    timings = Timings()
+    token = current_timings.set(timings)
+    _in_flight += 1
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _in_flight -= 1
+        current_timings.reset(token)
+    elapsed = time.perf_counter() - start
+
+    # Route templates keep /jobs/{job_id} to one series
+    route = request.scope.get("route")
+    path = getattr(route, "path", None) or "other"
+    REQUEST_SECONDS.observe(elapsed, request.method, path)
+    RESPONSES.inc(request.method, path, str(response.status_code))
+    if request.headers.get("x-timing"):
+        timings.add("total", elapsed)
+        response.headers["X-Timing"] = timings.header()
+    return response
+
+
+def _pool_queue_depth() -> dict:
+    pool = app.state.worker_pool
+    return {
+        ("pool",): pool.queue_depth if pool is not None else 0,
+        ("jobs",): job_manager.queue_depth,
+        ("scheduler",): scheduler.queued,
+    }
+
+
+def _process_memory(read) -> dict:
+    """``read(pid)`` for the API process and every live worker."""
+    values = {("api",): read("self")}
+    pool = app.state.worker_pool
+    if pool is not None:
+        for worker_id, pid in pool.worker_pids().items():
+            values[(f"worker-{worker_id}",)] = read(pid)
+    return {k: v for k, v in values.items() if v is not None}
+
+
+registry.register(Gauge(
+    "mpnn_requests_in_flight", "HTTP requests being handled",
+    lambda: {(): _in_flight},
+))
+registry.register(Gauge(
+    "mpnn_design_slots_in_use", "Design requests holding a concurrency slot",
+    lambda: {(): design_limiter.active},
+))
+registry.register(Gauge(
+    "mpnn_queue_depth", "Work waiting to start, by queue",
+    _pool_queue_depth, labels=("queue",),
+))
+registry.register(Gauge(
+    "mpnn_scheduler_running", "Designs holding a scheduler slot",
+    lambda: {(): scheduler.running},
+))
+registry.register(Gauge(
+    "mpnn_scheduler_residues_per_second",
+    "Positions decoded per second per slot, as fit by the scheduler",
+    lambda: {(): scheduler.residues_per_second},
+))
+registry.register(Gauge(
+    "mpnn_scheduler_overhead_seconds",
+    "Fixed seconds per design, as fit by the scheduler",
+    lambda: {(): scheduler.overhead_seconds},
+))
+registry.register(Gauge(
+    "mpnn_process_rss_bytes", "Resident memory of the API and worker processes",
+    partial(_process_memory, rss_bytes), labels=("process",),
+))
+registry.register(Gauge(
+    "mpnn_process_pss_bytes",
+    "Proportional memory of the API and worker processes (shared pages split)",
+    partial(_process_memory, pss_bytes), labels=("process",),
+))
+registry.register(Gauge(
+    "mpnn_subprocess_max_rss_bytes",
+    "Peak resident memory of the largest finished ProteinMPNN subprocess",
+    lambda: {(): children_max_rss_bytes()},
+))
+registry.register(Gauge(
+    "mpnn_cold_start_seconds", "Process start to ready, including the warm-up design",
+    lambda: (
+        {(): app.state.cold_start_seconds} if app.state.cold_start_seconds is not None else {}
+    ),
+))
+registry.register(Gauge(
+    "mpnn_workers_warm", "Worker processes with the model loaded",
+    lambda: {(): app.state.worker_pool.warm_count if app.state.worker_pool else 0},
+))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of latency, throughput and load metrics."""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.get("/health")
 def health():
-    """Liveness probe."""
+    """Liveness probe. Answers as soon as the server is up; see ``/ready``."""
+    pool = app.state.worker_pool
     return {
         "status": "ok",
         "model_loaded": app.state.model_ready,
+        "workers_warm": pool.warm_count if pool is not None else 0,
     }
 
 
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until every worker is loaded and warmed up."""
+    if not app.state.model_ready:
+        pool = app.state.worker_pool
+        return JSONResponse(
+            status_code=503,
+            content={
+                "detail": "Model warming up",
+                "workers_warm": pool.warm_count if pool is not None else 0,
+            },
+        )
+    return {"status": "ready", "cold_start_seconds": app.state.cold_start_seconds}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Result cache hit/miss counters, plus the workers' feature cache lookups
+    and the structure store's hot set."""
+    hits = FEATURE_CACHE_LOOKUPS.value("hit")
+    misses = FEATURE_CACHE_LOOKUPS.value("miss")
+    return {
+        **design_cache.stats(),
+        "feature_cache": {
+            "hits": int(hits),
+            "misses": int(misses),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        },
+        "structure_store": structure_store.stats(),
+    }
+
+
+def _load_backbone(
+    source: Path | SpooledUpload | StoredStructure, chains: list[str]
+) -> Backbone:
+    """Validate a structure, crop distant context if it is very large, and
+    check that designing it fits the per-job memory budget."""
+    if isinstance(source, Path):
+        backbone = validate_pdb(source, chains)
+    elif isinstance(source, StoredStructure):
+        # Validated when registered; only the chain checks depend on the request
+        backbone = structure_store.get(source.structure_id)
+        validate_backbone(backbone, chains)
+    else:
+        backbone = validate_structure(source.read_bytes(), source.name, chains)
+    backbone = crop_context(backbone, chains)
+    check_memory_budget(num_positions(backbone))
+    return backbone
+
+
+def _compile_constraints(
+    backbone: Backbone, params: DesignParams
+) -> CompiledConstraints | None:
+    """Resolve the request's constraints against its backbone, once."""
+    if params.constraints is None:
+        return None
+    with timed("constraints"):
+        return compile_constraints(backbone, params.chains, params.constraints)
+
+
+def _cache_key(source: SpooledUpload | StoredStructure, params: DesignParams) -> str:
+    if isinstance(source, StoredStructure):
+        digest = source.digest
+    else:
+        digest = structure_digest(source.read_bytes(), structure_format(source.name))
+    return digest_cache_key(
+        digest,
+        params.chains,
+        params.num_sequences,
+        params.sampling_temp,
+        params.include_log_probs,
+        params.constraints.model_dump() if params.constraints else None,
+    )
+
+
+def _build_response(
+    result: ParsedFasta, params: DesignParams, num_residues: int
+) -> DesignResponse:
+    return DesignResponse(
+        metadata=DesignMetadata(
+            num_residues=num_residues,
+            chains=params.chains,
+            num_sequences=len(result.designed_sequences),
+        ),
+        native_sequence=result.native_sequence,
+        sequences=result.designed_sequences,
+        scores=result.scores,
+        global_scores=result.global_scores,
+        seq_recoveries=result.seq_recoveries,
+        log_probs=(
+            None if result.log_probs is None
+            else [ResidueLogProbs.from_array(a) for a in result.log_probs]
+        ),
+    )
+
+
+def _design_content(
+    request: Request, json_body: str, response: DesignResponse | None = None
+) -> Response:
+    """A design result as JSON, or as compact MessagePack if the client asks.
+
+    ``response`` saves re-parsing ``json_body`` when the caller has it.
+    """
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    encoding = negotiate(request.headers.get("accept", ""))
+    if encoding is None:
+        return Response(content=json_body, media_type="application/json", headers=headers)
+
+    with timed("encode"):
+        response = response or DesignResponse.model_validate_json(json_body)
+        body = encode_design(response, encoding)
+        if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/x-msgpack", headers=headers)
+
+
+async def _receive_structure(
+    pdb_file: UploadFile | None, structure_id: str | None
+) -> SpooledUpload | StoredStructure:
+    """The uploaded structure, or the registered one ``structure_id`` names.
+
+    Raises:
+        ValueError: Unless exactly one of the two is given.
+        UploadTooLargeError: If the upload is too large.
+        PDBValidationError: If the upload has no ATOM records.
+        StructureNotFoundError: If no structure has that ID.
+    """
+    if (pdb_file is None) == (not structure_id):
+        raise ValueError("Send either pdb_file or structure_id")
+    if structure_id:
+        return structure_store.info(structure_id)
+    with timed("upload"):
+        return await save_upload(pdb_file, require_atom_records=True)
+
+
+def _upload_error(e: ValueError) -> JSONResponse:
+    status = 413 if isinstance(e, UploadTooLargeError) else 400
+    return JSONResponse(status_code=status, content={"detail": str(e)})
+
+
+def _structure_not_found(e: StructureNotFoundError) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"detail": str(e)})
+
+
+def _busy_response(
+    detail: str = "Server busy, retry later",
+    retry_after: float = BUSY_RETRY_AFTER_SECONDS,
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _client_id(request: Request) -> str:
+    """Who a request counts against in the scheduler's per-client limit."""
+    client = request.headers.get(CLIENT_ID_HEADER)
+    if client:
+        return client
+    return request.client.host if request.client else "unknown"
+
+
+def _scheduled_design(
+    client: str,
+    num_residues: int,
+    deadline: float,
+    cancel_event: threading.Event | None = None,
+    **kwargs,
+) -> ParsedFasta:
+    """``design_sequences`` once the scheduler grants a slot, with whatever
+    time is left before ``deadline``. Throughput excludes the queue wait."""
+    work = design_work(num_positions(kwargs["backbone"]), kwargs["num_sequences"])
+
+    def design() -> ParsedFasta:
+        start = time.perf_counter()
+        result = design_sequences(
+            timeout=deadline - time.monotonic(), cancel_event=cancel_event, **kwargs
+        )
+        record_throughput(
+            num_residues, len(result.designed_sequences), time.perf_counter() - start
+        )
+        return result
+
+    return scheduler.run(
+        client,
+        work,
+        design,
+        timeout=deadline - time.monotonic(),
+        cancel_event=cancel_event,
+    )
+
+
 @app.post("/design", response_model=DesignResponse)
 async def design(
-    pdb_file: UploadFile = File(...),
+    request: Request,
+    pdb_file: UploadFile | None = File(default=None),
+    structure_id: str | None = Form(default=None),
     chains: str = Form(...),
     num_sequences: int = Form(default=DEFAULT_NUM_SEQUENCES),
+    sampling_temp: float = Form(default=DEFAULT_SAMPLING_TEMP),
+    include_log_probs: bool = Form(default=False),
+    constraints: str | None = Form(default=None),
+    use_cache: bool = Form(default=True),
 ):
-    """Design protein sequences for a given PDB structure."""
+    """Design protein sequences for a given PDB structure.
+
+    Send the structure as ``pdb_file``, or the ``structure_id`` of one
+    registered with ``POST /structures``. Identical requests are answered from the result cache unless
+    ``use_cache`` is false, in which case the design is recomputed and the
+    cached entry refreshed. ``Accept: application/x-msgpack`` gets the
+    compact encoding (see ``app.encoding``) instead of JSON.
+    """
+    deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+
     # Parse and validate form params
     try:
-        params = parse_design_params(chains, num_sequences)
+        params = parse_design_params(
+            chains, num_sequences, sampling_temp, include_log_probs, constraints
+        )
     except ValueError as e:
         return JSONResponse(status_code=400, content={"detail": str(e)})
 
-    # Save upload to temp file
-    tmp_path = await save_upload(pdb_file)
+    # Read the upload into memory (or a temp file, if it is very large),
+    # or look up the registered structure
     try:
-        # Validate PDB structure
-        structure = validate_pdb(tmp_path, params.chains)
+        source = await _receive_structure(pdb_file, structure_id)
+    except ValueError as e:
+        return _upload_error(e)
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
+    acquired = False
+    try:
+        with timed("cache_key"):
+            cache_key = await run_blocking(
+                validation_executor,
+                partial(_cache_key, source, params),
+                timeout=deadline - time.monotonic(),
+            )
+        if use_cache:
+            cached = design_cache.get(cache_key)
+            if cached is not None:
+                return _design_content(request, cached)
 
-        # Count residues across requested chains
-        num_residues = 0
-        for chain_id in params.chains:
-            chain = structure[0][chain_id]
-            num_residues += sum(1 for r in chain if r.get_id()[0] == " ")
+        if not design_limiter.try_acquire():
+            return _busy_response()
+        acquired = True
 
-        # Run ProteinMPNN
-        result = design_sequences(
-            pdb_path=str(tmp_path),
-            chains=params.chains,
-            num_sequences=params.num_sequences,
+        # Validate and parse the PDB once, off the event loop
+        with timed("validate"):
+            backbone = await run_blocking(
+                validation_executor,
+                partial(_load_backbone, source, params.chains),
+                timeout=deadline - time.monotonic(),
+            )
+        constraints = _compile_constraints(backbone, params)
+        num_residues = backbone.num_residues(params.chains)
+        scheduler.admit(
+            design_work(num_positions(backbone), params.num_sequences),
+            REQUEST_TIMEOUT_SECONDS,
+            remaining=deadline - time.monotonic(),
+            hint="use POST /jobs or fewer sequences",
         )
 
-        return DesignResponse(
-            metadata=DesignMetadata(
-                num_residues=num_residues,
+        # Run ProteinMPNN; the wrapper gets the same deadline so a
+        # subprocess is killed rather than left running after a 504
+        with timed("inference"):
+            result = await run_blocking(
+                inference_executor,
+                partial(
+                    _scheduled_design,
+                    _client_id(request),
+                    num_residues,
+                    deadline,
+                    pdb_path=source.path,
+                    chains=params.chains,
+                    num_sequences=params.num_sequences,
+                    sampling_temp=params.sampling_temp,
+                    pool=app.state.worker_pool,
+                    backbone=backbone,
+                    include_log_probs=params.include_log_probs,
+                    constraints=constraints,
+                ),
+                timeout=deadline - time.monotonic(),
+            )
+
+        response = _build_response(result, params, num_residues)
+        json_body = response.model_dump_json()
+        # Only the workers' results: a fallback run samples other sequences
+        # and can't answer a later include_log_probs request
+        if not result.from_subprocess:
+            design_cache.put(cache_key, json_body)
+        return _design_content(request, json_body, response)
+
+    except PDBValidationError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
+
+    except SchedulerBusyError as e:
+        return _busy_response(str(e), e.retry_after)
+
+    except (subprocess.TimeoutExpired, TimeoutError):
+        return JSONResponse(
+            status_code=504,
+            content={"detail": "ProteinMPNN timed out"},
+        )
+
+    except Exception:
+        logger.exception("Unexpected error in /design")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": "Internal server error"},
+        )
+
+    finally:
+        if acquired:
+            design_limiter.release()
+        source.close()
+
+
+def _ndjson_event(event: str, data: dict) -> str:
+    return json.dumps({"event": event, **data}) + "\n"
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_END_OF_STREAM = object()
+
+
+def _sequence_event(sample: DesignedSample) -> dict:
+    """``sequence`` event payload; ``log_probs`` only when it was requested."""
+    fields = sample._asdict()
+    if sample.log_probs is None:
+        return DesignedSequence(**fields).model_dump(exclude={"log_probs"})
+    fields["log_probs"] = ResidueLogProbs.from_array(sample.log_probs)
+    return DesignedSequence(**fields).model_dump()
+
+
+async def _design_events(
+    source: SpooledUpload | StoredStructure,
+    params: DesignParams,
+    backbone: Backbone,
+    constraints: CompiledConstraints | None,
+    client: str,
+    started: float,
+    deadline: float,
+    format_event,
+):
+    """Events for /design/stream: native, then each sequence, then done/error.
+
+    Owns the upload and the limiter slot. If the client goes away mid-design,
+    the ProteinMPNN work is cancelled and both are released once it stops.
+    """
+    loop = asyncio.get_running_loop()
+    samples: asyncio.Queue = asyncio.Queue()
+    cancel_event = threading.Event()
+    task: asyncio.Future | None = None
+
+    def on_sample(sample: DesignedSample) -> None:
+        loop.call_soon_threadsafe(samples.put_nowait, sample)
+
+    def release(_task=None) -> None:
+        if _task is not None and not _task.cancelled():
+            _task.exception()  # retrieved; already reported to the client
+        design_limiter.release()
+        source.close()
+
+    try:
+        yield format_event("native", {
+            "metadata": DesignMetadata(
+                num_residues=backbone.num_residues(params.chains),
+                chains=params.chains,
+                num_sequences=params.num_sequences,
+            ).model_dump(),
+            "native_sequence": backbone.native_sequence(params.chains),
+        })
+
+        inference_start = time.perf_counter()
+        task = asyncio.ensure_future(run_blocking(
+            inference_executor,
+            partial(
+                _scheduled_design,
+                client,
+                backbone.num_residues(params.chains),
+                deadline,
+                cancel_event=cancel_event,
+                pdb_path=source.path,
                 chains=params.chains,
-                num_sequences=len(result.designed_sequences),
+                num_sequences=params.num_sequences,
+                sampling_temp=params.sampling_temp,
+                pool=app.state.worker_pool,
+                backbone=backbone,
+                on_sample=on_sample,
+                include_log_probs=params.include_log_probs,
+                constraints=constraints,
             ),
-            native_sequence=result.native_sequence,
-            sequences=result.designed_sequences,
+            timeout=deadline - time.monotonic(),
+        ))
+        # Queued behind every sample the worker thread has already pushed
+        task.add_done_callback(lambda _: samples.put_nowait(_END_OF_STREAM))
+
+        first_sequence = None
+        count = 0
+        while (sample := await samples.get()) is not _END_OF_STREAM:
+            if first_sequence is None:
+                first_sequence = time.monotonic() - started
+                TIME_TO_FIRST_SEQUENCE.observe(first_sequence)
+            count += 1
+            yield format_event("sequence", _sequence_event(sample))
+
+        record_stage("inference", time.perf_counter() - inference_start)
+        try:
+            task.result()
+        except (subprocess.TimeoutExpired, TimeoutError):
+            STREAM_ERRORS.inc("504")
+            yield format_event(
+                "error", {"status_code": 504, "detail": "ProteinMPNN timed out"}
+            )
+            return
+        except Exception:
+            logger.exception("Unexpected error in /design/stream")
+            STREAM_ERRORS.inc("500")
+            yield format_event(
+                "error", {"status_code": 500, "detail": "Internal server error"}
+            )
+            return
+
+        elapsed = time.monotonic() - started
+        logger.info(
+            "Streamed %d sequences: first after %.3fs, done after %.3fs",
+            count, first_sequence or elapsed, elapsed,
         )
+        yield format_event("done", {
+            "num_sequences": count,
+            "time_to_first_sequence": round(first_sequence or elapsed, 4),
+            "elapsed": round(elapsed, 4),
+        })
 
-    except PDBValidationError as e:
+    finally:
+        if task is not None and not task.done():
+            # Client disconnected: stop the work, release once it has stopped
+            cancel_event.set()
+            task.add_done_callback(release)
+        else:
+            release()
+
+
+@app.post("/design/stream")
+async def design_stream(
+    request: Request,
+    pdb_file: UploadFile | None = File(default=None),
+    structure_id: str | None = Form(default=None),
+    chains: str = Form(...),
+    num_sequences: int = Form(default=DEFAULT_NUM_SEQUENCES),
+    sampling_temp: float = Form(default=DEFAULT_SAMPLING_TEMP),
+    include_log_probs: bool = Form(default=False),
+    constraints: str | None = Form(default=None),
+):
+    """Design sequences, streaming each one as soon as it is sampled.
+
+    Responds with Server-Sent Events when the client accepts
+    ``text/event-stream``, otherwise newline-delimited JSON. The native
+    sequence is sent before inference starts. Errors found before streaming
+    begins (bad input, busy server) are ordinary HTTP errors; later ones
+    arrive as an ``error`` event. Results are not cached. Takes
+    ``pdb_file`` or ``structure_id`` like ``/design``.
+    """
+    started = time.monotonic()
+    deadline = started + REQUEST_TIMEOUT_SECONDS
+
+    try:
+        params = parse_design_params(
+            chains, num_sequences, sampling_temp, include_log_probs, constraints
+        )
+    except ValueError as e:
         return JSONResponse(status_code=400, content={"detail": str(e)})
 
-    except subprocess.TimeoutExpired:
+    try:
+        source = await _receive_structure(pdb_file, structure_id)
+    except ValueError as e:
+        return _upload_error(e)
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
+
+    if not design_limiter.try_acquire():
+        source.close()
+        return _busy_response()
+
+    try:
+        with timed("validate"):
+            backbone = await run_blocking(
+                validation_executor,
+                partial(_load_backbone, source, params.chains),
+                timeout=deadline - time.monotonic(),
+            )
+        constraints = _compile_constraints(backbone, params)
+        scheduler.admit(
+            design_work(num_positions(backbone), params.num_sequences),
+            REQUEST_TIMEOUT_SECONDS,
+            remaining=deadline - time.monotonic(),
+            hint="use POST /jobs or fewer sequences",
+        )
+    except Exception as e:
+        design_limiter.release()
+        source.close()
+        if isinstance(e, PDBValidationError):
+            return JSONResponse(status_code=400, content={"detail": str(e)})
+        if isinstance(e, StructureNotFoundError):
+            return _structure_not_found(e)
+        if isinstance(e, SchedulerBusyError):
+            return _busy_response(str(e), e.retry_after)
+        if isinstance(e, TimeoutError):
+            return JSONResponse(
+                status_code=504, content={"detail": "ProteinMPNN timed out"}
+            )
+        logger.exception("Unexpected error in /design/stream")
+        return JSONResponse(
+            status_code=500, content={"detail": "Internal server error"}
+        )
+
+    if "text/event-stream" in request.headers.get("accept", ""):
+        format_event, media_type = _sse_event, "text/event-stream"
+    else:
+        format_event, media_type = _ndjson_event, "application/x-ndjson"
+    return StreamingResponse(
+        _design_events(
+            source,
+            params,
+            backbone,
+            constraints,
+            _client_id(request),
+            started,
+            deadline,
+            format_event,
+        ),
+        media_type=media_type,
+        # Keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/design/batch", response_model=BatchDesignResponse)
+async def design_batch_endpoint(
+    request: Request,
+    pdb_files: list[UploadFile] = File(default=[]),
+    archive: UploadFile | None = File(default=None),
+    chains: str = Form(...),
+    num_sequences: int = Form(default=DEFAULT_NUM_SEQUENCES),
+    sampling_temp: float = Form(default=DEFAULT_SAMPLING_TEMP),
+):
+    """Design many structures at once.
+
+    Structures come as repeated ``pdb_files`` parts and/or one zip/tar
+    ``archive``. ``chains`` is a JSON array applied to every entry, or an
+    object mapping each filename to its own array. Per-entry failures are
+    reported alongside the successes. The batch takes one scheduler slot,
+    for the client, ordered by its total work.
+    """
+    if not design_limiter.try_acquire():
+        return _busy_response()
+
+    entries: list[tuple[str, SpooledUpload]] = []
+    try:
+        for pdb_file in pdb_files:
+            entries.append((pdb_file.filename or "upload.pdb", await save_upload(pdb_file)))
+        if archive is not None:
+            archive_upload = await save_upload(archive, max_size_mb=BATCH_ARCHIVE_MAX_MB)
+            try:
+                entries += await run_blocking(
+                    validation_executor, partial(extract_archive, archive_upload)
+                )
+            finally:
+                archive_upload.close()
+
+        if not entries:
+            raise ValueError("No structures uploaded")
+        if len(entries) > BATCH_MAX_ITEMS:
+            raise ValueError(f"Batch exceeds {BATCH_MAX_ITEMS} structures")
+        chain_map = parse_batch_chains(chains, [name for name, _ in entries])
+        params = [
+            DesignParams(
+                chains=chain_map[name],
+                num_sequences=num_sequences,
+                sampling_temp=sampling_temp,
+            )
+            for name, _ in entries
+        ]
+    except ValueError as e:
+        for _, upload in entries:
+            upload.close()
+        design_limiter.release()
+        return _upload_error(e)
+
+    try:
+        backbones = await asyncio.gather(
+            *(
+                run_blocking(
+                    validation_executor,
+                    partial(_load_backbone, upload, p.chains),
+                )
+                for (_, upload), p in zip(entries, params)
+            ),
+            return_exceptions=True,
+        )
+
+        results: list[BatchItemResult] = []
+        to_design: list[int] = []
+        for i, ((name, _), backbone) in enumerate(zip(entries, backbones)):
+            if isinstance(backbone, PDBValidationError):
+                results.append(
+                    BatchItemResult(filename=name, status="error", detail=str(backbone))
+                )
+            elif isinstance(backbone, BaseException):
+                raise backbone
+            else:
+                results.append(BatchItemResult(filename=name))
+                to_design.append(i)
+
+        if to_design:
+            deadline = time.monotonic() + BATCH_TIMEOUT_SECONDS
+            items = [
+                BatchItem(
+                    entries[i][1].path,
+                    params[i].chains,
+                    backbones[i].num_residues(params[i].chains),
+                    backbones[i],
+                )
+                for i in to_design
+            ]
+
+            def run_batch() -> list[ParsedFasta | Exception]:
+                return design_batch(
+                    items,
+                    num_sequences=params[0].num_sequences,
+                    sampling_temp=params[0].sampling_temp,
+                    pool=app.state.worker_pool,
+                    timeout=deadline - time.monotonic(),
+                )
+
+            # Items share passes across the pool, so the batch's time
+            # says little about one design's: it doesn't refit the estimate
+            designed = await run_blocking(
+                inference_executor,
+                partial(
+                    scheduler.run,
+                    _client_id(request),
+                    sum(
+                        design_work(num_positions(backbones[i]), params[0].num_sequences)
+                        for i in to_design
+                    ),
+                    run_batch,
+                    timeout=deadline - time.monotonic(),
+                    learn=False,
+                ),
+                timeout=deadline - time.monotonic(),
+            )
+            for i, outcome in zip(to_design, designed):
+                if isinstance(outcome, Exception):
+                    logger.error("Batch item %s failed: %r", entries[i][0], outcome)
+                    results[i].status = "error"
+                    results[i].detail = (
+                        "ProteinMPNN timed out"
+                        if isinstance(outcome, (subprocess.TimeoutExpired, TimeoutError))
+                        else "Design failed"
+                    )
+                else:
+                    results[i].result = _build_response(
+                        outcome, params[i], backbones[i].num_residues(params[i].chains)
+                    )
+
+        num_failed = sum(1 for r in results if r.status != "success")
+        return BatchDesignResponse(
+            status="success" if num_failed == 0 else "partial",
+            num_succeeded=len(results) - num_failed,
+            num_failed=num_failed,
+            results=results,
+        )
+
+    except (subprocess.TimeoutExpired, TimeoutError):
         return JSONResponse(
             status_code=504,
             content={"detail": "ProteinMPNN timed out"},
         )
 
     except Exception:
-        logger.exception("Unexpected error in /design")
+        logger.exception("Unexpected error in /design/batch")
         return JSONResponse(
             status_code=500,
             content={"detail": "Internal server error"},
         )
 
     finally:
-        cleanup(tmp_path)
+        design_limiter.release()
+        for _, upload in entries:
+            upload.close()
+
+
+def _run_design_job(
+    source: SpooledUpload | StoredStructure,
+    params: DesignParams,
+    backbone: Backbone,
+    constraints: CompiledConstraints | None,
+    client: str,
+    progress,
+    cancel_event: threading.Event,
+) -> DesignResponse:
+    """Job task for POST /jobs. Owns (and closes) the upload.
+
+    ``JOB_TIMEOUT_SECONDS`` covers the wait for a scheduler slot too.
+    """
+    try:
+        if cancel_event.is_set():
+            raise CancelledError()
+        num_residues = backbone.num_residues(params.chains)
+        result = _scheduled_design(
+            client,
+            num_residues,
+            time.monotonic() + JOB_TIMEOUT_SECONDS,
+            cancel_event=cancel_event,
+            pdb_path=source.path,
+            chains=params.chains,
+            num_sequences=params.num_sequences,
+            sampling_temp=params.sampling_temp,
+            pool=app.state.worker_pool,
+            progress=progress,
+            backbone=backbone,
+            include_log_probs=params.include_log_probs,
+            constraints=constraints,
+        )
+        return _build_response(result, params, num_residues)
+    finally:
+        source.close()
+
+
+def _job_not_found(job_id: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"detail": f"Job {job_id} not found"})
+
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(
+    request: Request,
+    pdb_file: UploadFile | None = File(default=None),
+    structure_id: str | None = Form(default=None),
+    chains: str = Form(...),
+    num_sequences: int = Form(default=DEFAULT_NUM_SEQUENCES),
+    sampling_temp: float = Form(default=DEFAULT_SAMPLING_TEMP),
+    include_log_probs: bool = Form(default=False),
+    constraints: str | None = Form(default=None),
+):
+    """Queue a design job and return its ID immediately.
+
+    Takes ``pdb_file`` or ``structure_id`` like ``/design``. Jobs whose
+    predicted time exceeds ``JOB_TIMEOUT_SECONDS`` get a 400, or a 429
+    while the scheduler's estimate is not yet calibrated.
+    """
+    try:
+        params = parse_design_params(
+            chains, num_sequences, sampling_temp, include_log_probs, constraints
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    try:
+        source = await _receive_structure(pdb_file, structure_id)
+    except ValueError as e:
+        return _upload_error(e)
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
+    try:
+        with timed("validate"):
+            backbone = await run_blocking(
+                validation_executor,
+                partial(_load_backbone, source, params.chains),
+            )
+        constraints = _compile_constraints(backbone, params)
+        scheduler.admit(
+            design_work(num_positions(backbone), params.num_sequences),
+            JOB_TIMEOUT_SECONDS,
+        )
+        return job_manager.submit(
+            partial(
+                _run_design_job,
+                source,
+                params,
+                backbone,
+                constraints,
+                _client_id(request),
+            ),
+            total=params.num_sequences,
+        )
+    except PDBValidationError as e:
+        source.close()
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except StructureNotFoundError as e:
+        source.close()
+        return _structure_not_found(e)
+    except SchedulerBusyError as e:
+        source.close()
+        return _busy_response(str(e), e.retry_after)
+    except Exception:
+        source.close()
+        logger.exception("Unexpected error in /jobs")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": "Internal server error"},
+        )
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+def get_job(job_id: str):
+    """Job status and progress (sequences completed of total)."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    return job
+
+
+@app.get("/jobs/{job_id}/result", response_model=DesignResponse)
+def get_job_result(job_id: str, request: Request):
+    """Result of a finished job. 409 until the job has succeeded.
+
+    Negotiates JSON or MessagePack like ``/design``.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    result = job_manager.get_result(job_id)
+    if result is None:
+        detail = f"Job is {job.status.value}"
+        if job.error:
+            detail += f": {job.error}"
+        return JSONResponse(status_code=409, content={"detail": detail})
+    return _design_content(request, result)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobInfo)
+def cancel_job(job_id: str):
+    """Cancel a queued or running job, killing its ProteinMPNN work."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    return job
+
+
+def _register_structure(upload: SpooledUpload) -> StoredStructure:
+    """Validate an upload once, for any chain a design could ask for, and store it."""
+    data = upload.read_bytes()
+    backbone = validate_structure(data, upload.name, [])
+    if not any(chain.num_ca >= MIN_CA_ATOMS for chain in backbone.chains.values()):
+        raise PDBValidationError(f"No chain has {MIN_CA_ATOMS} or more CA atoms")
+    fmt = structure_format(upload.name)
+    return structure_store.put(backbone, structure_digest(data, fmt), fmt, len(data))
+
+
+@app.post("/structures", response_model=StructureInfo, status_code=201)
+async def register_structure(pdb_file: UploadFile = File(...)):
+    """Validate and store a structure, to design later by ``structure_id``.
+
+    Registering the same coordinates again returns the existing entry.
+    """
+    try:
+        with timed("upload"):
+            upload = await save_upload(pdb_file, require_atom_records=True)
+    except (UploadTooLargeError, PDBValidationError) as e:
+        return _upload_error(e)
+    try:
+        with timed("validate"):
+            stored = await run_blocking(
+                validation_executor, partial(_register_structure, upload)
+            )
+        return asdict(stored)
+    except PDBValidationError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    except Exception:
+        logger.exception("Unexpected error in /structures")
+        return JSONResponse(
+            status_code=500,
+            content={"detail": "Internal server error"},
+        )
+    finally:
+        upload.close()
+
+
+@app.get("/structures", response_model=list[StructureInfo])
+def list_structures():
+    """Every registered structure, oldest first."""
+    return [asdict(s) for s in structure_store.structures()]
+
+
+@app.get("/structures/{structure_id}", response_model=StructureInfo)
+def get_structure(structure_id: str):
+    try:
+        return asdict(structure_store.info(structure_id))
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
+
+
+@app.delete("/structures/{structure_id}", response_model=StructureInfo)
+def delete_structure(structure_id: str):
+    """Remove a registered structure. Designs already using it finish."""
+    try:
+        return asdict(structure_store.delete(structure_id))
+    except StructureNotFoundError as e:
+        return _structure_not_found(e)
 
 
-app.mount("/", StaticFiles(directory=str(APP_DIR / "static"), html=True), name="static")
\ No newline at end of file
+app.mount("/", StaticFiles(directory=str(APP_DIR / "static"), html=True), name="static")
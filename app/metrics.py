@@ -0,0 +1,295 @@
+"""Latency histograms and counters, exported in Prometheus text format.
+
+Stage timings are recorded with ``timed(stage)``. Besides feeding the
+process-wide histogram, each span is added to the current request's
+``Timings`` (if any), which backs the optional ``X-Timing`` header.
+"""
+
+import contextvars
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable
+
+# Seconds; spans from a cache hit (~1 ms) to a slow subprocess run
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+    60.0, 120.0, 300.0,
+)
+THROUGHPUT_BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Actual / predicted design time; 1.0 is a perfect prediction
+COST_RATIO_BUCKETS = (0.25, 0.5, 0.75, 0.9, 1.1, 1.5, 2.0, 4.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> (per-bucket counts, sum, count)
+        self._series: dict[LabelValues, tuple[list[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total, n = self._series.get(
+                label_values, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[label_values] = (counts, total + value, n + 1)
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, n) in sorted(self._series.items()):
+                for bound, c in zip(self.buckets, counts):
+                    labels = _format_labels(self.labels, values, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{labels} {c}")
+                labels = _format_labels(self.labels, values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {n}")
+                plain = _format_labels(self.labels, values)
+                lines.append(f"{self.name}_sum{plain} {total:g}")
+                lines.append(f"{self.name}_count{plain} {n}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from ``collect()``, which returns label values -> value."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        collect: Callable[[], dict[LabelValues, float]],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for values, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {value:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "mpnn_stage_seconds",
+    "Time spent in each stage of a design request",
+    labels=("stage",),
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "mpnn_request_seconds",
+    "End-to-end HTTP request latency",
+    labels=("method", "path"),
+))
+RESPONSES = registry.register(Counter(
+    "mpnn_responses_total",
+    "HTTP responses by status code",
+    labels=("method", "path", "status"),
+))
+STREAM_ERRORS = registry.register(Counter(
+    "mpnn_stream_errors_total",
+    "Error events sent on /design/stream after a 200, by their status code",
+    labels=("status",),
+))
+TIME_TO_FIRST_SEQUENCE = registry.register(Histogram(
+    "mpnn_time_to_first_sequence_seconds",
+    "Time from request start to the first streamed sequence",
+))
+RESIDUES_DESIGNED = registry.register(Counter(
+    "mpnn_residues_designed_total",
+    "Designed residues (residues x sequences) produced",
+))
+RESIDUES_PER_SECOND = registry.register(Histogram(
+    "mpnn_residues_per_second",
+    "Per-request inference throughput (designed residues / inference seconds)",
+    buckets=THROUGHPUT_BUCKETS,
+))
+FEATURE_CACHE_LOOKUPS = registry.register(Counter(
+    "mpnn_feature_cache_lookups_total",
+    "Featurized-structure cache lookups in the warm workers, by result",
+    labels=("result",),
+))
+WORKER_RESTARTS = registry.register(Counter(
+    "mpnn_worker_restarts_total",
+    "ProteinMPNN worker processes replaced, by reason (crash)",
+    labels=("reason",),
+))
+FEATURE_CACHE_EVICTIONS = registry.register(Counter(
+    "mpnn_feature_cache_evictions_total",
+    "Featurized structures evicted from worker caches to stay within FEATURE_CACHE_MB",
+))
+SCHEDULER_WAIT_SECONDS = registry.register(Histogram(
+    "mpnn_scheduler_wait_seconds",
+    "Time designs waited in the scheduler queue for a slot",
+))
+DESIGN_COST_RATIO = registry.register(Histogram(
+    "mpnn_design_cost_ratio",
+    "Actual over predicted design time, per finished design",
+    buckets=COST_RATIO_BUCKETS,
+))
+
+
+# --- Per-request timings (X-Timing header) ---
+
+class Timings:
+    """Stage durations of one request, in the order they finished."""
+
+    def __init__(self):
+        self.spans: list[tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def header(self) -> str:
+        """Server-Timing syntax, durations in milliseconds."""
+        return ", ".join(f"{stage};dur={s * 1000:.1f}" for stage, s in self.spans)
+
+
+current_timings: contextvars.ContextVar[Timings | None] = contextvars.ContextVar(
+    "current_timings", default=None
+)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time the enclosed block as ``stage``, even if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_throughput(residues: int, num_sequences: int, seconds: float) -> None:
+    designed = residues * num_sequences
+    RESIDUES_DESIGNED.inc(amount=designed)
+    if seconds > 0:
+        RESIDUES_PER_SECOND.observe(designed / seconds)
+
+
+# --- Process memory and age ---
+
+_PAGE_SIZE = resource.getpagesize()
+
+
+def rss_bytes(pid: int | str = "self") -> int | None:
+    """Resident set size of a process, or None where /proc isn't available."""
+    try:
+        fields = Path(f"/proc/{pid}/statm").read_text().split()
+    except OSError:
+        return None
+    return int(fields[1]) * _PAGE_SIZE
+
+
+def pss_bytes(pid: int | str = "self") -> int | None:
+    """Proportional set size: RSS with shared pages split between their users.
+
+    Summed over a process tree this is the memory the tree really costs,
+    where summed RSS counts shared libraries and weights once per process.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_age_seconds(pid: int | str = "self") -> float | None:
+    """Seconds since a process started, or None where /proc isn't available."""
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text()
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except OSError:
+        return None
+    # starttime is field 22; count from after the command name, which may hold spaces
+    start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+    return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+def children_max_rss_bytes() -> int:
+    """Peak RSS of the largest finished child process (e.g. a design subprocess)."""
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
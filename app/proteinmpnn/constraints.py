@@ -0,0 +1,141 @@
+"""Compile design constraints into index arrays aligned with the model input.
+
+Constraints arrive keyed by chain ID and residue number. They are resolved
+once per request against the parsed backbone into positions in the
+concatenated sequence ``tied_featurize`` builds (designed chains, then the
+fixed ones, each alphabetically), so the engine only applies masks and
+index lists. The featurized structure stays cacheable: constraints never
+change the features themselves.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.proteinmpnn.parser import ALPHABET
+from app.schemas import DesignConstraints
+from app.structure import Backbone
+from app.validation import PDBValidationError
+
+
+class ConstraintError(PDBValidationError):
+    """Raised when constraints don't fit the structure. Maps to HTTP 400"""
+
+
+@dataclass
+class CompiledConstraints:
+    """Constraints as positions in the model's concatenated chain layout."""
+
+    chain_order: list[str]
+    offsets: dict[str, int]
+    # (positions,) True where a designed chain keeps its native residue
+    fixed: np.ndarray
+    # Groups of positions sampled as one residue
+    tied: list[np.ndarray] = field(default_factory=list)
+    # (21,) added to the log-probabilities, and letters never sampled
+    bias: np.ndarray = field(default_factory=lambda: np.zeros(len(ALPHABET), np.float32))
+    omit: np.ndarray = field(default_factory=lambda: np.zeros(len(ALPHABET), bool))
+
+    def _chain_position(self, index: int) -> tuple[str, int]:
+        """(chain, 1-based position in the chain) of a global position."""
+        chain = max(
+            (c for c in self.chain_order if self.offsets[c] <= index),
+            key=self.offsets.__getitem__,
+        )
+        return chain, index - self.offsets[chain] + 1
+
+    def mpnn_inputs(self, name: str, designed: list[str]) -> dict:
+        """The jsonl inputs protein_mpnn_run.py takes, for structure ``name``."""
+        fixed = {c: [] for c in designed}
+        for index in np.flatnonzero(self.fixed):
+            chain, position = self._chain_position(int(index))
+            fixed[chain].append(position)
+        tied = []
+        for group in self.tied:
+            entry: dict[str, list[int]] = {}
+            for index in group:
+                chain, position = self._chain_position(int(index))
+                entry.setdefault(chain, []).append(position)
+            tied.append(entry)
+        return {
+            "fixed_positions": {name: fixed},
+            "tied_positions": {name: tied} if tied else None,
+            "bias_AA": {aa: float(b) for aa, b in zip(ALPHABET, self.bias) if b},
+            "omit_AAs": "".join(aa for aa, o in zip(ALPHABET, self.omit) if o),
+        }
+
+
+def _positions(backbone: Backbone, chain_id: str, residues: list[int]) -> np.ndarray:
+    """Chain-local indices of residue numbers, in the order given."""
+    numbers = backbone.chains[chain_id].residue_numbers
+    index = {int(n): i for i, n in reversed(list(enumerate(numbers)))}
+    missing = [r for r in residues if r not in index]
+    if missing:
+        raise ConstraintError(
+            f"Residue(s) {missing} not found in chain {chain_id} "
+            f"(residues {int(numbers[0])}-{int(numbers[-1])})"
+        )
+    return np.array([index[r] for r in residues], dtype=np.int64)
+
+
+def _check_designed(chain_ids, designed: list[str], what: str) -> None:
+    outside = sorted(set(chain_ids) - set(designed))
+    if outside:
+        raise ConstraintError(
+            f"{what} refer to chain(s) {outside}, which are not designed"
+        )
+
+
+def compile_constraints(
+    backbone: Backbone, chains: list[str], constraints: DesignConstraints
+) -> CompiledConstraints:
+    """Resolve ``constraints`` against ``backbone`` with ``chains`` designed.
+
+    Raises:
+        ConstraintError: If a constraint names an undesigned chain or a
+            missing residue, ties chains of different lengths or unequal
+            residue lists, or ties a position twice or a fixed position to a
+            designed one.
+    """
+    chain_order = sorted(chains) + sorted(c for c in backbone.chains if c not in chains)
+    offsets, total = {}, 0
+    for chain_id in chain_order:
+        offsets[chain_id] = total
+        total += len(backbone.chains[chain_id].sequence)
+
+    fixed = np.zeros(total, dtype=bool)
+    _check_designed(constraints.fixed_positions, chains, "fixed_positions")
+    for chain_id, residues in constraints.fixed_positions.items():
+        fixed[offsets[chain_id] + _positions(backbone, chain_id, residues)] = True
+
+    # One row per tie group, one column per tied chain
+    tied: list[np.ndarray] = []
+    for group in constraints.tied_chains:
+        _check_designed(group, chains, "tied_chains")
+        lengths = {c: len(backbone.chains[c].sequence) for c in group}
+        if len(set(lengths.values())) > 1:
+            raise ConstraintError(f"Tied chains differ in length: {lengths}")
+        length = lengths[group[0]]
+        tied += list(np.stack([offsets[c] + np.arange(length) for c in group], axis=1))
+    for entry in constraints.tied_positions:
+        _check_designed(entry, chains, "tied_positions")
+        columns = [
+            offsets[c] + _positions(backbone, c, residues) for c, residues in entry.items()
+        ]
+        if len({len(col) for col in columns}) > 1:
+            raise ConstraintError("Each tied_positions entry needs equally long residue lists")
+        tied += list(np.stack(columns, axis=1))
+
+    seen = np.zeros(total, dtype=bool)
+    for group in tied:
+        if seen[group].any():
+            raise ConstraintError("A residue is in more than one tied group")
+        seen[group] = True
+        if fixed[group].any() and not fixed[group].all():
+            raise ConstraintError("Tied residues must be all fixed or all designed")
+
+    bias = np.zeros(len(ALPHABET), dtype=np.float32)
+    for aa, value in constraints.bias_aa.items():
+        bias[ALPHABET.index(aa)] = value
+    omit = np.array([aa in constraints.omit_aa for aa in ALPHABET])
+    return CompiledConstraints(chain_order, offsets, fixed, tied, bias, omit)
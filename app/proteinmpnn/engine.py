@@ -0,0 +1,322 @@
+"""In-process ProteinMPNN inference.
+
+Mirrors the sampling loop of protein_mpnn_run.py, but keeps the model
+resident so callers only pay for the torch import and checkpoint load once.
+"""
+
+import sys
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from app.cache import FeatureCache
+from app.config import DESIGN_SEED, MODEL_WEIGHTS_FILE, PROTEINMPNN_REPO
+from app.proteinmpnn.constraints import CompiledConstraints
+from app.proteinmpnn.parser import ALPHABET, DesignedSample, ParsedFasta
+from app.proteinmpnn.tuning import (
+    CpuProfile,
+    apply_threads,
+    knn_chunked,
+    optimize_model,
+    precision_context,
+    sample_batch_size,
+)
+from app.structure import Backbone
+
+HIDDEN_DIM = 128
+NUM_LAYERS = 3
+
+
+def import_mpnn_utils():
+    """Import the vendored protein_mpnn_utils module."""
+    repo = str(PROTEINMPNN_REPO)
+    if repo not in sys.path:
+        sys.path.insert(0, repo)
+    import protein_mpnn_utils
+
+    return protein_mpnn_utils
+
+
+def _split_chains(
+    seq: str, chain_lengths: list[int], chain_letters: list[str]
+) -> str:
+    """Reorder per-chain segments alphabetically and join with '/'.
+
+    Same output layout as protein_mpnn_run.py writes to its FASTA.
+    """
+    segments = []
+    start = 0
+    for length in chain_lengths:
+        segments.append(seq[start:start + length])
+        start += length
+    order = np.argsort(chain_letters)
+    return "/".join(segments[i] for i in order)
+
+
+def _load_checkpoint(torch, weights_path: Path) -> dict:
+    """Load the checkpoint memory-mapped, so workers share one page-cache copy.
+
+    Falls back to a plain load for checkpoints in the legacy (non-zip) format.
+    """
+    try:
+        return torch.load(str(weights_path), map_location="cpu", mmap=True)
+    except RuntimeError:
+        return torch.load(str(weights_path), map_location="cpu")
+
+
+class DesignEngine:
+    """A loaded ProteinMPNN model, ready to sample sequences.
+
+    ``profile`` sets threads, precision and compilation; the default comes
+    from the ``TORCH_*``/``INFERENCE_*`` settings.
+    """
+
+    def __init__(
+        self, weights_path: Path = MODEL_WEIGHTS_FILE, profile: CpuProfile | None = None
+    ):
+        import torch
+
+        self.torch = torch
+        self.utils = import_mpnn_utils()
+        self.profile = profile or CpuProfile()
+        apply_threads(torch, self.profile)
+
+        checkpoint = _load_checkpoint(torch, weights_path)
+        model = self.utils.ProteinMPNN(
+            ca_only=False,
+            num_letters=21,
+            node_features=HIDDEN_DIM,
+            edge_features=HIDDEN_DIM,
+            hidden_dim=HIDDEN_DIM,
+            num_encoder_layers=NUM_LAYERS,
+            num_decoder_layers=NUM_LAYERS,
+            augment_eps=0.0,
+            k_neighbors=checkpoint["num_edges"],
+        )
+        # assign=True keeps the memory-mapped tensors instead of copying them
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        model.eval()
+        self.model = optimize_model(torch, model, self.profile)
+        # Neighbour search in row blocks: linear rather than quadratic memory
+        features = self.model.features
+        features._dist = lambda X, mask, eps=1e-6: knn_chunked(
+            torch, X, mask, features.top_k, eps
+        )
+
+        self.omit_aas = np.array([aa == "X" for aa in ALPHABET], dtype=np.float32)
+        self.bias_aas = np.zeros(len(ALPHABET))
+        self.feature_cache = FeatureCache()
+
+    def _featurize(self, items: list[tuple[Backbone, list[str]]]) -> tuple:
+        """``tied_featurize`` output for ``items``, from the feature cache if seen.
+
+        Keyed by structure digest and designed chains: temperature and
+        sequence count only affect decoding. Cached tensors are only read,
+        never modified in place.
+        """
+        key = tuple(
+            (backbone.digest(), tuple(sorted(chains))) for backbone, chains in items
+        )
+        features = self.feature_cache.get(key)
+        if features is not None:
+            return features
+
+        proteins = []
+        chain_id_dict = {}
+        for i, (backbone, chains) in enumerate(items):
+            # Already parsed by validation; no re-read of the PDB file
+            protein = backbone.to_mpnn_dict()
+            # chain_id_dict is keyed by name, so names must be unique
+            protein["name"] = f"item_{i}"
+            all_chains = [
+                k[len("seq_chain_"):] for k in protein if k.startswith("seq_chain_")
+            ]
+            fixed = [c for c in all_chains if c not in chains]
+            chain_id_dict[protein["name"]] = (list(chains), fixed)
+            proteins.append(protein)
+
+        features = self.utils.tied_featurize(proteins, "cpu", chain_id_dict)
+        nbytes = sum(
+            t.element_size() * t.nelement()
+            for t in features
+            if isinstance(t, self.torch.Tensor)
+        )
+        self.feature_cache.put(key, features, nbytes)
+        return features
+
+    def design(
+        self,
+        backbone: Backbone,
+        chains: list[str],
+        num_sequences: int = 3,
+        sampling_temp: float = 0.1,
+        progress: Callable[[int, int], None] | None = None,
+        on_sample: Callable[[DesignedSample], None] | None = None,
+        include_log_probs: bool = False,
+        constraints: CompiledConstraints | None = None,
+    ) -> ParsedFasta:
+        """Design sequences for the given chains of a parsed structure.
+
+        Chains not listed in ``chains`` are kept fixed as structural context.
+        ``progress(completed, total)`` is called after each sampled sequence,
+        and ``on_sample(sample)`` with the sequence itself, for streaming.
+        ``constraints`` (compiled against this backbone and ``chains``) fix,
+        tie and bias residues; tied residues are decoded together in one pass.
+        """
+        return self.design_batch(
+            [(backbone, chains)], num_sequences, sampling_temp, progress,
+            on_sample=None if on_sample is None else lambda _i, s: on_sample(s),
+            include_log_probs=include_log_probs,
+            constraints=constraints,
+        )[0]
+
+    def design_batch(
+        self,
+        items: list[tuple[Backbone, list[str]]],
+        num_sequences: int = 3,
+        sampling_temp: float = 0.1,
+        progress: Callable[[int, int], None] | None = None,
+        on_sample: Callable[[int, DesignedSample], None] | None = None,
+        include_log_probs: bool = False,
+        constraints: CompiledConstraints | None = None,
+    ) -> list[ParsedFasta]:
+        """Design several structures in one padded batch.
+
+        ``items`` are ``(backbone, chains)`` pairs. Each sampling step decodes
+        one sequence for every structure, so the batch should hold structures
+        of similar length to keep padding small. Samples are decoded in
+        batches sized by ``sample_batch_size``. ``on_sample(item, sample)``
+        is called as each sequence is decoded.
+
+        Scores come from the same scoring pass protein_mpnn_run.py makes;
+        ``include_log_probs`` also keeps its per-residue log-probabilities.
+        ``constraints`` need a single item.
+        """
+        if constraints is not None and len(items) != 1:
+            raise ValueError("Constraints apply to one structure at a time")
+        torch = self.torch
+        torch.manual_seed(DESIGN_SEED)
+        with torch.no_grad(), precision_context(torch, self.profile):
+            (
+                X, S, mask, _lengths, chain_M, chain_encoding_all,
+                _chain_list_list, _visible_list_list, masked_list_list,
+                masked_chain_length_list_list, chain_M_pos, omit_AA_mask,
+                residue_idx, _dihedral_mask, _tied_pos, pssm_coef, pssm_bias,
+                pssm_log_odds_all, bias_by_res_all, tied_beta,
+            ) = self._featurize(items)
+            pssm_log_odds_mask = (pssm_log_odds_all > 0.0).float()
+
+            omit_aas, bias_aas, tied_pos = self.omit_aas, self.bias_aas, []
+            if constraints is not None:
+                # Out of place: the featurized tensors are shared via the cache
+                chain_M_pos = chain_M_pos * torch.from_numpy(~constraints.fixed).float()
+                omit_aas = np.maximum(omit_aas, constraints.omit.astype(np.float32))
+                bias_aas = bias_aas + constraints.bias
+                tied_pos = [group.tolist() for group in constraints.tied]
+
+            def to_seq(S_row, b: int) -> str:
+                return _split_chains(
+                    self.utils._S_to_seq(S_row, chain_M[b]),
+                    masked_chain_length_list_list[b],
+                    masked_list_list[b],
+                )
+
+            def designed_rows(log_probs_row, b: int) -> np.ndarray:
+                """Rows of the designed positions, in the order ``to_seq`` joins them."""
+                rows = log_probs_row[chain_M[b] > 0].float().numpy()
+                bounds = np.cumsum([0, *masked_chain_length_list_list[b]])
+                order = np.argsort(masked_list_list[b])
+                return np.concatenate([rows[bounds[i]:bounds[i + 1]] for i in order])
+
+            natives = [to_seq(S[b], b) for b in range(len(items))]
+            designed: list[list[DesignedSample]] = [[] for _ in items]
+
+            # Decode ``copies`` samples of every item per pass: the batch is
+            # tiled so the decoder steps over positions once per pass, not
+            # once per sample
+            num_items = len(items)
+            copies = sample_batch_size(num_items * X.shape[1], num_sequences)
+
+            def tile(t):
+                return t.repeat(copies, *([1] * (t.dim() - 1)))
+
+            (
+                X, S, mask, chain_M, chain_encoding_all, residue_idx,
+                chain_M_pos, omit_AA_mask, pssm_coef, pssm_bias,
+                pssm_log_odds_mask, bias_by_res_all,
+            ) = map(tile, (
+                X, S, mask, chain_M, chain_encoding_all, residue_idx,
+                chain_M_pos, omit_AA_mask, pssm_coef, pssm_bias,
+                pssm_log_odds_mask, bias_by_res_all,
+            ))
+            mask_for_loss = mask * chain_M * chain_M_pos
+
+            for first in range(0, num_sequences, copies):
+                randn = torch.randn(chain_M.shape)
+                sample_args = dict(
+                    mask=mask,
+                    temperature=sampling_temp,
+                    omit_AAs_np=omit_aas,
+                    bias_AAs_np=bias_aas,
+                    chain_M_pos=chain_M_pos,
+                    omit_AA_mask=omit_AA_mask,
+                    pssm_coef=pssm_coef,
+                    pssm_bias=pssm_bias,
+                    pssm_multi=0.0,
+                    pssm_log_odds_flag=False,
+                    pssm_log_odds_mask=pssm_log_odds_mask,
+                    pssm_bias_flag=False,
+                    bias_by_res=bias_by_res_all,
+                )
+                if tied_pos:
+                    # Each tied group is decoded as one step, so symmetric
+                    # chains come out identical in a single pass
+                    sample = self.model.tied_sample(
+                        X, randn, S, chain_M, chain_encoding_all, residue_idx,
+                        tied_pos=tied_pos, tied_beta=tied_beta, **sample_args,
+                    )
+                else:
+                    sample = self.model.sample(
+                        X, randn, S, chain_M, chain_encoding_all, residue_idx,
+                        **sample_args,
+                    )
+                S_sample = sample["S"]
+                # Same scoring pass protein_mpnn_run.py writes to its headers
+                log_probs = self.model(
+                    X, S_sample, mask, chain_M * chain_M_pos, residue_idx,
+                    chain_encoding_all, randn,
+                    use_input_decoding_order=True,
+                    decoding_order=sample["decoding_order"],
+                )
+                scores = self.utils._scores(S_sample, log_probs, mask_for_loss)
+                global_scores = self.utils._scores(S_sample, log_probs, mask)
+                recovery = ((S_sample == S).float() * mask_for_loss).sum(-1) / (
+                    mask_for_loss.sum(-1)
+                )
+                done = min(first + copies, num_sequences)
+                for n in range(first, done):
+                    for b in range(num_items):
+                        # Row order of the tiled batch: copy-major, then item
+                        row = (n - first) * num_items + b
+                        result = DesignedSample(
+                            index=n,
+                            sequence=to_seq(S_sample[row], b),
+                            score=round(float(scores[row]), 4),
+                            seq_recovery=round(float(recovery[row]), 4),
+                            global_score=round(float(global_scores[row]), 4),
+                            log_probs=(
+                                designed_rows(log_probs[row], b)
+                                if include_log_probs else None
+                            ),
+                        )
+                        designed[b].append(result)
+                        if on_sample is not None:
+                            on_sample(b, result)
+                if progress is not None:
+                    progress(done, num_sequences)
+
+        return [
+            ParsedFasta.from_samples(native, samples)
+            for native, samples in zip(natives, designed)
+        ]
@@ -1,22 +1,107 @@
-"""Parse ProteinMPNN FASTA output."""
+"""Parse (and write) ProteinMPNN FASTA output."""
 
+import re
 from pathlib import Path
 from typing import NamedTuple
 
+import numpy as np
+
+_HEADER_FIELD = re.compile(r"(\w+)=([-\d.eE]+)")
+_DESIGNED_CHAINS = re.compile(r"designed_chains=\[([^\]]*)\]")
+
+# Columns of the per-residue log-probabilities (ProteinMPNN's token order)
+ALPHABET = "ACDEFGHIKLMNPQRSTVWYX"
+
+
+class DesignedSample(NamedTuple):
+    """One designed sequence, as soon as it has been sampled."""
+
+    index: int
+    sequence: str
+    score: float | None = None  # mean NLL over designed positions
+    seq_recovery: float | None = None  # fraction identical to native
+    global_score: float | None = None  # mean NLL over all resolved positions
+    # (designed residues, 21) log-probabilities from the scoring pass, rows in
+    # the order of ``sequence`` without the '/' separators
+    log_probs: np.ndarray | None = None
+
+
+def _head(values: list | None, n: int) -> list | None:
+    return None if values is None else values[:n]
+
+
+def _at(values: list | None, i: int):
+    return None if values is None else values[i]
+
 
 class ParsedFasta(NamedTuple):
     native_sequence: str
     designed_sequences: list[str]
+    # Per designed sequence; None when the producer didn't report them
+    scores: list[float] | None = None
+    seq_recoveries: list[float] | None = None
+    global_scores: list[float] | None = None
+    log_probs: list[np.ndarray] | None = None
+    # Came from the protein_mpnn_run.py fallback: another sampling stream
+    # than the workers', and never log-probabilities
+    from_subprocess: bool = False
+
+    def head(self, n: int) -> "ParsedFasta":
+        """The first ``n`` designed sequences (runs may round up to a full batch)."""
+        return self._replace(
+            designed_sequences=self.designed_sequences[:n],
+            scores=_head(self.scores, n),
+            seq_recoveries=_head(self.seq_recoveries, n),
+            global_scores=_head(self.global_scores, n),
+            log_probs=_head(self.log_probs, n),
+        )
+
+    def samples(self) -> list[DesignedSample]:
+        return [
+            DesignedSample(
+                index=i,
+                sequence=seq,
+                score=_at(self.scores, i),
+                seq_recovery=_at(self.seq_recoveries, i),
+                global_score=_at(self.global_scores, i),
+                log_probs=_at(self.log_probs, i),
+            )
+            for i, seq in enumerate(self.designed_sequences)
+        ]
+
+    @classmethod
+    def from_samples(
+        cls, native_sequence: str, samples: list[DesignedSample]
+    ) -> "ParsedFasta":
+        """Collect samples (in index order) back into per-field lists."""
+
+        def column(field: str) -> list | None:
+            values = [getattr(s, field) for s in samples]
+            return None if any(v is None for v in values) else values
+
+        return cls(
+            native_sequence=native_sequence,
+            designed_sequences=[s.sequence for s in samples],
+            scores=column("score"),
+            seq_recoveries=column("seq_recovery"),
+            global_scores=column("global_score"),
+            log_probs=column("log_probs") if samples else None,
+        )
 
 
 def parse_fasta(fasta_path: Path) -> ParsedFasta:
     """Extract native and designed sequences from a ProteinMPNN FASTA file.
 
     The first entry is the native sequence.
-    Subsequent entries are designed sequences.
+    Subsequent entries are designed sequences; their headers carry
+    ``score=``, ``global_score=`` and ``seq_recovery=`` fields, which are
+    collected too.
     """
     native_sequence: str = ""
     designed: list[str] = []
+    scores: list[float] = []
+    global_scores: list[float] = []
+    recoveries: list[float] = []
     current_seq_lines: list[str] = []
     entry_index = -1
 
@@ -24,6 +109,13 @@ def parse_fasta(fasta_path: Path) -> ParsedFasta:
         for line in f:
             line = line.strip()
             if line.startswith(">"):
+                if entry_index >= 0:
+                    fields = dict(_HEADER_FIELD.findall(line))
+                    if "score" in fields and "seq_recovery" in fields:
+                        scores.append(float(fields["score"]))
+                        recoveries.append(float(fields["seq_recovery"]))
+                    if "global_score" in fields:
+                        global_scores.append(float(fields["global_score"]))
                 if current_seq_lines:
                     seq = "".join(current_seq_lines)
                     if entry_index == 0:
@@ -42,4 +134,40 @@ def parse_fasta(fasta_path: Path) -> ParsedFasta:
         else:
             designed.append(seq)
 
-    return ParsedFasta(native_sequence=native_sequence, designed_sequences=designed)
+    complete = len(scores) == len(designed)
+    return ParsedFasta(
+        native_sequence=native_sequence,
+        designed_sequences=designed,
+        scores=scores if complete else None,
+        seq_recoveries=recoveries if complete else None,
+        global_scores=global_scores if len(global_scores) == len(designed) else None,
+    )
+
+
+def read_designed_chains(fasta_path: Path) -> list[str] | None:
+    """Chains the native entry's header lists as designed; None if it doesn't say."""
+    with open(fasta_path) as f:
+        match = _DESIGNED_CHAINS.search(f.readline())
+    return None if match is None else re.findall(r"'([^']*)'", match.group(1))
+
+
+def write_fasta(
+    fasta_path: Path,
+    name: str,
+    result: ParsedFasta,
+    chains: list[str],
+    sampling_temp: float,
+) -> None:
+    """Write ``result`` in ProteinMPNN's FASTA layout, which ``parse_fasta`` reads back.
+
+    Header fields the producer didn't report are left out.
+    """
+    lines = [f">{name}, designed_chains={sorted(chains)}", result.native_sequence]
+    for sample in result.samples():
+        fields = [f"T={sampling_temp}", f"sample={sample.index + 1}"]
+        for field in ("score", "global_score", "seq_recovery"):
+            value = getattr(sample, field)
+            if value is not None:
+                fields.append(f"{field}={value:.4f}")
+        lines += [">" + ", ".join(fields), sample.sequence]
+    Path(fasta_path).write_text("\n".join(lines) + "\n")
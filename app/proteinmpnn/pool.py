@@ -0,0 +1,504 @@
+"""Pool of long-lived ProteinMPNN worker processes.
+
+Each worker loads the model weights once at startup and then serves design
+jobs from its own inbox queue. Results come back on the worker's own pipe,
+which a collector thread in the parent drains into
+``concurrent.futures.Future``s. Nothing a worker writes to is shared with
+another worker, so one that is killed mid-write can't wedge the rest.
+
+With the ``forkserver`` start method, workers are forked from a server
+process that has already imported torch and the engine, so those pages are
+shared copy-on-write. The weights are memory-mapped (see ``DesignEngine``),
+so every worker reads the same page-cache copy. A supervisor thread
+replaces workers that die, with a fresh inbox and pipe; the jobs that were
+queued on them fail.
+
+Cancellation is cooperative: cancelled job IDs are written to an array
+shared with the workers, which check it before starting a job and after
+every sampling pass.
+"""
+
+import itertools
+import logging
+import multiprocessing as mp
+import multiprocessing.connection
+import os
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Sequence
+
+from app.config import (
+    MODEL_WEIGHTS_FILE,
+    WORKER_CHECK_INTERVAL_SECONDS,
+    WORKER_POOL_SIZE,
+    WORKER_START_METHOD,
+)
+from app.metrics import (
+    FEATURE_CACHE_EVICTIONS,
+    FEATURE_CACHE_LOOKUPS,
+    STAGE_SECONDS,
+    WORKER_RESTARTS,
+)
+from app.proteinmpnn.tuning import threads_per_process
+
+logger = logging.getLogger(__name__)
+
+# Slots in the shared array of cancelled job IDs; job ``j`` uses slot
+# ``j % _CANCEL_SLOTS``. A cancellation overwritten before its worker sees
+# it only costs the compute, since the parent has already dropped the job.
+_CANCEL_SLOTS = 4096
+
+# Result pipe message tags
+_READY = "ready"
+_LOAD_FAILED = "load_failed"
+_STARTED = "started"
+_PROGRESS = "progress"
+_SAMPLE = "sample"
+_DONE = "done"
+_FAILED = "failed"
+_CACHE_STATS = "cache_stats"
+
+# Imported once by the fork server and inherited by every worker
+_FORKSERVER_PRELOAD = ["torch", "app.proteinmpnn.engine"]
+
+ProgressCallback = Callable[[int, int], None]
+SampleCallback = Callable[..., None]
+
+
+def _default_engine_factory(weights_path: Path):
+    from app.proteinmpnn.engine import DesignEngine
+
+    return DesignEngine(weights_path)
+
+
+class _JobCancelled(BaseException):
+    """Unwinds the engine out of a cancelled job. A BaseException so engine
+    code that catches Exception doesn't swallow it."""
+
+
+def _picklable_error(exc: Exception) -> Exception:
+    """Exceptions from torch/vendored code may not survive pickling."""
+    try:
+        pickle.loads(pickle.dumps(exc))
+        return exc
+    except Exception:
+        return RuntimeError(f"{type(exc).__name__}: {exc}")
+
+
+def _worker_main(
+    worker_id: int,
+    engine_factory: Callable[[Path], Any],
+    weights_path: Path,
+    num_threads: int,
+    inbox: mp.Queue,
+    outbox: mp.connection.Connection,
+    cancelled: Sequence[int],
+) -> None:
+    # Must be set before torch is imported; N workers each using every core
+    # would oversubscribe the CPU
+    os.environ.setdefault("OMP_NUM_THREADS", str(num_threads))
+    if "torch" in sys.modules:
+        # Preloaded by the fork server, before the variable above was set
+        sys.modules["torch"].set_num_threads(num_threads)
+    start = time.perf_counter()
+    try:
+        engine = engine_factory(weights_path)
+    except Exception as e:
+        outbox.send((_LOAD_FAILED, worker_id, repr(e)))
+        return
+    outbox.send((_READY, worker_id, time.perf_counter() - start))
+
+    while True:
+        msg = inbox.get()
+        if msg is None:
+            return
+        job_id, method, kwargs, wants_samples = msg
+        if cancelled[job_id % _CANCEL_SLOTS] == job_id:
+            continue  # cancelled while queued
+        outbox.send((_STARTED, job_id, worker_id))
+
+        def check(job_id: int = job_id) -> None:
+            if cancelled[job_id % _CANCEL_SLOTS] == job_id:
+                raise _JobCancelled()
+
+        def progress(done: int, total: int, job_id: int = job_id) -> None:
+            check()
+            outbox.send((_PROGRESS, job_id, (done, total)))
+
+        def on_sample(*args, job_id: int = job_id) -> None:
+            check()
+            outbox.send((_SAMPLE, job_id, args))
+
+        if wants_samples:
+            kwargs["on_sample"] = on_sample
+
+        try:
+            result = getattr(engine, method)(progress=progress, **kwargs)
+        except _JobCancelled:
+            pass  # the parent has already cancelled the future
+        except Exception as e:
+            outbox.send((_FAILED, job_id, _picklable_error(e)))
+        else:
+            outbox.send((_DONE, job_id, result))
+        feature_cache = getattr(engine, "feature_cache", None)
+        if feature_cache is not None:
+            outbox.send((_CACHE_STATS, worker_id, feature_cache.stats()))
+
+
+@dataclass
+class _PendingJob:
+    worker_id: int
+    future: Future
+    progress: ProgressCallback | None
+    on_sample: SampleCallback | None = None
+    submitted_at: float = 0.0
+    started_at: float | None = None
+
+
+class WorkerPool:
+    """Fixed-size pool of warm ProteinMPNN worker processes.
+
+    Jobs are routed to the worker with the fewest outstanding jobs. A
+    cancelled job is skipped if it hasn't started, and stops after its
+    current sampling pass if it has; the worker carries on. A worker that
+    dies is restarted: the job it was running and those queued behind it
+    fail.
+    """
+
+    def __init__(
+        self,
+        size: int = WORKER_POOL_SIZE,
+        weights_path: Path = MODEL_WEIGHTS_FILE,
+        engine_factory: Callable[[Path], Any] = _default_engine_factory,
+        start_method: str = WORKER_START_METHOD,
+        check_interval: float = WORKER_CHECK_INTERVAL_SECONDS,
+    ):
+        if size < 1:
+            raise ValueError("Worker pool size must be at least 1")
+        self.size = size
+        self.weights_path = weights_path
+        self.engine_factory = engine_factory
+        self.check_interval = check_interval
+
+        self._ctx = mp.get_context(start_method)
+        if start_method == "forkserver":
+            self._ctx.set_forkserver_preload(_FORKSERVER_PRELOAD)
+        self._cancelled = self._ctx.RawArray("q", [-1] * _CANCEL_SLOTS)
+        self._inboxes: list[mp.Queue] = []
+        self._processes: list[mp.Process] = []
+        # Each live worker's result pipe, read by the collector
+        self._readers: dict[mp.connection.Connection, int] = {}
+        # Wakes the collector when a worker is replaced or the pool stops
+        self._wake_r, self._wake_w = -1, -1
+        self._collecting = True
+        self._warm: set[int] = set()
+        # Couldn't load the model; restarting them would fail the same way
+        self._load_failed: set[int] = set()
+        self._load: list[int] = []
+        self._running: dict[int, int] = {}
+        self._pending: dict[int, _PendingJob] = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        # Serializes restarts, so two checks can't both replace a worker
+        self._restart_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._collector: threading.Thread | None = None
+        self._supervisor: threading.Thread | None = None
+        # Last feature cache counters reported by each worker
+        self._cache_stats: dict[int, dict] = {}
+
+    @property
+    def warm_count(self) -> int:
+        """Number of workers that have finished loading the model."""
+        return len(self._warm)
+
+    @property
+    def load_failed_count(self) -> int:
+        """Number of workers that could not load the model."""
+        return len(self._load_failed)
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs submitted but not yet started by a worker."""
+        with self._lock:
+            return len(self._pending) - len(self._running)
+
+    def worker_pids(self) -> dict[int, int]:
+        """Process ID of each live worker, by worker ID."""
+        return {
+            worker_id: proc.pid
+            for worker_id, proc in enumerate(self._processes)
+            if proc.pid is not None and proc.is_alive()
+        }
+
+    def start(self) -> None:
+        """Spawn the worker processes. Weight loading continues in the background."""
+        self._wake_r, self._wake_w = os.pipe()
+        for worker_id in range(self.size):
+            proc, inbox, reader = self._spawn(worker_id)
+            self._processes.append(proc)
+            self._inboxes.append(inbox)
+            self._readers[reader] = worker_id
+            self._load.append(0)
+
+        self._collector = threading.Thread(
+            target=self._collect, name="mpnn-collector", daemon=True
+        )
+        self._collector.start()
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="mpnn-supervisor", daemon=True
+        )
+        self._supervisor.start()
+
+    def submit(
+        self,
+        method: str = "design",
+        progress: ProgressCallback | None = None,
+        on_sample: SampleCallback | None = None,
+        **kwargs,
+    ) -> Future:
+        """Queue a job on the least-loaded warm worker.
+
+        The worker calls ``engine.<method>(**kwargs)``, e.g. ``design`` or
+        ``design_batch``. ``progress`` is called in the parent as
+        ``progress(completed, total)``; ``on_sample``, if given, is passed to
+        the engine and relayed the same way with each decoded sequence.
+        """
+        future: Future = Future()
+        with self._lock:
+            if not self._warm:
+                raise RuntimeError("No warm ProteinMPNN workers available")
+            worker_id = min(self._warm, key=lambda w: self._load[w])
+            job_id = next(self._job_ids)
+            self._pending[job_id] = _PendingJob(
+                worker_id, future, progress, on_sample, time.monotonic()
+            )
+            self._load[worker_id] += 1
+            # Under the lock, so a restart can't swap the inbox in between
+            self._inboxes[worker_id].put((job_id, method, kwargs, on_sample is not None))
+        return future
+
+    def cancel(self, future: Future) -> bool:
+        """Cancel a submitted job. Its worker skips it, or stops it after the
+        current sampling pass.
+
+        Returns False if the job already finished.
+        """
+        with self._lock:
+            job_id = next(
+                (j for j, p in self._pending.items() if p.future is future), None
+            )
+            if job_id is None:
+                return False
+            job = self._pending.pop(job_id)
+            self._load[job.worker_id] -= 1
+            if self._running.get(job.worker_id) == job_id:
+                del self._running[job.worker_id]
+            self._cancelled[job_id % _CANCEL_SLOTS] = job_id
+        future.cancel()
+        return True
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop all workers and fail any jobs still in flight."""
+        self._stopping.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout)
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for proc in self._processes:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._collecting = False
+        if self._collector is not None:
+            os.write(self._wake_w, b"\0")
+            self._collector.join(timeout)
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._warm.clear()
+        for job in pending:
+            job.future.set_exception(RuntimeError("Worker pool shut down"))
+
+    def _spawn(
+        self, worker_id: int
+    ) -> tuple[mp.Process, mp.Queue, mp.connection.Connection]:
+        """Start a worker with a new inbox and result pipe."""
+        inbox = self._ctx.Queue()
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                self.engine_factory,
+                self.weights_path,
+                threads_per_process(self.size),
+                inbox,
+                writer,
+                self._cancelled,
+            ),
+            name=f"mpnn-worker-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        # The worker holds the only write end, so its death reads as EOF
+        writer.close()
+        return proc, inbox, reader
+
+    def _restart(self, worker_id: int, crashed: mp.Process) -> None:
+        """Replace a dead worker with a fresh one, on a new inbox and pipe.
+
+        ``crashed`` is the process seen dead by the supervisor; nothing
+        happens if it was already replaced. Its inbox may have died mid-read
+        with its lock held, so it is abandoned, and the job it was running
+        and those queued in it fail.
+        """
+        with self._restart_lock:
+            with self._lock:
+                if self._processes[worker_id] is not crashed:
+                    return
+                self._warm.discard(worker_id)
+                self._running.pop(worker_id, None)
+                lost = [
+                    (job_id, job) for job_id, job in self._pending.items()
+                    if job.worker_id == worker_id
+                ]
+                for job_id, _ in lost:
+                    del self._pending[job_id]
+                self._load[worker_id] = 0
+                old_inbox = self._inboxes[worker_id]
+                old_inbox.cancel_join_thread()
+                old_inbox.close()
+            crashed.join()
+            proc, inbox, reader = self._spawn(worker_id)
+            with self._lock:
+                self._processes[worker_id] = proc
+                self._inboxes[worker_id] = inbox
+                self._readers[reader] = worker_id
+            os.write(self._wake_w, b"\0")
+
+        WORKER_RESTARTS.inc("crash")
+        logger.error(
+            "ProteinMPNN worker %d died (exit code %s); restarted, failing %d job(s)",
+            worker_id, crashed.exitcode, len(lost),
+        )
+        for _, job in lost:
+            job.future.set_exception(RuntimeError(
+                f"ProteinMPNN worker crashed (exit code {crashed.exitcode})"
+                if job.started_at is not None
+                else f"ProteinMPNN worker crashed (exit code {crashed.exitcode}) "
+                "with this job queued"
+            ))
+
+    def _supervise(self) -> None:
+        """Restart workers that have died, e.g. killed for running out of memory."""
+        while not self._stopping.wait(self.check_interval):
+            with self._lock:
+                dead = [
+                    (worker_id, proc)
+                    for worker_id, proc in enumerate(self._processes)
+                    # A worker exits cleanly only after failing to load
+                    if proc.exitcode not in (None, 0) and worker_id not in self._load_failed
+                ]
+            for worker_id, proc in dead:
+                if not self._stopping.is_set():
+                    self._restart(worker_id, crashed=proc)
+
+    def _record_cache_stats(self, worker_id: int, stats: dict) -> None:
+        """Add a worker's feature cache counters since its last report."""
+        last = self._cache_stats.get(worker_id, {})
+        if stats["hits"] + stats["misses"] < last.get("hits", 0) + last.get("misses", 0):
+            last = {}  # restarted worker, counting from zero again
+        self._cache_stats[worker_id] = stats
+
+        def delta(field: str) -> int:
+            return stats[field] - last.get(field, 0)
+
+        if delta("hits"):
+            FEATURE_CACHE_LOOKUPS.inc("hit", amount=delta("hits"))
+        if delta("misses"):
+            FEATURE_CACHE_LOOKUPS.inc("miss", amount=delta("misses"))
+        if delta("evictions"):
+            FEATURE_CACHE_EVICTIONS.inc(amount=delta("evictions"))
+
+    def _collect(self) -> None:
+        # On shutdown, runs on until every worker's pipe is drained to EOF
+        while self._collecting or self._readers:
+            with self._lock:
+                readers = list(self._readers)
+            for conn in mp.connection.wait([self._wake_r, *readers]):
+                if conn == self._wake_r:
+                    os.read(self._wake_r, 512)
+                    continue
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    # The worker exited; the supervisor replaces it
+                    with self._lock:
+                        self._readers.pop(conn, None)
+                    conn.close()
+                    continue
+                self._handle(msg)
+
+    def _handle(self, msg: tuple) -> None:
+        """Apply one message from a worker's result pipe."""
+        tag, key, payload = msg
+
+        if tag == _READY:
+            with self._lock:
+                self._warm.add(key)
+            STAGE_SECONDS.observe(payload, "model_load")
+            logger.info("ProteinMPNN worker %d ready in %.1fs", key, payload)
+            return
+        if tag == _CACHE_STATS:
+            self._record_cache_stats(key, payload)
+            return
+        if tag == _LOAD_FAILED:
+            with self._lock:
+                self._load_failed.add(key)
+            logger.error("ProteinMPNN worker %d failed to load: %s", key, payload)
+            return
+        if tag == _STARTED:
+            with self._lock:
+                job = self._pending.get(key)
+                if job is None:
+                    return  # cancelled since; the worker stops at its next check
+                self._running[payload] = key
+                job.started_at = time.monotonic()
+            STAGE_SECONDS.observe(job.started_at - job.submitted_at, "pool_queue")
+            return
+        if tag == _PROGRESS:
+            job = self._pending.get(key)
+            if job is not None and job.progress is not None:
+                job.progress(*payload)
+            return
+        if tag == _SAMPLE:
+            job = self._pending.get(key)
+            if job is not None and job.on_sample is not None:
+                job.on_sample(*payload)
+            return
+
+        with self._lock:
+            job = self._pending.pop(key, None)
+            if job is not None:
+                self._load[job.worker_id] -= 1
+                self._running.pop(job.worker_id, None)
+        if job is None:
+            return
+        if job.started_at is not None:
+            STAGE_SECONDS.observe(time.monotonic() - job.started_at, "sampling")
+        if tag == _DONE:
+            job.future.set_result(payload)
+        else:
+            job.future.set_exception(payload)
@@ -0,0 +1,185 @@
+"""CPU execution profile for in-process ProteinMPNN inference.
+
+Covers thread counts, reduced precision (bfloat16 autocast or dynamic int8
+quantization of the Linear layers), ``torch.compile`` of the encoder and
+decoder layers, how many samples are decoded per forward pass, and the
+memory a design is expected to need.
+``scripts/check_precision.py`` compares a profile's sequence recovery and
+scores against the fp32 baseline. Precision and compile mode change the
+sampled sequences and scores, so both are part of the result cache key
+(``app.cache``), as are the sample batching settings.
+"""
+
+import contextlib
+import logging
+import math
+import os
+from dataclasses import dataclass
+
+from app.config import (
+    CPU_COUNT,
+    DESIGN_MEMORY_BUDGET_MB,
+    INFERENCE_COMPILE,
+    INFERENCE_PRECISION,
+    MAX_SAMPLE_BATCH,
+    SAMPLE_BATCH_MEMORY_MB,
+    TORCH_INTEROP_THREADS,
+    TORCH_THREADS,
+)
+from app.validation import PDBValidationError
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("fp32", "bf16", "int8")
+COMPILE_MODES = ("none", "compile")
+
+# Rough peak decoder memory per sampled residue: k-NN edge features
+# (48 neighbours x 128 hidden, float32) for about a dozen live tensors
+SAMPLE_BYTES_PER_RESIDUE = 48 * 128 * 4 * 12
+# Per residue pair: the sampler's N x N decoding-order masks (an int64
+# one-hot plus a float32 mask). The k-NN distances are chunked, so they
+# don't count here (see knn_chunked)
+SAMPLE_BYTES_PER_PAIR = 8 + 4 + 4
+# Residue pairs per chunk of the k-NN distance matrix (~4 bytes x 3 each)
+KNN_CHUNK_PAIRS = 2**22
+
+# Native thread pools torch (and NumPy) may start; all read before first use
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+@dataclass(frozen=True)
+class CpuProfile:
+    threads: int = TORCH_THREADS  # intra-op threads; 0 = leave torch's default
+    interop_threads: int = TORCH_INTEROP_THREADS
+    precision: str = INFERENCE_PRECISION
+    compile: str = INFERENCE_COMPILE
+
+    def __post_init__(self):
+        if self.precision not in PRECISIONS:
+            raise ValueError(
+                f"Unknown inference precision {self.precision!r}; expected one of {PRECISIONS}"
+            )
+        if self.compile not in COMPILE_MODES:
+            raise ValueError(
+                f"Unknown compile mode {self.compile!r}; expected one of {COMPILE_MODES}"
+            )
+        if self.threads < 0 or self.interop_threads < 1:
+            raise ValueError("Thread counts must be positive")
+
+
+def threads_per_process(processes: int, threads: int = TORCH_THREADS) -> int:
+    """Intra-op threads for each of ``processes`` concurrent inference processes.
+
+    An explicit ``threads`` wins; otherwise the CPUs are split evenly so
+    concurrent processes don't oversubscribe them.
+    """
+    return threads or max(1, CPU_COUNT // max(1, processes))
+
+
+def thread_env(threads: int) -> dict[str, str]:
+    """Environment limiting a child process's native thread pools to ``threads``."""
+    env = dict(os.environ)
+    for var in _THREAD_ENV_VARS:
+        env[var] = str(threads)
+    return env
+
+
+def apply_threads(torch, profile: CpuProfile) -> None:
+    """Set torch's thread pools. Call once, before the first inference."""
+    if profile.threads:
+        torch.set_num_threads(profile.threads)
+    try:
+        torch.set_num_interop_threads(profile.interop_threads)
+    except RuntimeError:
+        # Only settable before inter-op work has started in this process
+        logger.warning("Inter-op threads already fixed at %d", torch.get_num_interop_threads())
+
+
+def optimize_model(torch, model, profile: CpuProfile):
+    """Return ``model`` prepared for ``profile``: quantized and/or compiled."""
+    if profile.precision == "int8":
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    if profile.compile == "compile":
+        # The sampling loop is Python control flow over positions, so the
+        # per-layer modules are compiled rather than the whole model
+        for name in ("encoder_layers", "decoder_layers"):
+            layers = getattr(model, name)
+            setattr(model, name, torch.nn.ModuleList(
+                torch.compile(layer, dynamic=True) for layer in layers
+            ))
+    return model
+
+
+def precision_context(torch, profile: CpuProfile):
+    """Context manager to run inference under (``bf16`` autocasts on CPU)."""
+    if profile.precision == "bf16":
+        return torch.autocast("cpu", dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def sample_batch_size(
+    residues: int,
+    num_sequences: int,
+    memory_mb: int = SAMPLE_BATCH_MEMORY_MB,
+    max_batch: int = MAX_SAMPLE_BATCH,
+) -> int:
+    """Samples to decode per forward pass for a structure of ``residues``.
+
+    As many as fit ``memory_mb`` (up to ``max_batch``), then evened out so
+    the passes are the same size; ``num_sequences`` needs
+    ``ceil(num_sequences / batch)`` passes. Depends only on its arguments,
+    never on free memory, so a seeded run always draws the same samples.
+    """
+    fits = memory_mb * 2**20 // max(1, design_memory_bytes(residues))
+    limit = max(1, min(max_batch, fits, num_sequences))
+    passes = math.ceil(num_sequences / limit)
+    return math.ceil(num_sequences / passes)
+
+
+def design_memory_bytes(residues: int, copies: int = 1) -> int:
+    """Estimated peak sampling memory for ``copies`` samples of ``residues`` positions."""
+    per_copy = residues * SAMPLE_BYTES_PER_RESIDUE + residues**2 * SAMPLE_BYTES_PER_PAIR
+    return copies * per_copy
+
+
+def check_memory_budget(
+    residues: int, budget_mb: int = DESIGN_MEMORY_BUDGET_MB
+) -> None:
+    """Reject structures whose single-sample design would exceed the budget.
+
+    Raises:
+        PDBValidationError: If even one sample per pass won't fit.
+    """
+    needed_mb = design_memory_bytes(residues) / 2**20
+    if needed_mb > budget_mb:
+        raise PDBValidationError(
+            f"Structure too large: {residues} residue positions need about "
+            f"{needed_mb:,.0f} MB to design, over the {budget_mb:,} MB budget. "
+            "Design fewer chains or submit a cropped structure"
+        )
+
+
+def knn_chunked(torch, X, mask, top_k: int, eps: float = 1e-6, max_pairs: int = KNN_CHUNK_PAIRS):
+    """``ProteinFeatures._dist`` computed a block of rows at a time.
+
+    Same arithmetic per row as the vendored version, so the neighbours are
+    identical, but only ``max_pairs`` distances are held at once instead of
+    the full (batch, N, N) matrix and its (batch, N, N, 3) differences.
+    """
+    batch, n = mask.shape
+    rows = max(1, max_pairs // max(1, batch * n))
+    k = min(top_k, n)
+    neighbours, indices = [], []
+    for start in range(0, n, rows):
+        stop = min(start + rows, n)
+        mask_2D = mask[:, start:stop, None] * mask[:, None, :]
+        dX = X[:, None, :, :] - X[:, start:stop, None, :]
+        D = mask_2D * torch.sqrt(torch.sum(dX**2, 3) + eps)
+        D_max, _ = torch.max(D, -1, keepdim=True)
+        D_adjust = D + (1.0 - mask_2D) * D_max
+        D_neighbors, E_idx = torch.topk(D_adjust, k, dim=-1, largest=False)
+        neighbours.append(D_neighbors)
+        indices.append(E_idx)
+    return torch.cat(neighbours, dim=1), torch.cat(indices, dim=1)
@@ -1,83 +1,473 @@
-"""Subprocess wrapper for ProteinMPNN sequence design."""
+"""Wrapper for ProteinMPNN sequence design.
 
+Jobs go to the warm worker pool when one is running, otherwise to a
+one-shot ``protein_mpnn_run.py`` subprocess.
+"""
+
+import json
 import subprocess
 import sys
-import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import Callable, NamedTuple
 
-from app.config import MODEL_WEIGHTS_DIR, PROTEINMPNN_REPO
-from app.proteinmpnn.parser import ParsedFasta, parse_fasta
+from app.config import (
+    BATCH_MAX_RESIDUES,
+    BATCH_TIMEOUT_SECONDS,
+    CANCEL_POLL_SECONDS,
+    CPU_COUNT,
+    DESIGN_SEED,
+    MODEL_WEIGHTS_DIR,
+    PROTEINMPNN_REPO,
+    WORKER_POOL_SIZE,
+)
+from app.metrics import timed
+from app.proteinmpnn.constraints import CompiledConstraints
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta, parse_fasta
+from app.proteinmpnn.pool import ProgressCallback, WorkerPool
+from app.proteinmpnn.tuning import sample_batch_size, thread_env, threads_per_process
+from app.scratch import scratch_dir
+from app.structure import Backbone, load_backbone, structure_format
 
 MPNN_SCRIPT = PROTEINMPNN_REPO / "protein_mpnn_run.py"
+PARSE_CHAINS_SCRIPT = PROTEINMPNN_REPO / "helper_scripts" / "parse_multiple_chains.py"
+
+
+def _wait_pooled(
+    pool: WorkerPool,
+    future: Future,
+    timeout: float,
+    cancel_event: threading.Event | None,
+) -> ParsedFasta:
+    """Wait for a pooled job, cancelling it on timeout or ``cancel_event``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = max(0.0, deadline - time.monotonic())
+        wait([future], timeout=min(remaining, CANCEL_POLL_SECONDS))
+        if future.done():
+            return future.result()
+        if cancel_event is not None and cancel_event.is_set():
+            pool.cancel(future)
+            raise CancelledError("ProteinMPNN job cancelled")
+        if time.monotonic() >= deadline:
+            pool.cancel(future)
+            raise TimeoutError(f"ProteinMPNN did not finish within {timeout}s")
+
+
+def _wait_subprocess(
+    proc: subprocess.Popen,
+    timeout: float,
+    cancel_event: threading.Event | None,
+) -> tuple[str, str]:
+    """Wait for the subprocess, killing it on timeout or ``cancel_event``."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return proc.communicate(timeout=CANCEL_POLL_SECONDS)
+        except subprocess.TimeoutExpired:
+            pass
+        if cancel_event is not None and cancel_event.is_set():
+            proc.kill()
+            proc.communicate()
+            raise CancelledError("ProteinMPNN job cancelled")
+        if time.monotonic() >= deadline:
+            proc.kill()
+            proc.communicate()
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+
+
+def _check_mpnn_script() -> None:
+    if not MPNN_SCRIPT.exists():
+        raise FileNotFoundError(
+            f"ProteinMPNN not found at {MPNN_SCRIPT}. "
+            "Clone it: git clone https://github.com/dauparas/ProteinMPNN vendor/ProteinMPNN"
+        )
+
+
+def _run_script(
+    cmd: list[str],
+    timeout: float,
+    cancel_event: threading.Event | None = None,
+    threads: int | None = None,
+) -> str:
+    """Run a vendored ProteinMPNN script and return its stdout.
+
+    ``threads`` caps the script's torch/BLAS thread pools; by default the
+    CPUs are split between the ``WORKER_POOL_SIZE`` runs the scheduler
+    lets run at once.
+    """
+    if threads is None:
+        threads = threads_per_process(WORKER_POOL_SIZE)
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        cwd=str(PROTEINMPNN_REPO),
+        env=thread_env(threads),
+    )
+    stdout, stderr = _wait_subprocess(proc, timeout, cancel_event)
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"ProteinMPNN failed (exit {proc.returncode}):\n{stderr}"
+        )
+    return stdout
+
+
+def _read_fasta(out_dir: Path, name: str, stdout: str) -> ParsedFasta:
+    fasta_path = out_dir / "seqs" / f"{name}.fa"
+    if not fasta_path.exists():
+        seqs_dir = out_dir / "seqs"
+        available = list(seqs_dir.glob("*.fa")) if seqs_dir.exists() else []
+        raise RuntimeError(
+            f"Expected FASTA at {fasta_path} but not found. "
+            f"Available: {available}\nstdout: {stdout}"
+        )
+    return parse_fasta(fasta_path)._replace(from_subprocess=True)
+
+
+def _backbone_for(pdb_path: Path | None, backbone: Backbone | None) -> Backbone:
+    if backbone is not None:
+        return backbone
+    return load_backbone(
+        pdb_path.read_bytes(), name=pdb_path.stem, fmt=structure_format(pdb_path.name)
+    )
+
+
+def _link_as_pdb(src: Path | None, dest: Path, backbone: Backbone | None) -> None:
+    """Put ``src`` at ``dest`` in PDB format for the vendored scripts.
+
+    PDB inputs are symlinked; mmCIF/BinaryCIF inputs, cropped backbones and
+    structures that only exist in memory (``src`` None) are written out as a
+    backbone-only PDB, which carries everything ``parse_PDB`` reads.
+    """
+    if (
+        src is not None
+        and structure_format(src.name) == "pdb"
+        and not (backbone and backbone.cropped)
+    ):
+        dest.symlink_to(src.resolve())
+    else:
+        dest.write_text(_backbone_for(src, backbone).to_pdb())
+
+
+def _as_path(pdb_path: str | Path | None) -> Path | None:
+    return None if pdb_path is None else Path(pdb_path)
+
+
+def _sampling_args(residues: int, num_sequences: int) -> list[str]:
+    """protein_mpnn_run.py batch arguments for ``num_sequences`` samples.
+
+    The script runs ``num_seq_per_target // batch_size`` full batches, so
+    the count is rounded up to whole batches; callers keep the first
+    ``num_sequences`` with ``ParsedFasta.head``.
+    """
+    batch = sample_batch_size(residues, num_sequences)
+    total = batch * -(-num_sequences // batch)
+    return ["--num_seq_per_target", str(total), "--batch_size", str(batch)]
+
+
+def _constraint_args(
+    constraints: CompiledConstraints | None, name: str, chains: list[str], out_dir: Path
+) -> list[str]:
+    """protein_mpnn_run.py arguments for ``constraints``, via its jsonl inputs."""
+    if constraints is None:
+        return []
+    inputs = constraints.mpnn_inputs(name, chains)
+    args = ["--omit_AAs", inputs["omit_AAs"] + "X"]
+    for key in ("fixed_positions", "tied_positions", "bias_AA"):
+        if inputs[key]:
+            path = out_dir / f"{key}.jsonl"
+            path.write_text(json.dumps(inputs[key]) + "\n")
+            args += [f"--{key}_jsonl", str(path)]
+    return args
 
 
 def design_sequences(
-    pdb_path: str,
+    pdb_path: str | Path | None,
     chains: list[str],
     num_sequences: int = 3,
     sampling_temp: float = 0.1,
+    pool: WorkerPool | None = None,
+    timeout: float = 300,
+    progress: ProgressCallback | None = None,
+    cancel_event: threading.Event | None = None,
+    backbone: Backbone | None = None,
+    on_sample: Callable[[DesignedSample], None] | None = None,
+    include_log_probs: bool = False,
+    constraints: CompiledConstraints | None = None,
 ) -> ParsedFasta:
     """Run ProteinMPNN on a PDB file and return designed sequences.
 
     Args:
-        pdb_path: Path to the input PDB file.
+        pdb_path: Path to the input structure (PDB, mmCIF or BinaryCIF), or
+            None for a structure held in memory, which then needs ``backbone``.
         chains: Chain IDs to redesign (e.g. ["A"]).
         num_sequences: Number of sequences to generate.
         sampling_temp: Sampling temperature.
+        pool: Warm worker pool to use instead of a subprocess, if any.
+        timeout: Seconds to wait for the result.
+        progress: Called as ``progress(completed, total)`` while sampling.
+            Only the worker pool reports intermediate progress.
+        cancel_event: When set, the running ProteinMPNN work is killed.
+        backbone: The already-parsed structure (from ``validate_pdb``).
+            Pooled workers featurize it directly instead of re-reading the
+            file; parsed from ``pdb_path`` if omitted. The subprocess gets
+            it as a backbone-only PDB in ``SCRATCH_DIR`` unless ``pdb_path``
+            is a PDB file it can read directly.
+        on_sample: Called with each DesignedSample as it is produced. Pooled
+            workers report them one by one; the subprocess reports them all
+            once its FASTA is written.
+        include_log_probs: Also return per-residue log-probabilities. Only
+            pooled workers produce them; the subprocess leaves them None.
+        constraints: Fixed/tied residues and amino-acid bias, compiled
+            against ``backbone``. The subprocess gets them as jsonl inputs.
 
     Returns:
         ParsedFasta with native and designed sequences.
 
     Raises:
         FileNotFoundError: If PDB or ProteinMPNN script is missing.
-        RuntimeError: If ProteinMPNN subprocess fails.
+        RuntimeError: If ProteinMPNN fails.
+        concurrent.futures.CancelledError: If ``cancel_event`` was set.
+        TimeoutError: If a pooled job does not finish within ``timeout``.
+        subprocess.TimeoutExpired: If the subprocess does not finish in time.
     """
-    pdb = Path(pdb_path).resolve()
-    if not pdb.exists():
-        raise FileNotFoundError(f"PDB file not found: {pdb}")
-    if not MPNN_SCRIPT.exists():
-        raise FileNotFoundError(
-            f"ProteinMPNN not found at {MPNN_SCRIPT}. "
-            "Clone it: git clone https://github.com/dauparas/ProteinMPNN vendor/ProteinMPNN"
+    if pdb_path is None:
+        if backbone is None:
+            raise ValueError("design_sequences needs pdb_path or backbone")
+        pdb = None
+    else:
+        pdb = Path(pdb_path).resolve()
+        if not pdb.exists():
+            raise FileNotFoundError(f"PDB file not found: {pdb}")
+
+    if pool is not None and pool.warm_count > 0:
+        future = pool.submit(
+            backbone=_backbone_for(pdb, backbone),
+            chains=chains,
+            num_sequences=num_sequences,
+            sampling_temp=sampling_temp,
+            progress=progress,
+            on_sample=on_sample,
+            include_log_probs=include_log_probs,
+            constraints=constraints,
         )
+        with timed("pool_wait"):
+            return _wait_pooled(pool, future, timeout, cancel_event)
 
-    with tempfile.TemporaryDirectory(prefix="mpnn_") as tmpdir:
+    _check_mpnn_script()
+    backbone = _backbone_for(pdb, backbone)
+    # A fixed name keeps client-chosen file names out of scratch paths
+    name = pdb.stem if pdb is not None else "input"
+    with scratch_dir() as tmpdir:
         out_dir = Path(tmpdir)
+        pdb_input = out_dir / f"{name}.pdb"
+        _link_as_pdb(pdb, pdb_input, backbone)
 
         cmd = [
             sys.executable,
             str(MPNN_SCRIPT),
-            "--pdb_path", str(pdb),
+            "--pdb_path", str(pdb_input),
             "--pdb_path_chains", " ".join(chains),
             "--out_folder", str(out_dir),
-            "--num_seq_per_target", str(num_sequences),
             "--sampling_temp", str(sampling_temp),
             "--path_to_model_weights", str(MODEL_WEIGHTS_DIR),
-            "--seed", "42",
-            "--batch_size", "1",
+            "--seed", str(DESIGN_SEED),
+            *_sampling_args(backbone.num_residues(list(backbone.chains)), num_sequences),
+            *_constraint_args(constraints, name, chains, out_dir),
         ]
 
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,
-            cwd=str(PROTEINMPNN_REPO),
+        # Interpreter start, torch import, weight load and sampling
+        with timed("subprocess"):
+            stdout = _run_script(cmd, timeout, cancel_event)
+        with timed("parse_fasta"):
+            result = _read_fasta(out_dir, name, stdout).head(num_sequences)
+        if on_sample is not None:
+            for sample in result.samples():
+                on_sample(sample)
+        if progress is not None:
+            progress(len(result.designed_sequences), num_sequences)
+        return result
+
+
+class BatchItem(NamedTuple):
+    pdb_path: str | Path | None
+    chains: list[str]
+    num_residues: int
+    backbone: Backbone | None = None
+
+
+def group_batch_items(
+    num_residues: list[int], max_residues: int = BATCH_MAX_RESIDUES
+) -> list[list[int]]:
+    """Group item indices into length-sorted batches for padded inference.
+
+    Sorting by length keeps padding low; a group grows while its padded size
+    (members x longest member) stays within ``max_residues``. Structures
+    larger than the budget get a group of their own.
+    """
+    order = sorted(range(len(num_residues)), key=lambda i: num_residues[i])
+    groups: list[list[int]] = []
+    current: list[int] = []
+    for i in order:
+        # Sorted ascending, so the newcomer is the longest member
+        if current and (len(current) + 1) * num_residues[i] > max_residues:
+            groups.append(current)
+            current = []
+        current.append(i)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _design_group_subprocess(
+    items: list[BatchItem],
+    num_sequences: int,
+    sampling_temp: float,
+    deadline: float,
+    threads: int | None = None,
+) -> list[ParsedFasta]:
+    """Design a group in one protein_mpnn_run.py call via jsonl inputs.
+
+    ``deadline`` is a ``time.monotonic()`` value shared by the whole batch.
+    """
+    with scratch_dir() as tmpdir:
+        tmp = Path(tmpdir)
+        in_dir = tmp / "inputs"
+        in_dir.mkdir()
+        designed_chains = {}
+        for i, item in enumerate(items):
+            name = f"item_{i}"
+            _link_as_pdb(_as_path(item.pdb_path), in_dir / f"{name}.pdb", item.backbone)
+            designed_chains[name] = item.chains
+
+        parsed = tmp / "parsed_pdbs.jsonl"
+        _run_script(
+            [
+                sys.executable, str(PARSE_CHAINS_SCRIPT),
+                "--input_path", f"{in_dir}/",
+                "--output_path", str(parsed),
+            ],
+            deadline - time.monotonic(),
+            threads=threads,
         )
 
-        if result.returncode != 0:
-            raise RuntimeError(
-                f"ProteinMPNN failed (exit {result.returncode}):\n{result.stderr}"
-            )
+        chain_id_dict = {}
+        with open(parsed) as f:
+            for line in f:
+                entry = json.loads(line)
+                name = entry["name"]
+                all_chains = [
+                    k[len("seq_chain_"):] for k in entry if k.startswith("seq_chain_")
+                ]
+                designed = designed_chains[name]
+                chain_id_dict[name] = [
+                    designed, [c for c in all_chains if c not in designed]
+                ]
+        chain_id_path = tmp / "chain_ids.jsonl"
+        chain_id_path.write_text(json.dumps(chain_id_dict))
+
+        out_dir = tmp / "out"
+        stdout = _run_script(
+            [
+                sys.executable, str(MPNN_SCRIPT),
+                "--jsonl_path", str(parsed),
+                "--chain_id_jsonl", str(chain_id_path),
+                "--out_folder", str(out_dir),
+                "--sampling_temp", str(sampling_temp),
+                "--path_to_model_weights", str(MODEL_WEIGHTS_DIR),
+                "--seed", str(DESIGN_SEED),
+                # One batch size for the run, so it is sized for the longest
+                *_sampling_args(max(item.num_residues for item in items), num_sequences),
+            ],
+            deadline - time.monotonic(),
+            threads=threads,
+        )
+        return [
+            _read_fasta(out_dir, f"item_{i}", stdout).head(num_sequences)
+            for i in range(len(items))
+        ]
+
 
-        pdb_stem = pdb.stem
-        fasta_path = out_dir / "seqs" / f"{pdb_stem}.fa"
-        if not fasta_path.exists():
-            seqs_dir = out_dir / "seqs"
-            available = list(seqs_dir.glob("*.fa")) if seqs_dir.exists() else []
-            raise RuntimeError(
-                f"Expected FASTA at {fasta_path} but not found. "
-                f"Available: {available}\nstdout: {result.stdout}"
+def design_batch(
+    items: list[BatchItem],
+    num_sequences: int = 3,
+    sampling_temp: float = 0.1,
+    pool: WorkerPool | None = None,
+    timeout: float = BATCH_TIMEOUT_SECONDS,
+) -> list[ParsedFasta | Exception]:
+    """Design many structures, fanning length-sorted groups out in parallel.
+
+    Groups go to the warm worker pool when one is running, otherwise to
+    concurrent subprocesses (one per CPU). A failing group fails only its
+    own items.
+
+    Returns:
+        One entry per item, in input order: a ParsedFasta, or the exception
+        that prevented designing it.
+    """
+    groups = group_batch_items([item.num_residues for item in items])
+    results: list[ParsedFasta | Exception | None] = [None] * len(items)
+    deadline = time.monotonic() + timeout
+
+    if pool is not None and pool.warm_count > 0:
+        submitted = [
+            (
+                group,
+                pool.submit(
+                    method="design_batch",
+                    items=[
+                        (
+                            _backbone_for(_as_path(items[i].pdb_path), items[i].backbone),
+                            items[i].chains,
+                        )
+                        for i in group
+                    ],
+                    num_sequences=num_sequences,
+                    sampling_temp=sampling_temp,
+                ),
             )
+            for group in groups
+        ]
+        wait([f for _, f in submitted], timeout=max(0.0, deadline - time.monotonic()))
+        outcomes = []
+        for group, future in submitted:
+            if not future.done():
+                pool.cancel(future)
+                outcomes.append((group, TimeoutError("Batch timed out")))
+            elif future.exception() is not None:
+                outcomes.append((group, future.exception()))
+            else:
+                outcomes.append((group, future.result()))
+    else:
+        _check_mpnn_script()
+        concurrent = min(CPU_COUNT, len(groups))
+        with ThreadPoolExecutor(max_workers=concurrent) as executor:
+            submitted = [
+                (
+                    group,
+                    executor.submit(
+                        _design_group_subprocess,
+                        [items[i] for i in group],
+                        num_sequences,
+                        sampling_temp,
+                        deadline,
+                        threads_per_process(concurrent),
+                    ),
+                )
+                for group in groups
+            ]
+            outcomes = []
+            for group, future in submitted:
+                try:
+                    outcomes.append((group, future.result()))
+                except Exception as e:
+                    outcomes.append((group, e))
 
-        return parse_fasta(fasta_path)
\ No newline at end of file
+    for group, outcome in outcomes:
+        for k, i in enumerate(group):
+            results[i] = outcome[k] if isinstance(outcome, list) else outcome
+    return results
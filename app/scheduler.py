@@ -0,0 +1,308 @@
+"""Cost-based admission and scheduling of designs onto the engine.
+
+Samples are decoded ``sample_batch_size`` at a time, each pass stepping
+over every position of the structure, so a design's work is positions x
+passes (``design_work``). Its predicted time is a fixed overhead (features,
+encoder, hand-off to a worker) plus that work over the per-slot decoding
+rate. Both terms are fit by weighted least squares over recent finished
+designs. Designs that could never finish within their timeout are rejected
+before they queue: with a 429 while the estimate has seen fewer than
+``min_observations`` designs, then with a 400. Designs that would not start
+in time behind the queue get a 429.
+
+At most ``slots`` designs run at once (one per warm worker), and at most
+``client_limit`` of them for any one client. Waiting designs start shortest
+first. Time spent waiting counts against a design's predicted time, so long
+designs are not starved by a stream of short ones.
+"""
+
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import CancelledError
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from app.config import (
+    BUSY_RETRY_AFTER_SECONDS,
+    CANCEL_POLL_SECONDS,
+    CLIENT_MAX_RUNNING,
+    SCHEDULER_MIN_OBSERVATIONS,
+    SCHEDULER_OVERHEAD_SECONDS,
+    SCHEDULER_RESIDUES_PER_SECOND,
+    WORKER_POOL_SIZE,
+)
+from app.metrics import DESIGN_COST_RATIO, SCHEDULER_WAIT_SECONDS, record_stage
+from app.proteinmpnn.tuning import sample_batch_size
+from app.validation import PDBValidationError
+
+T = TypeVar("T")
+
+# Weight older observations keep each time a design finishes
+_DECAY = 0.9
+# Below this spread of work (relative to its mean) the overhead and the rate
+# can't be told apart; only the rate is refit
+_MIN_SPREAD = 0.1
+
+
+class DesignTooSlowError(PDBValidationError):
+    """Raised when a design's predicted time exceeds its timeout. Maps to HTTP 400"""
+
+
+class SchedulerBusyError(RuntimeError):
+    """Raised when a design would not start in time. Maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def design_work(positions: int, num_sequences: int) -> int:
+    """Positions decoded by a design: every one of ``positions``, once per
+    sampling pass of ``sample_batch_size`` samples."""
+    passes = math.ceil(num_sequences / sample_batch_size(positions, num_sequences))
+    return positions * passes
+
+
+@dataclass
+class _Fit:
+    """Exponentially weighted sums for a least-squares line through
+    (work, seconds) observations."""
+
+    n: float = 0.0
+    x: float = 0.0
+    y: float = 0.0
+    xx: float = 0.0
+    xy: float = 0.0
+
+    def add(self, x: float, y: float) -> None:
+        self.n = _DECAY * self.n + 1
+        self.x = _DECAY * self.x + x
+        self.y = _DECAY * self.y + y
+        self.xx = _DECAY * self.xx + x * x
+        self.xy = _DECAY * self.xy + x * y
+
+
+@dataclass
+class _Ticket:
+    client: str
+    work: float
+    enqueued_at: float
+    seq: int
+    learn: bool = True
+    granted: bool = False
+
+
+class DesignScheduler:
+    """Admission control and shortest-job-first dispatch for designs."""
+
+    def __init__(
+        self,
+        slots: int = WORKER_POOL_SIZE,
+        client_limit: int = CLIENT_MAX_RUNNING,
+        residues_per_second: float = SCHEDULER_RESIDUES_PER_SECOND,
+        overhead_seconds: float = SCHEDULER_OVERHEAD_SECONDS,
+        min_observations: int = SCHEDULER_MIN_OBSERVATIONS,
+    ):
+        self.slots = slots
+        self.client_limit = client_limit
+        # Positions decoded per second on one slot, and fixed seconds per design
+        self.residues_per_second = residues_per_second
+        self.overhead_seconds = overhead_seconds
+        self.min_observations = min_observations
+        self.observations = 0
+        self._fit = _Fit()
+        self._queue: list[_Ticket] = []
+        # Running tickets and when each started
+        self._running: dict[int, tuple[_Ticket, float]] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def calibrated(self) -> bool:
+        """Whether enough designs have finished to trust predictions."""
+        return self.observations >= self.min_observations
+
+    def predict(self, work: float) -> float:
+        """Predicted seconds for a design of ``work`` (``design_work``) on one slot."""
+        return self.overhead_seconds + work / self.residues_per_second
+
+    def observe(self, work: float, seconds: float) -> None:
+        """Refit the overhead and rate to include a design of ``work`` that
+        took ``seconds``."""
+        with self._cond:
+            fit = self._fit
+            fit.add(work, seconds)
+            self.observations += 1
+            mean_x, mean_y = fit.x / fit.n, fit.y / fit.n
+            var = fit.xx / fit.n - mean_x**2
+            cov = fit.xy / fit.n - mean_x * mean_y
+            if var > (_MIN_SPREAD * mean_x) ** 2 and cov > 0:
+                slope = cov / var
+                overhead = mean_y - slope * mean_x
+                if overhead < 0:
+                    # Fit a line through the origin instead
+                    overhead, slope = 0.0, fit.xy / fit.xx
+            else:
+                # Designs of about one size: keep the overhead, capped so
+                # at least half the time is left to the decoding rate
+                overhead = min(self.overhead_seconds, mean_y / 2)
+                slope = (mean_y - overhead) / mean_x
+            self.overhead_seconds = overhead
+            self.residues_per_second = 1 / slope
+
+    def estimated_wait(self, work: float) -> float:
+        """Seconds until a design of ``work`` would likely start."""
+        now = time.monotonic()
+        with self._cond:
+            # Remaining work of running designs, plus queued ones that go first
+            ahead = sum(
+                max(0.0, self.predict(t.work) - (now - started))
+                for t, started in self._running.values()
+            )
+            ahead += sum(self.predict(t.work) for t in self._queue if t.work <= work)
+            free = self.slots - len(self._running)
+        if free > 0 and not self._queue:
+            return 0.0
+        return ahead / self.slots
+
+    def admit(
+        self,
+        work: float,
+        limit: float,
+        remaining: float | None = None,
+        hint: str = "request fewer sequences",
+    ) -> float:
+        """Check that a design of ``work`` can finish in time.
+
+        The design alone must fit in ``limit`` seconds; ``hint`` ends the
+        error message if not. If ``remaining`` is given, the design plus its
+        predicted wait behind the queue must fit in that. Returns the
+        predicted design time.
+
+        Raises:
+            DesignTooSlowError: If the design alone would take too long.
+            SchedulerBusyError: If it would not finish in time behind the
+                queue; ``retry_after`` is the predicted wait. Also raised
+                instead of DesignTooSlowError until the estimate is
+                ``calibrated``.
+        """
+        predicted = self.predict(work)
+        if predicted > limit:
+            if not self.calibrated:
+                raise SchedulerBusyError(
+                    f"Estimated design time {predicted:.0f}s exceeds the "
+                    f"{limit:.0f}s limit, but the estimate is not calibrated yet; "
+                    f"retry later or {hint}",
+                    retry_after=BUSY_RETRY_AFTER_SECONDS,
+                )
+            raise DesignTooSlowError(
+                f"Estimated design time {predicted:.0f}s exceeds the {limit:.0f}s "
+                f"limit; {hint}"
+            )
+        if remaining is not None:
+            wait = self.estimated_wait(work)
+            if wait + predicted > remaining:
+                raise SchedulerBusyError(
+                    "Server busy: design would not finish in time behind the queue",
+                    retry_after=wait,
+                )
+        return predicted
+
+    def run(
+        self,
+        client: str,
+        work: float,
+        call: Callable[[], T],
+        timeout: float | None = None,
+        cancel_event: threading.Event | None = None,
+        learn: bool = True,
+    ) -> T:
+        """Wait for a slot, run ``call`` in it, and release the slot.
+
+        Unless ``learn`` is false (work that isn't one design on one slot,
+        like a batch), the time ``call`` took refits the estimate.
+
+        Raises:
+            TimeoutError: If no slot frees up within ``timeout``.
+            concurrent.futures.CancelledError: If ``cancel_event`` is set
+                while waiting.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            ticket = _Ticket(client, work, time.monotonic(), next(self._seq), learn)
+            self._queue.append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                if cancel_event is not None and cancel_event.is_set():
+                    self._withdraw(ticket)
+                    raise CancelledError("Design cancelled while queued")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._withdraw(ticket)
+                    raise TimeoutError(f"No design slot within {timeout}s")
+                self._cond.wait(
+                    CANCEL_POLL_SECONDS if remaining is None
+                    else min(remaining, CANCEL_POLL_SECONDS)
+                )
+
+        started = time.monotonic()
+        waited = started - ticket.enqueued_at
+        SCHEDULER_WAIT_SECONDS.observe(waited)
+        record_stage("scheduler_queue", waited)
+        predicted = self.predict(work)
+        succeeded = False
+        try:
+            result = call()
+            succeeded = True
+            return result
+        finally:
+            self._release(ticket, predicted, time.monotonic() - started, succeeded)
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        self._queue.remove(ticket)
+        self._dispatch()
+
+    def _release(
+        self, ticket: _Ticket, predicted: float, seconds: float, succeeded: bool
+    ) -> None:
+        with self._cond:
+            del self._running[ticket.seq]
+            if succeeded and ticket.learn and ticket.work > 0 and seconds > 0:
+                DESIGN_COST_RATIO.observe(seconds / predicted)
+                self.observe(ticket.work, seconds)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the waiting designs that go first. Holds the lock."""
+        now = time.monotonic()
+        per_client: dict[str, int] = {}
+        for t, _ in self._running.values():
+            per_client[t.client] = per_client.get(t.client, 0) + 1
+        granted = False
+        while len(self._running) < self.slots:
+            eligible = [
+                t for t in self._queue if per_client.get(t.client, 0) < self.client_limit
+            ]
+            if not eligible:
+                break
+            ticket = min(
+                eligible,
+                key=lambda t: (self.predict(t.work) - (now - t.enqueued_at), t.seq),
+            )
+            self._queue.remove(ticket)
+            ticket.granted = True
+            self._running[ticket.seq] = (ticket, now)
+            per_client[ticket.client] = per_client.get(ticket.client, 0) + 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
@@ -1,8 +1,18 @@
-"""Pydantic models for the /design endpoint"""
+"""Pydantic models for the /design and /jobs endpoints"""
 
-from pydantic import BaseModel, Field
+import base64
+from enum import Enum
 
-from app.config import DEFAULT_NUM_SEQUENCES, MAX_SEQUENCES
+import numpy as np
+from pydantic import BaseModel, Field, field_validator
+
+from app.config import (
+    DEFAULT_NUM_SEQUENCES,
+    DEFAULT_SAMPLING_TEMP,
+    MAX_SAMPLING_TEMP,
+    MAX_SEQUENCES,
+)
+from app.proteinmpnn.parser import ALPHABET
 
 
 class DesignMetadata(BaseModel):
@@ -11,11 +21,106 @@ class DesignMetadata(BaseModel):
     num_sequences: int
 
 
+class ResidueLogProbs(BaseModel):
+    """Per-residue log-probabilities of one designed sequence.
+
+    ``data`` is base64 of a row-major little-endian float16 array of
+    ``shape`` (designed residues x alphabet). Rows follow the sequence with
+    its '/' separators removed.
+    """
+
+    alphabet: str = ALPHABET
+    shape: list[int]
+    data: str
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> "ResidueLogProbs":
+        packed = np.ascontiguousarray(array, dtype="<f2")
+        return cls(
+            shape=list(packed.shape), data=base64.b64encode(packed.tobytes()).decode()
+        )
+
+    def to_array(self) -> np.ndarray:
+        return np.frombuffer(base64.b64decode(self.data), dtype="<f2").reshape(self.shape)
+
+
 class DesignResponse(BaseModel):
     status: str = "success"
     metadata: DesignMetadata
     native_sequence: str
     sequences: list[str]
+    # Per sequence, in the order of ``sequences``; null when not reported
+    scores: list[float] | None = None
+    global_scores: list[float] | None = None
+    seq_recoveries: list[float] | None = None
+    log_probs: list[ResidueLogProbs] | None = None
+
+
+class DesignedSequence(BaseModel):
+    """One ``sequence`` event from /design/stream."""
+
+    index: int
+    sequence: str
+    score: float | None = None
+    global_score: float | None = None
+    seq_recovery: float | None = None
+    log_probs: ResidueLogProbs | None = None
+
+
+class BatchItemResult(BaseModel):
+    filename: str
+    status: str = "success"
+    detail: str | None = None
+    result: DesignResponse | None = None
+
+
+class BatchDesignResponse(BaseModel):
+    status: str = "success"
+    num_succeeded: int
+    num_failed: int
+    results: list[BatchItemResult]
+
+
+def _check_letters(letters) -> None:
+    unknown = sorted(set(letters) - set(ALPHABET[:-1]))
+    if unknown:
+        raise ValueError(f"Unknown amino acid(s) {unknown}; expected one of {ALPHABET[:-1]}")
+
+
+class DesignConstraints(BaseModel):
+    """Fixed, tied and biased residues for /design, /design/stream and /jobs.
+
+    Residues are given by their residue numbers in the uploaded structure.
+    ``tied_positions`` entries map chains to equally long lists of residue
+    numbers, tied index by index; ``tied_chains`` ties whole chains of equal
+    length (homo-oligomers), so each position is sampled once for all of
+    them. ``bias_aa`` is added to the log-probability of each amino acid.
+    """
+
+    fixed_positions: dict[str, list[int]] = Field(default_factory=dict)
+    tied_positions: list[dict[str, list[int]]] = Field(default_factory=list)
+    tied_chains: list[list[str]] = Field(default_factory=list)
+    bias_aa: dict[str, float] = Field(default_factory=dict)
+    omit_aa: str = ""
+
+    @field_validator("bias_aa")
+    @classmethod
+    def _known_bias_letters(cls, value: dict[str, float]) -> dict[str, float]:
+        _check_letters(value)
+        return value
+
+    @field_validator("omit_aa")
+    @classmethod
+    def _known_omit_letters(cls, value: str) -> str:
+        _check_letters(value)
+        return value
+
+    @field_validator("tied_chains")
+    @classmethod
+    def _groups_of_two(cls, value: list[list[str]]) -> list[list[str]]:
+        if any(len(set(group)) < 2 for group in value):
+            raise ValueError("Each tied_chains group needs at least two chains")
+        return value
 
 
 class DesignParams(BaseModel):
@@ -24,4 +129,56 @@ class DesignParams(BaseModel):
     chains: list[str] = Field(min_length=1)
     num_sequences: int = Field(
         default=DEFAULT_NUM_SEQUENCES, ge=1, le=MAX_SEQUENCES
-    )
\ No newline at end of file
+    )
+    sampling_temp: float = Field(
+        default=DEFAULT_SAMPLING_TEMP, gt=0, le=MAX_SAMPLING_TEMP
+    )
+    include_log_probs: bool = False
+    constraints: DesignConstraints | None = None
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobProgress(BaseModel):
+    completed: int = 0
+    total: int
+
+
+class JobInfo(BaseModel):
+    """Status of an asynchronous design job."""
+
+    job_id: str
+    status: JobStatus = JobStatus.QUEUED
+    progress: JobProgress
+    error: str | None = None
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+
+
+class ChainSummary(BaseModel):
+    residues: int
+    standard_residues: int
+    ca_atoms: int
+
+
+class StructureInfo(BaseModel):
+    """A registered structure; pass ``structure_id`` to /design instead of a file."""
+
+    structure_id: str
+    name: str
+    format: str
+    chains: dict[str, ChainSummary]
+    chain_ids: list[str]
+    size_bytes: int
+    created_at: float
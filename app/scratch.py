@@ -0,0 +1,87 @@
+"""Temp files and directories that a restart can clean up.
+
+Every scratch entry is named ``mpnn_<pid>-<token>_...`` after the process
+that made it; ``token`` is random per process, so a restarted server that
+gets its predecessor's PID (often PID 1 in a container) still tells the
+entries apart. Entries are removed when the request finishes, but a process
+that is killed (OOM, SIGKILL, a crashed container) never gets to;
+``sweep_scratch`` removes whatever such processes left behind.
+"""
+
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from app.config import SCRATCH_DIR, SCRATCH_MAX_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "mpnn_"
+_TOKEN = uuid.uuid4().hex[:8]
+# The token is optional so entries from before it existed are swept too
+_OWNER = re.compile(rf"{PREFIX}(\d+)(?:-([0-9a-f]+))?_")
+
+
+def scratch_prefix() -> str:
+    """Name prefix for this process's scratch entries."""
+    return f"{PREFIX}{os.getpid()}-{_TOKEN}_"
+
+
+def temp_path(suffix: str = "", dir: Path | None = None) -> Path:
+    """A fresh path in ``dir`` (the system temp dir by default); not created."""
+    return Path(dir or tempfile.gettempdir()) / f"{scratch_prefix()}{uuid.uuid4().hex}{suffix}"
+
+
+def scratch_dir() -> tempfile.TemporaryDirectory:
+    """A temp directory under ``SCRATCH_DIR``, removed on context exit."""
+    return tempfile.TemporaryDirectory(prefix=scratch_prefix(), dir=SCRATCH_DIR)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # someone else's process
+    return True
+
+
+def _is_stale(path: Path, pid: int, token: str | None, now: float) -> bool:
+    if pid == os.getpid():
+        # Ours, or left by an earlier process that had the same PID
+        return token != _TOKEN
+    if not _pid_alive(pid):
+        return True
+    # The PID may belong to an unrelated process by now
+    try:
+        return now - path.lstat().st_mtime > SCRATCH_MAX_AGE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def sweep_scratch(dirs: list[Path] | None = None) -> int:
+    """Remove scratch entries whose process is gone. Returns how many."""
+    if dirs is None:
+        dirs = [SCRATCH_DIR, Path(tempfile.gettempdir())]
+    removed = 0
+    now = time.time()
+    for directory in dict.fromkeys(dirs):
+        for path in directory.glob(f"{PREFIX}*_*"):
+            match = _OWNER.match(path.name)
+            if match is None or not _is_stale(path, int(match[1]), match[2], now):
+                continue
+            try:
+                if path.is_dir() and not path.is_symlink():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+                removed += 1
+            except OSError as e:
+                logger.warning("Could not remove stale scratch %s: %s", path, e)
+    return removed
@@ -0,0 +1,40 @@
+from app.structure.backbone import (
+    Backbone,
+    ChainBackbone,
+    backbone_from_structure,
+    parse_pdb_backbone,
+)
+from app.structure.crop import crop_context, num_positions
+from app.structure.formats import (
+    FORMAT_LABELS,
+    FORMAT_SUFFIXES,
+    load_backbone,
+    structure_format,
+)
+from app.structure.mmcif import (
+    parse_mmcif_backbone,
+    scan_bcif_backbone,
+    scan_mmcif_backbone,
+)
+from app.structure.pdb_scan import scan_pdb_backbone
+from app.structure.store import StoredStructure, StructureNotFoundError, StructureStore
+
+__all__ = [
+    "FORMAT_LABELS",
+    "FORMAT_SUFFIXES",
+    "Backbone",
+    "ChainBackbone",
+    "StoredStructure",
+    "StructureNotFoundError",
+    "StructureStore",
+    "backbone_from_structure",
+    "crop_context",
+    "load_backbone",
+    "num_positions",
+    "parse_mmcif_backbone",
+    "parse_pdb_backbone",
+    "scan_bcif_backbone",
+    "scan_mmcif_backbone",
+    "scan_pdb_backbone",
+    "structure_format",
+]
@@ -0,0 +1,169 @@
+"""Build a Backbone from per-atom column arrays.
+
+Shared by the columnar PDB, mmCIF and BinaryCIF readers: each extracts the
+same handful of atom_site columns as NumPy arrays, and everything from there
+on (residue grouping, altloc choice, gap filling) is format-independent and
+vectorized. Semantics follow ``backbone.backbone_from_structure``.
+"""
+
+import numpy as np
+
+from app.structure.backbone import (
+    BACKBONE_ATOMS,
+    THREE_TO_ONE,
+    Backbone,
+    ChainBackbone,
+    _HET_AS_STANDARD,
+)
+
+_BACKBONE_NAMES = np.array([a.encode() for a in BACKBONE_ATOMS], dtype="S4")
+_HET_KEPT = np.array([name.encode() for name in _HET_AS_STANDARD])
+
+
+def backbone_from_atoms(
+    name: str,
+    *,
+    chain: np.ndarray,
+    standard: np.ndarray,
+    resseq: np.ndarray,
+    icode: np.ndarray,
+    resname: np.ndarray,
+    atom_name: np.ndarray,
+    occupancy: np.ndarray,
+    xyz: np.ndarray,
+) -> Backbone:
+    """Assemble a Backbone from the coordinate records of one model.
+
+    All arrays have one entry per ATOM/HETATM record, in file order:
+    ``chain``, ``icode``, ``resname`` and ``atom_name`` are bytes (``S``)
+    arrays with names stripped and a blank insertion code as ``b" "``;
+    ``standard`` is True for ATOM records, ``resseq`` is integer,
+    ``occupancy`` float and ``xyz`` (N, 3).
+    """
+    # Chains in order of first appearance, ligand/water-only chains included
+    chain_values, first_seen, chain_code = np.unique(
+        chain, return_index=True, return_inverse=True
+    )
+    chain_code = chain_code.ravel()
+    appearance = np.argsort(first_seen, kind="stable")
+    chain_ids = [chain_values[i].decode() for i in appearance]
+
+    keep = standard | np.isin(resname, _HET_KEPT)
+    if not keep.any():
+        return Backbone(name=name, chains={}, chain_ids=chain_ids)
+
+    # One residue per (chain, resSeq, icode, record type), like BioPython
+    residue_key = np.empty(
+        int(keep.sum()),
+        dtype=[("chain", np.int64), ("resseq", np.int64), ("icode", icode.dtype), ("het", bool)],
+    )
+    residue_key["chain"] = chain_code[keep]
+    residue_key["resseq"] = resseq[keep]
+    residue_key["icode"] = icode[keep]
+    residue_key["het"] = ~standard[keep]
+    residues, res_first, res_of_atom = np.unique(
+        residue_key, return_index=True, return_inverse=True
+    )
+    res_of_atom = res_of_atom.ravel()
+    res_coords = _residue_coords(
+        residues.size, res_of_atom, atom_name[keep], occupancy[keep], xyz[keep]
+    )
+    # The only HETATM residues kept are MSE, read as MET
+    res_letters = _one_letter(
+        np.where(residues["het"], b"MET", resname[keep][res_first])
+    )
+
+    chains: dict[str, ChainBackbone] = {}
+    for code in appearance:
+        in_chain = np.flatnonzero(residues["chain"] == code)
+        if in_chain.size == 0:
+            continue
+        chain_id = chain_values[code].decode()
+        chains[chain_id] = _layout_chain(
+            chain_id,
+            resseq=residues["resseq"][in_chain],
+            icode=residues["icode"][in_chain],
+            order=res_first[in_chain],
+            letters=res_letters[in_chain],
+            standard=~residues["het"][in_chain],
+            coords=res_coords[in_chain],
+        )
+
+    return Backbone(name=name, chains=chains, chain_ids=chain_ids)
+
+
+def _one_letter(resnames: np.ndarray) -> np.ndarray:
+    """Map residue names to one-letter codes (uint8), ``X`` if unknown."""
+    unique, inverse = np.unique(resnames, return_inverse=True)
+    letters = np.array(
+        [ord(THREE_TO_ONE.get(r.decode(), "X")) for r in unique], dtype=np.uint8
+    )
+    return letters[inverse.ravel()]
+
+
+def _residue_coords(
+    num_residues: int,
+    res_of_atom: np.ndarray,
+    atom_name: np.ndarray,
+    occupancy: np.ndarray,
+    xyz: np.ndarray,
+) -> np.ndarray:
+    """(R, 4, 3) backbone coordinates, NaN where an atom is missing.
+
+    With alternate locations, BioPython keeps the highest-occupancy atom and
+    the first one on ties; the sort below reproduces that.
+    """
+    coords = np.full((num_residues, len(BACKBONE_ATOMS), 3), np.nan, dtype=np.float32)
+    match = atom_name[:, None] == _BACKBONE_NAMES[None, :]
+    rows = np.flatnonzero(match.any(axis=1))
+    if rows.size == 0:
+        return coords
+    atom_idx = match[rows].argmax(axis=1)
+    slot = res_of_atom[rows] * len(BACKBONE_ATOMS) + atom_idx
+    order = np.lexsort((rows, -occupancy[rows], slot))
+    _, first = np.unique(slot[order], return_index=True)
+    chosen = rows[order[first]]
+    coords[res_of_atom[chosen], atom_idx[order[first]]] = xyz[chosen]
+    return coords
+
+
+def _layout_chain(
+    chain_id: str,
+    resseq: np.ndarray,
+    icode: np.ndarray,
+    order: np.ndarray,
+    letters: np.ndarray,
+    standard: np.ndarray,
+    coords: np.ndarray,
+) -> ChainBackbone:
+    """Vectorized counterpart of ``backbone._build_chain``.
+
+    Each resSeq in ``[min, max]`` gets one slot per residue observed there
+    (insertion codes in sorted order) or a single gap slot.
+    """
+    sort = np.lexsort((order, icode, resseq))
+    resseq, letters, standard, coords = (
+        resseq[sort], letters[sort], standard[sort], coords[sort]
+    )
+    lo, hi = int(resseq[0]), int(resseq[-1])
+    offset = resseq - lo
+    slots = np.maximum(np.bincount(offset, minlength=hi - lo + 1), 1)
+    slot_start = np.cumsum(slots) - slots
+    rank = np.arange(resseq.size) - np.searchsorted(resseq, resseq, side="left")
+    position = slot_start[offset] + rank
+    length = int(slots.sum())
+
+    seq = np.full(length, ord("X"), dtype=np.uint8)
+    seq[position] = letters
+    is_standard = np.zeros(length, dtype=bool)
+    is_standard[position] = standard
+    full_coords = np.full((length, len(BACKBONE_ATOMS), 3), np.nan, dtype=np.float32)
+    full_coords[position] = coords
+
+    return ChainBackbone(
+        chain_id=chain_id,
+        sequence=seq.tobytes().decode("ascii"),
+        residue_numbers=np.repeat(np.arange(lo, hi + 1, dtype=np.int32), slots),
+        coords=full_coords,
+        standard=is_standard,
+    )
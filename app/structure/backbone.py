@@ -0,0 +1,235 @@
+"""Compact backbone representation shared by validation and featurization.
+
+A structure is parsed once into per-chain NumPy arrays of N/CA/C/O
+coordinates plus sequence and residue numbering. The layout follows
+ProteinMPNN's ``parse_PDB``: residue numbers run contiguously from the
+first to the last observed residue, and gaps are filled with ``X`` and NaN
+coordinates, which the model masks out.
+"""
+
+import hashlib
+import io
+import string
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from Bio.PDB.Structure import Structure
+
+BACKBONE_ATOMS = ("N", "CA", "C", "O")
+
+THREE_TO_ONE = {
+    "ALA": "A", "ARG": "R", "ASN": "N", "ASP": "D", "CYS": "C",
+    "GLN": "Q", "GLU": "E", "GLY": "G", "HIS": "H", "ILE": "I",
+    "LEU": "L", "LYS": "K", "MET": "M", "PHE": "F", "PRO": "P",
+    "SER": "S", "THR": "T", "TRP": "W", "TYR": "Y", "VAL": "V",
+}
+
+ONE_TO_THREE = {v: k for k, v in THREE_TO_ONE.items()}
+
+# ProteinMPNN reads selenomethionine HETATMs as methionine
+_HET_AS_STANDARD = {"MSE": "MET"}
+
+# parse_PDB's chain alphabet, in the order it emits chains
+_CHAIN_ORDER = {
+    c: i
+    for i, c in enumerate(
+        list(string.ascii_uppercase)
+        + list(string.ascii_lowercase)
+        + [str(n) for n in range(300)]
+    )
+}
+
+
+def chain_sort_key(chain_id: str) -> tuple[int, str]:
+    return (_CHAIN_ORDER.get(chain_id, len(_CHAIN_ORDER)), chain_id)
+
+
+@dataclass
+class ChainBackbone:
+    """One chain, one row per residue position (gaps included)."""
+
+    chain_id: str
+    sequence: str
+    residue_numbers: np.ndarray  # (L,) int32, PDB resSeq
+    coords: np.ndarray  # (L, 4, 3) float32, N/CA/C/O; NaN where missing
+    standard: np.ndarray  # (L,) bool, residue came from an ATOM record
+
+    @property
+    def num_standard(self) -> int:
+        return int(self.standard.sum())
+
+    @property
+    def num_ca(self) -> int:
+        """Standard residues with a CA atom."""
+        return int((self.standard & np.isfinite(self.coords[:, 1, 0])).sum())
+
+
+@dataclass
+class Backbone:
+    """Backbone arrays for every protein chain of a structure."""
+
+    name: str
+    chains: dict[str, ChainBackbone]
+    # Every chain ID in the first model, including ligand/water-only chains
+    chain_ids: list[str] = field(default_factory=list)
+    # Distant context was removed (see crop.py); no longer matches the file
+    cropped: bool = False
+
+    def num_residues(self, chains: list[str]) -> int:
+        """Standard residues across ``chains``."""
+        return sum(
+            self.chains[c].num_standard for c in chains if c in self.chains
+        )
+
+    def native_sequence(self, chains: list[str]) -> str:
+        """Native sequence of ``chains`` as ProteinMPNN reports it.
+
+        Chains are in alphabetical order, joined with '/'.
+        """
+        return "/".join(self.chains[c].sequence for c in sorted(chains))
+
+    def digest(self) -> str:
+        """Hash of everything featurization reads: chains, sequences, coordinates."""
+        h = hashlib.sha256()
+        for chain_id in sorted(self.chains, key=chain_sort_key):
+            chain = self.chains[chain_id]
+            h.update(f"{chain_id}:{chain.sequence}\n".encode())
+            h.update(np.ascontiguousarray(chain.coords, dtype=np.float32).tobytes())
+        return h.hexdigest()
+
+    def to_mpnn_dict(self) -> dict:
+        """Build the dict ProteinMPNN's ``parse_PDB`` would have returned."""
+        entry: dict = {}
+        concat_seq = ""
+        for chain_id in sorted(self.chains, key=chain_sort_key):
+            chain = self.chains[chain_id]
+            entry[f"seq_chain_{chain_id}"] = chain.sequence
+            entry[f"coords_chain_{chain_id}"] = {
+                f"{atom}_chain_{chain_id}": chain.coords[:, i, :].astype(float).tolist()
+                for i, atom in enumerate(BACKBONE_ATOMS)
+            }
+            concat_seq += chain.sequence
+        entry["name"] = self.name
+        entry["num_of_chains"] = len(self.chains)
+        entry["seq"] = concat_seq
+        return entry
+
+    def to_pdb(self) -> str:
+        """Backbone-only PDB text (N/CA/C/O), enough for ``parse_PDB``.
+
+        Used to hand mmCIF/BinaryCIF inputs to the vendored scripts, which
+        only read PDB. Insertion codes are renumbered A, B, ... in order.
+
+        Raises:
+            ValueError: If a chain ID is longer than the PDB format allows.
+        """
+        lines = []
+        serial = 1
+        for chain_id in sorted(self.chains, key=chain_sort_key):
+            if len(chain_id) != 1:
+                raise ValueError(f"Chain ID {chain_id!r} does not fit the PDB format")
+            chain = self.chains[chain_id]
+            previous, icode = None, " "
+            for i, letter in enumerate(chain.sequence):
+                resseq = int(chain.residue_numbers[i])
+                if resseq != previous:
+                    icode = " "
+                else:
+                    icode = "A" if icode == " " else chr(ord(icode) + 1)
+                previous = resseq
+                if chain.standard[i]:
+                    record, resname = "ATOM  ", ONE_TO_THREE.get(letter, "UNK")
+                else:
+                    record, resname = "HETATM", "MSE"
+                for atom, xyz in zip(BACKBONE_ATOMS, chain.coords[i]):
+                    if not np.isfinite(xyz).all():
+                        continue
+                    lines.append(
+                        f"{record}{serial:5d}  {atom:<3} {resname:>3} {chain_id}"
+                        f"{resseq:4d}{icode}   {xyz[0]:8.3f}{xyz[1]:8.3f}{xyz[2]:8.3f}"
+                        f"  1.00  0.00           {atom[0]}\n"
+                    )
+                    serial += 1
+            lines.append("TER\n")
+        lines.append("END\n")
+        return "".join(lines)
+
+
+def _build_chain(
+    chain_id: str,
+    residues: dict[int, list[tuple[str, str, bool, np.ndarray]]],
+) -> ChainBackbone:
+    """Lay residues out over the contiguous resSeq range, filling gaps.
+
+    ``residues`` maps resSeq to ``(icode, one_letter, standard, coords)``
+    entries; insertion codes at the same resSeq are kept in sorted order.
+    """
+    seq: list[str] = []
+    numbers: list[int] = []
+    coords: list[np.ndarray] = []
+    standard: list[bool] = []
+    gap = np.full((4, 3), np.nan, dtype=np.float32)
+
+    for resseq in range(min(residues), max(residues) + 1):
+        entries = residues.get(resseq)
+        if not entries:
+            seq.append("X")
+            numbers.append(resseq)
+            coords.append(gap)
+            standard.append(False)
+            continue
+        for _icode, letter, is_standard, xyz in sorted(entries, key=lambda e: e[0]):
+            seq.append(letter)
+            numbers.append(resseq)
+            coords.append(xyz)
+            standard.append(is_standard)
+
+    return ChainBackbone(
+        chain_id=chain_id,
+        sequence="".join(seq),
+        residue_numbers=np.asarray(numbers, dtype=np.int32),
+        coords=np.stack(coords).astype(np.float32),
+        standard=np.asarray(standard, dtype=bool),
+    )
+
+
+def backbone_from_structure(structure: "Structure", name: str = "input") -> Backbone:
+    """Collect backbone arrays from the first model of a BioPython Structure."""
+    model = structure[0]
+    chains: dict[str, ChainBackbone] = {}
+    chain_ids: list[str] = []
+
+    for chain in model:
+        chain_ids.append(chain.get_id())
+        residues: dict[int, list] = {}
+        for residue in chain:
+            hetflag, resseq, icode = residue.get_id()
+            resname = residue.get_resname()
+            if hetflag != " ":
+                if hetflag[2:] not in _HET_AS_STANDARD:
+                    continue
+                resname = _HET_AS_STANDARD[hetflag[2:]]
+            xyz = np.full((4, 3), np.nan, dtype=np.float32)
+            for i, atom in enumerate(BACKBONE_ATOMS):
+                if atom in residue:
+                    xyz[i] = residue[atom].get_coord()
+            residues.setdefault(resseq, []).append(
+                (icode.strip(), THREE_TO_ONE.get(resname, "X"), hetflag == " ", xyz)
+            )
+        if residues:
+            chains[chain.get_id()] = _build_chain(chain.get_id(), residues)
+
+    return Backbone(name=name, chains=chains, chain_ids=chain_ids)
+
+
+def parse_pdb_backbone(data: bytes, name: str = "input") -> Backbone:
+    """Parse PDB text into a Backbone. BioPython errors propagate."""
+    from Bio.PDB import PDBParser  # BioPython is only imported for the fallback
+
+    structure = PDBParser(QUIET=True).get_structure(
+        name, io.StringIO(data.decode("utf-8", errors="replace"))
+    )
+    return backbone_from_structure(structure, name=name)
@@ -0,0 +1,120 @@
+"""Crop distant structural context from very large complexes.
+
+Fixed chains only condition the design through the k-NN graph, so residues
+far from every designed residue contribute almost nothing but still cost
+memory in featurization and sampling. Above ``LARGE_STRUCTURE_RESIDUES``
+positions, fixed-chain residues whose CA is further than the context
+radius from all designed CAs are dropped. Designed chains are never
+cropped.
+"""
+
+import logging
+import string
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from app.config import CONTEXT_RADIUS, LARGE_STRUCTURE_RESIDUES
+from app.structure.backbone import Backbone, ChainBackbone, chain_sort_key
+
+if TYPE_CHECKING:
+    from Bio.PDB.kdtrees import KDTree
+
+logger = logging.getLogger(__name__)
+
+# Single-character IDs (all ProteinMPNN's featurization accepts) for the
+# extra segments a cropped chain splits into
+_SPARE_CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+
+
+def num_positions(backbone: Backbone) -> int:
+    """Residue positions across all chains, gaps included: what the model sees."""
+    return sum(len(chain.sequence) for chain in backbone.chains.values())
+
+
+def _runs(keep: np.ndarray) -> list[slice]:
+    """Maximal runs of True in ``keep``."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], keep.astype(np.int8), [0]))))
+    return [slice(start, stop) for start, stop in zip(edges[::2], edges[1::2])]
+
+
+def _near(tree: "KDTree", ca: np.ndarray, radius: float) -> np.ndarray:
+    """Positions with a CA within ``radius`` of the tree's points.
+
+    Gap positions (no CA) are kept when the resolved residues either side
+    of them are, so a nearby stretch isn't split at a missing residue.
+    """
+    n = len(ca)
+    finite = np.isfinite(ca).all(axis=1)
+    near = np.zeros(n + 1, dtype=bool)  # near[n] (and near[-1]) stay False
+    for i in np.flatnonzero(finite):
+        near[i] = bool(tree.search(ca[i].astype(np.float64), radius))
+    idx = np.arange(n)
+    before = np.maximum.accumulate(np.where(finite, idx, -1))
+    after = np.minimum.accumulate(np.where(finite, idx, n)[::-1])[::-1]
+    return np.where(finite, near[:n], near[before] & near[after])
+
+
+def _select(chain: ChainBackbone, chain_id: str, rows: slice | np.ndarray) -> ChainBackbone:
+    """Rows of ``chain`` (a slice or boolean mask) as chain ``chain_id``."""
+    letters = np.frombuffer(chain.sequence.encode(), dtype="S1")
+    return ChainBackbone(
+        chain_id=chain_id,
+        sequence=letters[rows].tobytes().decode(),
+        residue_numbers=chain.residue_numbers[rows],
+        coords=chain.coords[rows],
+        standard=chain.standard[rows],
+    )
+
+
+def crop_context(
+    backbone: Backbone,
+    chains: list[str],
+    radius: float = CONTEXT_RADIUS,
+    min_positions: int = LARGE_STRUCTURE_RESIDUES,
+) -> Backbone:
+    """``backbone`` with fixed-chain residues beyond ``radius`` Å removed.
+
+    Returned unchanged at or below ``min_positions``. Each kept stretch of a
+    fixed chain becomes its own chain, so the model doesn't treat residues
+    either side of a cut as sequence neighbours; a chain keeps one merged
+    segment once spare chain IDs run out.
+    """
+    if num_positions(backbone) <= min_positions:
+        return backbone
+    from Bio.PDB.kdtrees import KDTree
+
+    designed_ca = np.concatenate([backbone.chains[c].coords[:, 1, :] for c in chains])
+    designed_ca = designed_ca[np.isfinite(designed_ca).all(axis=1)].astype(np.float64)
+    tree = KDTree(np.ascontiguousarray(designed_ca), 10)
+
+    spare = [c for c in _SPARE_CHAIN_IDS if c not in backbone.chain_ids]
+    cropped: dict[str, ChainBackbone] = {}
+    for chain_id in sorted(backbone.chains, key=chain_sort_key):
+        chain = backbone.chains[chain_id]
+        if chain_id in chains:
+            cropped[chain_id] = chain
+            continue
+        keep = _near(tree, chain.coords[:, 1, :], radius)
+        runs = _runs(keep)
+        if not runs:
+            continue
+        if len(runs) - 1 > len(spare):
+            cropped[chain_id] = _select(chain, chain_id, keep)
+            continue
+        cropped[chain_id] = _select(chain, chain_id, runs[0])
+        for run in runs[1:]:
+            segment_id = spare.pop(0)
+            cropped[segment_id] = _select(chain, segment_id, run)
+
+    result = Backbone(
+        name=backbone.name,
+        chains=cropped,
+        chain_ids=backbone.chain_ids + [c for c in cropped if c not in backbone.chain_ids],
+        cropped=True,
+    )
+    logger.info(
+        "Cropped %s context to %.0f A: %d of %d positions kept",
+        backbone.name, radius, num_positions(result), num_positions(backbone),
+    )
+    return result
@@ -0,0 +1,62 @@
+"""Structure file formats and the parser used for each."""
+
+import logging
+from pathlib import Path
+
+from app.structure.backbone import Backbone, parse_pdb_backbone
+from app.structure.mmcif import (
+    parse_mmcif_backbone,
+    scan_bcif_backbone,
+    scan_mmcif_backbone,
+)
+from app.structure.pdb_scan import scan_pdb_backbone
+
+logger = logging.getLogger(__name__)
+
+FORMAT_SUFFIXES = {
+    ".pdb": "pdb",
+    ".ent": "pdb",
+    ".cif": "mmcif",
+    ".mmcif": "mmcif",
+    ".bcif": "bcif",
+}
+FORMAT_LABELS = {"pdb": "PDB", "mmcif": "mmCIF", "bcif": "BinaryCIF"}
+
+# Columnar readers, and the BioPython parsers they fall back to
+_SCANNERS = {
+    "pdb": scan_pdb_backbone,
+    "mmcif": scan_mmcif_backbone,
+    "bcif": scan_bcif_backbone,
+}
+_PARSERS = {
+    "pdb": parse_pdb_backbone,
+    "mmcif": parse_mmcif_backbone,
+}
+
+
+def structure_format(filename: str) -> str:
+    """Format of a structure file from its name (``.gz`` ignored); PDB if unknown."""
+    name = filename.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return FORMAT_SUFFIXES.get(Path(name).suffix, "pdb")
+
+
+def load_backbone(
+    data: bytes, name: str = "input", fmt: str = "pdb", parser: str = "fast"
+) -> Backbone:
+    """Parse structure bytes of any supported format into a Backbone.
+
+    ``parser="fast"`` uses the columnar reader and falls back to BioPython
+    when it can't read the file; ``"biopython"`` goes straight to BioPython.
+    BinaryCIF has no BioPython fallback. Parse errors propagate.
+    """
+    fallback = _PARSERS.get(fmt)
+    if parser == "fast" or fallback is None:
+        try:
+            return _SCANNERS[fmt](data, name=name)
+        except Exception as e:
+            if fallback is None:
+                raise
+            logger.debug("Fast %s scan failed for %s, using BioPython: %s", fmt, name, e)
+    return fallback(data, name=name)
@@ -0,0 +1,259 @@
+"""Columnar mmCIF and BinaryCIF readers.
+
+Only the ``atom_site`` category is read, and only the columns a Backbone
+needs are turned into arrays; everything else in the file is skipped. Both
+readers hand their columns to ``backbone_from_atoms``, so chains, residue
+numbering and gap filling match the PDB path.
+
+Chains use ``auth_asym_id`` and residues ``auth_seq_id``, the identifiers
+users know from the PDB format (and what BioPython's MMCIFParser uses).
+"""
+
+import io
+import re
+
+import numpy as np
+
+from app.structure.atoms import backbone_from_atoms
+from app.structure.backbone import Backbone, backbone_from_structure
+
+try:
+    import msgpack
+except ImportError:  # BinaryCIF support is optional
+    msgpack = None
+
+_ATOM_SITE = b"_atom_site."
+_LOOP_END = re.compile(rb"^(?:#|loop_|_|data_)", re.MULTILINE)
+_TOKEN = re.compile(rb"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""", re.DOTALL)
+_MISSING = (b"?", b".")
+
+# atom_site columns read, in order of preference
+_COLUMNS = {
+    "group": ("group_PDB",),
+    "chain": ("auth_asym_id", "label_asym_id"),
+    "resseq": ("auth_seq_id", "label_seq_id"),
+    "icode": ("pdbx_PDB_ins_code",),
+    "resname": ("label_comp_id", "auth_comp_id"),
+    "atom_name": ("label_atom_id", "auth_atom_id"),
+    "occupancy": ("occupancy",),
+    "x": ("Cartn_x",),
+    "y": ("Cartn_y",),
+    "z": ("Cartn_z",),
+    "model": ("pdbx_PDB_model_num",),
+}
+_OPTIONAL = {"icode", "occupancy", "model"}
+
+
+def _pick(available, field: str):
+    for name in _COLUMNS[field]:
+        if name in available:
+            return name
+    if field in _OPTIONAL:
+        return None
+    raise ValueError(f"atom_site has no {_COLUMNS[field][0]} column")
+
+
+def _atom_site_loop(data: bytes) -> tuple[list[str], int, int]:
+    """Column names and the byte range of the atom_site loop's values."""
+    start = data.find(b"\n" + _ATOM_SITE) + 1
+    if start == 0:
+        raise ValueError("No atom_site records")
+    if not data[:start].rstrip().endswith(b"loop_"):
+        raise ValueError("atom_site is not a loop")
+
+    names: list[str] = []
+    pos = start
+    while data.startswith(_ATOM_SITE, pos):
+        end = data.find(b"\n", pos)
+        end = len(data) if end == -1 else end
+        names.append(data[pos + len(_ATOM_SITE):end].strip().decode())
+        pos = end + 1
+    stop = _LOOP_END.search(data, pos)
+    return names, pos, stop.start() if stop else len(data)
+
+
+def _token_bounds(buf: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start/end offsets of whitespace-separated tokens."""
+    is_token = buf > ord(" ")
+    before = np.concatenate(([False], is_token[:-1]))
+    after = np.concatenate((is_token[1:], [False]))
+    return (
+        np.flatnonzero(is_token & ~before),
+        np.flatnonzero(is_token & ~after) + 1,
+    )
+
+
+def _gather(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Tokens ``buf[start:end]`` as one ``S`` array (NUL-padded, so unpadded)."""
+    width = max(int((ends - starts).max(initial=1)), 1)
+    idx = starts[:, None] + np.arange(width)
+    raw = buf[np.minimum(idx, buf.size - 1)]
+    raw[idx >= ends[:, None]] = 0
+    return raw.view(f"S{width}").ravel()
+
+
+def scan_mmcif_backbone(data: bytes, name: str = "input") -> Backbone:
+    """Build a Backbone from mmCIF text via its atom_site columns.
+
+    Unquoted loops (the common case) are split with NumPy into token offsets,
+    and only the columns used are ever materialized. Raises ValueError on
+    anything it can't read; callers fall back to ``parse_mmcif_backbone``.
+    """
+    names, start, end = _atom_site_loop(data)
+    ncols = len(names)
+    index = {n: i for i, n in enumerate(names)}
+
+    if data.find(b"'", start, end) != -1 or data.find(b'"', start, end) != -1:
+        tokens = [m.group(m.lastindex) for m in _TOKEN.finditer(data, start, end)]
+        count = len(tokens)
+
+        def values(i: int) -> np.ndarray:
+            return np.array(tokens[i::ncols], dtype=bytes)
+    else:
+        buf = np.frombuffer(data, dtype=np.uint8)[start:end]
+        starts, ends = _token_bounds(buf)
+        count = starts.size
+
+        def values(i: int) -> np.ndarray:
+            return _gather(buf, starts[i::ncols], ends[i::ncols])
+
+    if count == 0 or count % ncols:
+        raise ValueError("atom_site loop has a ragged row")
+
+    def column(field: str) -> np.ndarray | None:
+        col = _pick(index, field)
+        return None if col is None else values(index[col])
+
+    return _from_columns(name, column)
+
+
+def scan_bcif_backbone(data: bytes, name: str = "input") -> Backbone:
+    """Build a Backbone from BinaryCIF, decoding only the columns used."""
+    if msgpack is None:
+        raise ValueError("BinaryCIF input requires the msgpack package")
+    doc = msgpack.unpackb(data, raw=False)
+    categories = {
+        cat["name"].lstrip("_"): cat
+        for cat in doc["dataBlocks"][0]["categories"]
+    }
+    if "atom_site" not in categories:
+        raise ValueError("No atom_site records")
+    by_name = {col["name"]: col for col in categories["atom_site"]["columns"]}
+
+    def column(field: str) -> np.ndarray | None:
+        col = _pick(by_name, field)
+        if col is None:
+            return None
+        return _bcif_column(by_name[col])
+
+    return _from_columns(name, column)
+
+
+def _from_columns(name: str, column) -> Backbone:
+    model = column("model")
+    # First model only, matching structure[0] in BioPython
+    in_model = slice(None) if model is None else model == model[0]
+
+    def text(field: str, default: bytes) -> np.ndarray | None:
+        values = column(field)
+        if values is None:
+            return None
+        values = values[in_model]
+        if values.dtype.kind != "S":
+            values = values.astype(bytes)
+        return np.where(np.isin(values, _MISSING), default, values)
+
+    group = text("group", b"")
+    icode = text("icode", b" ")
+    occupancy = text("occupancy", b"1")
+    return backbone_from_atoms(
+        name,
+        chain=text("chain", b""),
+        standard=group == b"ATOM",
+        resseq=column("resseq")[in_model].astype(np.int64),
+        icode=np.full(group.size, b" ") if icode is None else icode,
+        resname=text("resname", b""),
+        atom_name=text("atom_name", b""),
+        occupancy=(
+            np.ones(group.size) if occupancy is None
+            else occupancy.astype(np.float64)
+        ),
+        xyz=np.stack(
+            [column(axis)[in_model].astype(np.float64) for axis in "xyz"], axis=1
+        ).astype(np.float32),
+    )
+
+
+def parse_mmcif_backbone(data: bytes, name: str = "input") -> Backbone:
+    """Parse mmCIF text with BioPython's MMCIFParser. Errors propagate."""
+    from Bio.PDB import MMCIFParser
+
+    structure = MMCIFParser(QUIET=True).get_structure(
+        name, io.StringIO(data.decode("utf-8", errors="replace"))
+    )
+    return backbone_from_structure(structure, name=name)
+
+
+# --- BinaryCIF column decoding (https://github.com/molstar/BinaryCIF) ---
+
+_BCIF_DTYPES = {
+    1: np.int8, 2: np.int16, 3: np.int32,
+    4: np.uint8, 5: np.uint16, 6: np.uint32,
+    32: np.float32, 33: np.float64,
+}
+
+
+def _bcif_column(column: dict) -> np.ndarray:
+    values = _bcif_decode(column["data"]["data"], column["data"]["encoding"])
+    mask = column.get("mask")
+    if mask is not None:
+        # Non-zero mask entries are "." / "?" values
+        missing = _bcif_decode(mask["data"], mask["encoding"]) != 0
+        if missing.any():
+            values = values.astype(bytes) if values.dtype.kind != "S" else values.copy()
+            values[missing] = b"?"
+    return values
+
+
+def _bcif_decode(data, encodings: list[dict]) -> np.ndarray:
+    for enc in reversed(encodings):
+        kind = enc["kind"]
+        if kind == "ByteArray":
+            data = np.frombuffer(data, dtype=np.dtype(_BCIF_DTYPES[enc["type"]]).newbyteorder("<"))
+        elif kind == "FixedPoint":
+            data = (data / enc["factor"]).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "IntervalQuantization":
+            step = (enc["max"] - enc["min"]) / (enc["numSteps"] - 1)
+            data = (enc["min"] + data * step).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "RunLength":
+            data = np.repeat(data[::2], data[1::2]).astype(_BCIF_DTYPES[enc["srcType"]])
+        elif kind == "Delta":
+            data = (np.cumsum(data, dtype=np.int64) + enc["origin"]).astype(
+                _BCIF_DTYPES[enc["srcType"]]
+            )
+        elif kind == "IntegerPacking":
+            data = _unpack_integers(data, enc["isUnsigned"])
+        elif kind == "StringArray":
+            offsets = _bcif_decode(enc["offsets"], enc["offsetEncoding"])
+            indices = _bcif_decode(data, enc["dataEncoding"])
+            text = enc["stringData"]
+            # A trailing empty string so masked (-1) indices decode to b""
+            strings = np.array(
+                [text[a:b].encode() for a, b in zip(offsets[:-1], offsets[1:])] + [b""],
+                dtype=bytes,
+            )
+            data = strings[indices]
+        else:
+            raise ValueError(f"Unsupported BinaryCIF encoding: {kind}")
+    return data
+
+
+def _unpack_integers(packed: np.ndarray, unsigned: bool) -> np.ndarray:
+    """Undo IntegerPacking: runs of limit values add up with the next value."""
+    info = np.iinfo(packed.dtype)
+    at_limit = packed == info.max
+    if not unsigned:
+        at_limit |= packed == info.min
+    ends = np.flatnonzero(~at_limit)
+    sums = np.cumsum(packed, dtype=np.int64)[ends]
+    return np.diff(sums, prepend=0).astype(np.int32)
@@ -0,0 +1,110 @@
+"""Fixed-column PDB scanner that builds a Backbone without BioPython.
+
+PDB coordinate records are fixed-width, so every field can be sliced out of
+the raw buffer for all lines at once. Nothing is allocated per atom beyond a
+few NumPy columns, which keeps validation of large assemblies cheap compared
+to building a full ``Structure`` tree.
+
+The result matches ``backbone_from_structure(PDBParser().get_structure(...))``
+for well-formed files: first model only, MSE read as MET, the highest
+occupancy altloc wins. Anything the scanner can't read (bad coordinates,
+hybrid-36 residue numbers) raises, and callers fall back to BioPython so
+error messages stay the same.
+"""
+
+import numpy as np
+
+from app.structure.atoms import backbone_from_atoms
+from app.structure.backbone import Backbone
+
+_NEWLINE = ord("\n")
+_SPACE = ord(" ")
+_CR = ord("\r")
+
+_ATOM = np.frombuffer(b"ATOM  ", dtype=np.uint8)
+_HETATM = np.frombuffer(b"HETATM", dtype=np.uint8)
+_ENDMDL = np.frombuffer(b"ENDMDL", dtype=np.uint8)
+
+
+class _Lines:
+    """Start/end offsets of every line in a byte buffer."""
+
+    def __init__(self, buf: np.ndarray):
+        breaks = np.flatnonzero(buf == _NEWLINE)
+        self.buf = buf
+        self.starts = np.concatenate(([0], breaks + 1))
+        self.ends = np.concatenate((breaks, [buf.size]))
+
+    def select(self, mask: np.ndarray) -> "_Lines":
+        sub = object.__new__(_Lines)
+        sub.buf = self.buf
+        sub.starts = self.starts[mask]
+        sub.ends = self.ends[mask]
+        return sub
+
+    def __len__(self) -> int:
+        return self.starts.size
+
+    def columns(self, start: int, stop: int) -> np.ndarray:
+        """Bytes ``[start, stop)`` of every line as an ``S{width}`` array.
+
+        Short lines are padded with spaces, like a PDB reader would assume.
+        """
+        width = stop - start
+        idx = self.starts[:, None] + np.arange(start, stop)
+        inside = idx < self.ends[:, None]
+        raw = self.buf[np.minimum(idx, self.buf.size - 1)]
+        raw = np.where(inside & (raw != _CR), raw, _SPACE).astype(np.uint8)
+        return np.ascontiguousarray(raw).view(f"S{width}").ravel()
+
+    def record_is(self, record: np.ndarray) -> np.ndarray:
+        head = self.columns(0, 6).view(np.uint8).reshape(-1, 6)
+        return (head == record).all(axis=1)
+
+
+def scan_pdb_backbone(data, name: str = "input") -> Backbone:
+    """Build a Backbone straight from PDB bytes (or an mmap of them).
+
+    Raises ValueError on fields the scanner can't convert; callers should
+    fall back to ``parse_pdb_backbone`` rather than report it.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return Backbone(name=name, chains={}, chain_ids=[])
+    lines = _Lines(buf)
+    is_atom = lines.record_is(_ATOM)
+    is_coord = is_atom | lines.record_is(_HETATM)
+
+    # First model only, as BioPython's structure[0]. (The vendored parse_PDB
+    # does not stop at ENDMDL: it reads every ATOM line in the file.)
+    endmdl = np.flatnonzero(lines.record_is(_ENDMDL))
+    first_model = np.arange(len(lines)) < (endmdl[0] if endmdl.size else len(lines))
+
+    records = lines.select(is_coord)
+    # Converted for every model so malformed records fail here, as they would
+    # in BioPython, rather than slipping through
+    xyz = np.stack(
+        [records.columns(a, a + 8).astype(np.float64) for a in (30, 38, 46)],
+        axis=1,
+    ).astype(np.float32)
+    resseq = records.columns(22, 26).astype(np.int64)
+
+    in_model = first_model[is_coord]
+    records = records.select(in_model)
+    return backbone_from_atoms(
+        name,
+        chain=records.columns(21, 22),
+        standard=is_atom[is_coord][in_model],
+        resseq=resseq[in_model],
+        icode=records.columns(26, 27),
+        resname=np.char.strip(records.columns(17, 20)),
+        atom_name=np.char.strip(records.columns(12, 16)),
+        occupancy=_occupancy(records.columns(54, 60)),
+        xyz=xyz[in_model],
+    )
+
+
+def _occupancy(column: np.ndarray) -> np.ndarray:
+    """Occupancies as floats; blank fields count as fully occupied."""
+    stripped = np.char.strip(column)
+    return np.where(stripped == b"", b"1", stripped).astype(np.float64)
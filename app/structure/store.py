@@ -0,0 +1,298 @@
+"""Registry of validated structures, stored as memory-mappable backbones.
+
+A structure is validated and parsed once, when it is registered, and its
+Backbone written to ``<dir>/<structure_id>.mpnnbb``:
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header
+    | padding to 64 bytes | coords (N, 4, 3) float32
+    | residue numbers (N,) int32 | standard (N,) uint8
+
+All chains' rows are concatenated; the header holds each chain's offset,
+length and sequence, plus what validation found (residue and CA counts per
+chain). Loading maps the file read-only and builds the arrays as views
+into the mapping, so nothing is copied or parsed. Recently used backbones
+are kept in a size-bounded LRU hot set.
+
+The ID is a prefix of the structure's ``structure_digest``, so registering
+the same coordinates twice yields the same ID, and designs of a stored
+structure share result cache entries with uploads of the same file.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.cache import FeatureCache
+from app.config import STRUCTURE_STORE_DIR, STRUCTURE_STORE_HOT_MB
+from app.structure.backbone import Backbone, ChainBackbone, chain_sort_key
+
+MAGIC = b"MPNNBB01"
+SUFFIX = ".mpnnbb"
+ID_LENGTH = 16
+_LENGTH = struct.Struct("<Q")
+_ALIGN = 64
+
+
+class StructureNotFoundError(LookupError):
+    """Raised for an unknown structure ID. Maps to HTTP 404"""
+
+
+@dataclass(frozen=True)
+class StoredStructure:
+    """A registered structure's header: everything but the arrays."""
+
+    structure_id: str
+    name: str
+    format: str
+    digest: str
+    # chain -> {"residues", "standard_residues", "ca_atoms"}, from validation
+    chains: dict[str, dict[str, int]]
+    chain_ids: list[str]
+    size_bytes: int
+    created_at: float
+
+    # A stored structure stands in for an upload: there is no file to hand
+    # ProteinMPNN (the backbone is written out if needed) and nothing to close
+    path = None
+
+    def close(self) -> None:
+        pass
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def write_backbone(path: Path, backbone: Backbone, info: StoredStructure) -> None:
+    """Write ``backbone`` with header ``info`` to ``path``, atomically."""
+    order = sorted(backbone.chains, key=chain_sort_key)
+    chains, offset = [], 0
+    for chain_id in order:
+        chain = backbone.chains[chain_id]
+        chains.append({
+            "chain_id": chain_id,
+            "sequence": chain.sequence,
+            "offset": offset,
+            "length": len(chain.sequence),
+        })
+        offset += len(chain.sequence)
+    arrays = {
+        "coords": np.concatenate(
+            [backbone.chains[c].coords for c in order]
+        ).astype("<f4"),
+        "residue_numbers": np.concatenate(
+            [backbone.chains[c].residue_numbers for c in order]
+        ).astype("<i4"),
+        "standard": np.concatenate(
+            [backbone.chains[c].standard for c in order]
+        ).astype(np.uint8),
+    }
+
+    # Array offsets depend on the header length, which includes them;
+    # repeat until the offsets stop changing (a pass or two)
+    layout: dict[str, dict] = {}
+    while True:
+        header = json.dumps({
+            "info": asdict(info),
+            "cropped": backbone.cropped,
+            "chains": chains,
+            "arrays": layout,
+        }).encode()
+        start = _aligned(len(MAGIC) + _LENGTH.size + len(header))
+        new_layout = {}
+        for key, array in arrays.items():
+            new_layout[key] = {
+                "offset": start,
+                "dtype": array.dtype.str,
+                "shape": list(array.shape),
+            }
+            start = _aligned(start + array.nbytes)
+        if new_layout == layout:
+            break
+        layout = new_layout
+
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _LENGTH.pack(len(header)) + header)
+        for key, array in arrays.items():
+            f.seek(layout[key]["offset"])
+            f.write(array.tobytes())
+    tmp.replace(path)
+
+
+def _read_header(f) -> dict:
+    prefix = f.read(len(MAGIC) + _LENGTH.size)
+    if len(prefix) < len(MAGIC) + _LENGTH.size or not prefix.startswith(MAGIC):
+        raise ValueError("Not a stored structure")
+    (length,) = _LENGTH.unpack(prefix[len(MAGIC):])
+    return json.loads(f.read(length))
+
+
+def _info(header: dict) -> StoredStructure:
+    return StoredStructure(**header["info"])
+
+
+def map_backbone(path: Path) -> tuple[Backbone, int]:
+    """The Backbone stored at ``path`` as read-only views of a memory map,
+    and the mapped size in bytes."""
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    arrays = {}
+    for key, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        arrays[key] = np.frombuffer(
+            mapped, dtype=dtype, count=count, offset=spec["offset"]
+        ).reshape(spec["shape"])
+    standard = arrays["standard"].view(bool)
+
+    chains = {}
+    for entry in header["chains"]:
+        rows = slice(entry["offset"], entry["offset"] + entry["length"])
+        chains[entry["chain_id"]] = ChainBackbone(
+            chain_id=entry["chain_id"],
+            sequence=entry["sequence"],
+            residue_numbers=arrays["residue_numbers"][rows],
+            coords=arrays["coords"][rows],
+            standard=standard[rows],
+        )
+    info = _info(header)
+    backbone = Backbone(
+        name=info.name,
+        chains=chains,
+        chain_ids=list(info.chain_ids),
+        cropped=header["cropped"],
+    )
+    return backbone, len(mapped)
+
+
+class StructureStore:
+    """Registered structures on disk, with an in-memory hot set.
+
+    Headers of every stored structure are read at startup and kept in
+    memory. Backbones are mapped on first use and kept in an LRU bounded
+    by ``hot_mb`` of mapped bytes; an evicted backbone is unmapped once
+    no design still holds it.
+    """
+
+    def __init__(
+        self,
+        directory: Path = STRUCTURE_STORE_DIR,
+        hot_mb: float = STRUCTURE_STORE_HOT_MB,
+    ):
+        self.directory = directory
+        self._hot = FeatureCache(max_mb=hot_mb)
+        self._index: dict[str, StoredStructure] = {}
+        self._lock = threading.Lock()
+        if directory.is_dir():
+            for path in directory.glob(f"*{SUFFIX}"):
+                try:
+                    with open(path, "rb") as f:
+                        info = _info(_read_header(f))
+                except (OSError, ValueError, TypeError, KeyError):
+                    continue  # partly written or foreign; never indexed
+                self._index[info.structure_id] = info
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _path(self, structure_id: str) -> Path:
+        return self.directory / f"{structure_id}{SUFFIX}"
+
+    def structures(self) -> list[StoredStructure]:
+        with self._lock:
+            return sorted(self._index.values(), key=lambda s: s.created_at)
+
+    def info(self, structure_id: str) -> StoredStructure:
+        """Raises: StructureNotFoundError: If no such structure is stored."""
+        with self._lock:
+            info = self._index.get(structure_id)
+        if info is None:
+            raise StructureNotFoundError(f"Structure {structure_id} not found")
+        return info
+
+    def put(
+        self, backbone: Backbone, digest: str, fmt: str, size_bytes: int
+    ) -> StoredStructure:
+        """Store a validated ``backbone``; ``digest`` is the source's
+        ``structure_digest``. Storing one already present returns it as is."""
+        structure_id = digest[:ID_LENGTH]
+        with self._lock:
+            existing = self._index.get(structure_id)
+        if existing is not None:
+            return existing
+
+        info = StoredStructure(
+            structure_id=structure_id,
+            name=backbone.name,
+            format=fmt,
+            digest=digest,
+            chains={
+                chain_id: {
+                    "residues": len(chain.sequence),
+                    "standard_residues": chain.num_standard,
+                    "ca_atoms": chain.num_ca,
+                }
+                for chain_id, chain in sorted(
+                    backbone.chains.items(), key=lambda c: chain_sort_key(c[0])
+                )
+            },
+            chain_ids=list(backbone.chain_ids),
+            size_bytes=size_bytes,
+            created_at=time.time(),
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        write_backbone(self._path(structure_id), backbone, info)
+        with self._lock:
+            self._index[structure_id] = info
+        return info
+
+    def get(self, structure_id: str) -> Backbone:
+        """The stored Backbone, mapped from disk unless it is in the hot set.
+
+        Raises:
+            StructureNotFoundError: If no such structure is stored.
+        """
+        backbone = self._hot.get(structure_id)
+        if backbone is not None:
+            return backbone
+        self.info(structure_id)
+        try:
+            backbone, nbytes = map_backbone(self._path(structure_id))
+        except FileNotFoundError:
+            raise StructureNotFoundError(f"Structure {structure_id} not found")
+        self._hot.put(structure_id, backbone, nbytes)
+        return backbone
+
+    def delete(self, structure_id: str) -> StoredStructure:
+        """Remove a structure. Designs already holding it are unaffected.
+
+        Raises:
+            StructureNotFoundError: If no such structure is stored.
+        """
+        with self._lock:
+            info = self._index.pop(structure_id, None)
+        if info is None:
+            raise StructureNotFoundError(f"Structure {structure_id} not found")
+        self._hot.discard(structure_id)
+        self._path(structure_id).unlink(missing_ok=True)
+        return info
+
+    def stats(self) -> dict:
+        hot = self._hot.stats()
+        return {
+            "structures": len(self._index),
+            "hot_hits": hot["hits"],
+            "hot_misses": hot["misses"],
+            "hot_entries": hot["entries"],
+            "hot_bytes": hot["bytes"],
+        }
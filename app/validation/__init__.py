@@ -1,3 +1,8 @@
-from app.validation.pdb import PDBValidationError, validate_pdb
+from app.validation.pdb import (
+    PDBValidationError,
+    validate_backbone,
+    validate_pdb,
+    validate_structure,
+)
 
-__all__ = ["PDBValidationError", "validate_pdb"]
+__all__ = ["PDBValidationError", "validate_backbone", "validate_pdb", "validate_structure"]
@@ -1,11 +1,9 @@
-"""PDB data validation for ProteinMPNN"""
+"""Structure data validation for ProteinMPNN (PDB, mmCIF, BinaryCIF)"""
 
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
-from Bio.PDB import PDBParser
-from Bio.PDB.Structure import Structure
-
-from app.config import MAX_PDB_SIZE_MB, MIN_CA_ATOMS
+from app.config import MAX_PDB_SIZE_MB, MIN_CA_ATOMS, VALIDATION_PARSER
+from app.structure import FORMAT_LABELS, Backbone, load_backbone, structure_format
 
 
 class PDBValidationError(ValueError):
@@ -16,54 +14,120 @@ def validate_pdb(
     pdb_path: Path,
     chains: list[str],
     max_size_mb: float = MAX_PDB_SIZE_MB,
-) -> Structure:
-    """Validate a PDB file for ProteinMPNN consumption.
+    parser: str = VALIDATION_PARSER,
+) -> Backbone:
+    """Validate a structure file for ProteinMPNN consumption.
+
+    The format (PDB, mmCIF or BinaryCIF) comes from the file suffix; every
+    format goes through the same checks and yields the same Backbone.
 
-    Checks run in order of increasing cost. Returns the parsed BioPython
-    Structure on success so the caller can reuse it.
+    Checks run in order of increasing cost. The file is read once and parsed
+    once; the resulting Backbone is returned so callers can count residues
+    and featurize without touching the file again.
+
+    ``parser="fast"`` uses the columnar NumPy readers and falls back to
+    BioPython for anything they can't read; ``"biopython"`` always builds the
+    full Structure. Both yield the same Backbone and the same errors.
 
     Raises:
         PDBValidationError: On any validation failure.
     """
-    _check_file_size(pdb_path, max_size_mb)
-    _check_has_atom_records(pdb_path)
-    structure = _parse_structure(pdb_path)
-    _check_chains_exist(structure, chains)
-    _check_backbone(structure, chains)
-    return structure
+    fmt = structure_format(pdb_path.name)
+    _check_file_size(pdb_path, max_size_mb, fmt)
+    return _validate(pdb_path.read_bytes(), pdb_path.stem, chains, parser, fmt)
+
 
+def validate_structure(
+    data: bytes,
+    name: str,
+    chains: list[str],
+    max_size_mb: float = MAX_PDB_SIZE_MB,
+    parser: str = VALIDATION_PARSER,
+) -> Backbone:
+    """``validate_pdb`` for structure bytes already in memory.
 
-def _check_file_size(pdb_path: Path, max_size_mb: float) -> None:
+    ``name`` is the file name the bytes came from; its suffix gives the
+    format and its stem the Backbone's name.
+
+    Raises:
+        PDBValidationError: On any validation failure.
+    """
+    fmt = structure_format(name)
+    _check_size(len(data), max_size_mb, fmt)
+    return _validate(data, PurePosixPath(name).stem, chains, parser, fmt)
+
+
+def validate_backbone(backbone: Backbone, chains: list[str]) -> None:
+    """The chain checks of ``validate_pdb``, for a backbone validated
+    without them (e.g. when it was registered).
+
+    Raises:
+        PDBValidationError: If a chain is missing or can't be designed.
+    """
+    _check_chains_exist(backbone, chains)
+    _check_backbone(backbone, chains)
+
+
+def _validate(data: bytes, name: str, chains: list[str], parser: str, fmt: str) -> Backbone:
+    _check_has_atom_records(data, fmt)
+    backbone = _parse_backbone(data, name, parser, fmt)
+    _check_chain_ids(backbone, fmt)
+    if fmt == "bcif" and not any(c.num_standard for c in backbone.chains.values()):
+        # Binary, so the ATOM record check can only run after decoding
+        raise PDBValidationError(f"{FORMAT_LABELS[fmt]} file contains no ATOM records")
+    validate_backbone(backbone, chains)
+    return backbone
+
+
+def _check_file_size(pdb_path: Path, max_size_mb: float, fmt: str = "pdb") -> None:
     try:
         size_bytes = pdb_path.stat().st_size
     except FileNotFoundError:
-        raise PDBValidationError(f"PDB file not found: {pdb_path}")
+        raise PDBValidationError(f"{FORMAT_LABELS[fmt]} file not found: {pdb_path}")
+    _check_size(size_bytes, max_size_mb, fmt)
+
+
+def _check_size(size_bytes: int, max_size_mb: float, fmt: str = "pdb") -> None:
     size_mb = size_bytes / (1024 * 1024)
     if size_mb > max_size_mb:
         raise PDBValidationError(
-            f"PDB file exceeds {max_size_mb} MB limit ({size_mb:.1f} MB)"
+            f"{FORMAT_LABELS[fmt]} file exceeds {max_size_mb} MB limit ({size_mb:.1f} MB)"
         )
 
 
-def _check_has_atom_records(pdb_path: Path) -> None:
-    with open(pdb_path) as f:
-        for line in f:
-            if line.startswith("ATOM  "):
-                return
-    raise PDBValidationError("PDB file contains no ATOM records")
+# How an ATOM record starts, per text format
+ATOM_RECORD_MARKERS = {"pdb": b"ATOM  ", "mmcif": b"ATOM "}
 
 
-def _parse_structure(pdb_path: Path) -> Structure:
-    parser = PDBParser(QUIET=True)
+def _check_has_atom_records(data: bytes, fmt: str = "pdb") -> None:
+    marker = ATOM_RECORD_MARKERS.get(fmt)
+    if marker is None or data.startswith(marker) or b"\n" + marker in data:
+        return
+    raise PDBValidationError(f"{FORMAT_LABELS[fmt]} file contains no ATOM records")
+
+
+def _parse_backbone(data: bytes, name: str, parser: str, fmt: str = "pdb") -> Backbone:
     try:
-        structure = parser.get_structure("input", str(pdb_path))
+        return load_backbone(data, name=name, fmt=fmt, parser=parser)
     except Exception as e:
-        raise PDBValidationError(f"Failed to parse PDB file: {e}") from e
-    return structure
+        raise PDBValidationError(
+            f"Failed to parse {FORMAT_LABELS[fmt]} file: {e}"
+        ) from e
+
+
+def _check_chain_ids(backbone: Backbone, fmt: str) -> None:
+    # mmCIF chain IDs can be longer than PDB's one character, but the
+    # subprocess path hands ProteinMPNN a PDB (Backbone.to_pdb)
+    long_ids = sorted(c for c in backbone.chains if len(c) != 1)
+    if long_ids:
+        raise PDBValidationError(
+            f"{FORMAT_LABELS[fmt]} chain ID(s) {long_ids} are longer than one "
+            "character, which ProteinMPNN does not support"
+        )
 
 
-def _check_chains_exist(structure: Structure, chains: list[str]) -> None:
-    available = {chain.get_id() for chain in structure[0]}
+def _check_chains_exist(backbone: Backbone, chains: list[str]) -> None:
+    available = set(backbone.chain_ids)
     missing = set(chains) - available
     if missing:
         raise PDBValidationError(
@@ -72,15 +136,14 @@ def _check_chains_exist(structure: Structure, chains: list[str]) -> None:
         )
 
 
-def _check_backbone(structure: Structure, chains: list[str]) -> None:
+def _check_backbone(backbone: Backbone, chains: list[str]) -> None:
     for chain_id in chains:
-        chain = structure[0][chain_id]
-        standard_residues = [r for r in chain if r.get_id()[0] == " "]
-        if not standard_residues:
+        chain = backbone.chains.get(chain_id)
+        if chain is None or chain.num_standard == 0:
             raise PDBValidationError(
                 f"Chain {chain_id} has no standard amino acid residues"
             )
-        ca_count = sum(1 for r in standard_residues if "CA" in r)
+        ca_count = chain.num_ca
         if ca_count < MIN_CA_ATOMS:
             raise PDBValidationError(
                 f"Chain {chain_id} has only {ca_count} CA atoms "
@@ -0,0 +1,91 @@
+"""Compare validate_pdb time and peak memory for the fast and BioPython parsers.
+
+Runs on every file in test_pdbs/ plus synthetic assemblies made by tiling
+1UBQ into many translated chains.
+
+    python scripts/bench_validation.py [--repeats 5] [--copies 10 60]
+"""
+
+import argparse
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import TEST_PDBS_DIR  # noqa: E402
+from app.validation.pdb import validate_pdb  # noqa: E402
+
+PARSERS = ("biopython", "fast")
+CHAIN_IDS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+
+
+def synthetic_assembly(copies: int) -> bytes:
+    """1UBQ's chain A repeated ``copies`` times, each shifted by 50 A in x."""
+    template = [
+        line
+        for line in (TEST_PDBS_DIR / "1UBQ.pdb").read_text().splitlines()
+        if line.startswith("ATOM  ")
+    ]
+    out = []
+    for i in range(copies):
+        chain_id = CHAIN_IDS[i % len(CHAIN_IDS)]
+        # Chain IDs repeat past 62 copies; offset residue numbers so they
+        # extend the chain instead of colliding
+        resseq_offset = (i // len(CHAIN_IDS)) * 100
+        for line in template:
+            x = float(line[30:38]) + 50.0 * i
+            resseq = int(line[22:26]) + resseq_offset
+            out.append(
+                f"{line[:21]}{chain_id}{resseq:4d}{line[26:30]}{x:8.3f}{line[38:]}"
+            )
+        out.append("TER")
+    out.append("END")
+    return ("\n".join(out) + "\n").encode()
+
+
+def measure(path: Path, parser: str, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        validate_pdb(path, ["A"], max_size_mb=float("inf"), parser=parser)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    validate_pdb(path, ["A"], max_size_mb=float("inf"), parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": statistics.median(times) * 1000, "peak_mb": peak / 2**20}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--copies", type=int, nargs="*", default=[10, 60, 200])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = sorted(TEST_PDBS_DIR.glob("*.pdb"))
+        for copies in args.copies:
+            path = Path(tmp) / f"synthetic_{copies}x1UBQ.pdb"
+            path.write_bytes(synthetic_assembly(copies))
+            inputs.append(path)
+
+        print(f"{'file':<26}{'MB':>7}" + "".join(
+            f"{p + ' ms':>14}{p + ' MB':>14}" for p in PARSERS
+        ) + f"{'speedup':>9}")
+        for path in inputs:
+            results = {p: measure(path, p, args.repeats) for p in PARSERS}
+            speedup = results["biopython"]["median_ms"] / results["fast"]["median_ms"]
+            print(f"{path.name:<26}{path.stat().st_size / 2**20:>7.2f}" + "".join(
+                f"{results[p]['median_ms']:>14.1f}{results[p]['peak_mb']:>14.1f}"
+                for p in PARSERS
+            ) + f"{speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""Per-stage and end-to-end design benchmarks, written out as JSON.
+
+Stages (upload, validate, featurize, constraints, inference, parse_fasta)
+are timed one call at a time. End-to-end runs POST /design through the app
+at each concurrency level and pool size. Inputs are test_pdbs/ plus synthetic
+multi-chain assemblies; every protein chain is designed. Runs offline on
+CPU. Without torch, the vendored ProteinMPNN or the weights, inference uses
+a stub engine, so the numbers measure service overhead only.
+
+    python scripts/benchmark.py [--repeats 5] [--concurrency 1 4] \\
+        [--pool-sizes 1 2] [--output bench.json] [--compare baseline.json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_validation import synthetic_assembly  # noqa: E402
+
+from app.config import (  # noqa: E402
+    MODEL_WEIGHTS_FILE,
+    PROJECT_ROOT,
+    PROTEINMPNN_REPO,
+    TEST_PDBS_DIR,
+)
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta  # noqa: E402
+from app.structure import Backbone  # noqa: E402
+
+SCHEMA_VERSION = 1
+# --compare flags results whose p50 grows by more than this fraction, and by
+# more than REGRESSION_MIN_MS so sub-millisecond stages don't flag on noise
+REGRESSION_THRESHOLD = 0.10
+REGRESSION_MIN_MS = 1.0
+
+
+class StubEngine:
+    """Returns the native sequence as every design, with no model behind it."""
+
+    def __init__(self, weights_path):
+        self.weights_path = weights_path
+
+    def design(
+        self, backbone, chains, num_sequences=3, sampling_temp=0.1,
+        progress=None, on_sample=None, include_log_probs=False, constraints=None,
+    ):
+        native = backbone.native_sequence(chains)
+        for i in range(num_sequences):
+            if on_sample is not None:
+                on_sample(DesignedSample(i, native, 0.0, 1.0))
+            if progress is not None:
+                progress(i + 1, num_sequences)
+        return ParsedFasta(native, [native] * num_sequences)
+
+
+def stub_engine_factory(weights_path):
+    return StubEngine(weights_path)
+
+
+def real_engine_factory(weights_path):
+    from app.proteinmpnn.engine import DesignEngine
+
+    return DesignEngine(weights_path)
+
+
+def model_available() -> bool:
+    if not MODEL_WEIGHTS_FILE.exists():
+        return False
+    if not (PROTEINMPNN_REPO / "protein_mpnn_utils.py").exists():
+        return False
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# --- Measurement helpers ---
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, round(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: list[float], sequences: int = 0, wall: float = 0.0) -> dict:
+    ordered = sorted(latencies)
+    summary = {
+        "n": len(ordered),
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p90_ms": percentile(ordered, 90) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+    }
+    if sequences and wall > 0:
+        summary["sequences_per_sec"] = sequences / wall
+    return summary
+
+
+def time_calls(call, repeats: int) -> tuple[list[float], int]:
+    """Latencies of ``repeats`` calls, plus tracemalloc peak of one more."""
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, peak
+
+
+class RssSampler:
+    """Peak combined RSS and PSS of this process and the pool's workers.
+
+    Workers share torch and the mmap'd weights, so summed RSS counts those
+    pages once per process; PSS splits them and shows the real footprint.
+    """
+
+    def __init__(self, pool=None, interval: float = 0.05):
+        self.pool = pool
+        self.interval = interval
+        self.peak = 0
+        self.peak_pss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        from app.metrics import pss_bytes, rss_bytes
+
+        while not self._stop.is_set():
+            pids = ["self"]
+            if self.pool is not None:
+                pids += list(self.pool.worker_pids().values())
+            self.peak = max(self.peak, sum(rss_bytes(p) or 0 for p in pids))
+            self.peak_pss = max(self.peak_pss, sum(pss_bytes(p) or 0 for p in pids))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# --- Inputs ---
+
+def load_inputs(copies: list[int], tmp: Path) -> list[tuple[Path, Backbone]]:
+    from app.validation import validate_pdb
+
+    paths = sorted(TEST_PDBS_DIR.glob("*.pdb"))
+    for n in copies:
+        path = tmp / f"synthetic_{n}x1UBQ.pdb"
+        path.write_bytes(synthetic_assembly(n))
+        paths.append(path)
+    inputs = []
+    for path in paths:
+        backbone = validate_pdb(path, ["A"], max_size_mb=float("inf"))
+        inputs.append((path, backbone))
+    return inputs
+
+
+def chains_of(backbone: Backbone) -> list[str]:
+    return list(backbone.chains)
+
+
+def constraints_for(backbone: Backbone):
+    """Every 10th residue fixed, and chains of equal length tied (the
+    synthetic assemblies are homo-oligomers)."""
+    from app.schemas import DesignConstraints
+
+    by_length: dict[int, list[str]] = {}
+    for chain_id, chain in backbone.chains.items():
+        by_length.setdefault(len(chain.sequence), []).append(chain_id)
+    return DesignConstraints(
+        fixed_positions={
+            c: chain.residue_numbers[::10].tolist() for c, chain in backbone.chains.items()
+        },
+        tied_chains=[group for group in by_length.values() if len(group) > 1],
+    )
+
+
+# --- Suites ---
+
+def bench_stages(inputs, engine, num_sequences: int, repeats: int) -> list[dict]:
+    from fastapi import UploadFile
+
+    from app.dependencies import save_upload
+    from app.proteinmpnn.constraints import compile_constraints
+    from app.proteinmpnn.parser import parse_fasta
+    from app.validation import validate_pdb
+
+    results = []
+
+    def record(stage, path, backbone, latencies, peak, **extra):
+        results.append({
+            "suite": "stage",
+            "stage": stage,
+            "structure": path.name,
+            "residues": backbone.num_residues(chains_of(backbone)),
+            **summarize(latencies),
+            "peak_mem_bytes": peak,
+            **extra,
+        })
+
+    for path, backbone in inputs:
+        chains = chains_of(backbone)
+        data = path.read_bytes()
+
+        def upload():
+            saved = asyncio.run(save_upload(
+                UploadFile(io.BytesIO(data), filename=path.name),
+                max_size_mb=None,
+                require_atom_records=True,
+            ))
+            saved.close()
+
+        record("upload", path, backbone, *time_calls(upload, repeats))
+        record("validate", path, backbone, *time_calls(
+            lambda: validate_pdb(path, chains, max_size_mb=float("inf")), repeats
+        ))
+        record("featurize", path, backbone, *time_calls(backbone.to_mpnn_dict, repeats))
+        constraints = constraints_for(backbone)
+        record("constraints", path, backbone, *time_calls(
+            lambda: compile_constraints(backbone, chains, constraints), repeats
+        ))
+
+        result = engine.design(backbone, chains, num_sequences)
+        latencies = []
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for _ in range(repeats):
+            start = time.perf_counter()
+            engine.design(backbone, chains, num_sequences)
+            latencies.append(time.perf_counter() - start)
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        record(
+            "inference", path, backbone, latencies, (rss_after - rss_before) * 1024,
+            sequences_per_sec=num_sequences * repeats / sum(latencies),
+        )
+
+        with tempfile.NamedTemporaryFile("w", suffix=".fa", delete=False) as f:
+            f.write(f">{path.stem}, score=1.0\n{result.native_sequence}\n")
+            for i, seq in enumerate(result.designed_sequences):
+                f.write(f">T=0.1, sample={i + 1}, score=1.0, seq_recovery=0.5\n{seq}\n")
+        fasta = Path(f.name)
+        record("parse_fasta", path, backbone, *time_calls(
+            lambda: parse_fasta(fasta), repeats
+        ))
+        fasta.unlink()
+    return results
+
+
+def bench_end_to_end(
+    inputs, engine_factory, pool_sizes: list[int], concurrency: list[int],
+    num_sequences: int, repeats: int,
+) -> list[dict]:
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+    from app.executors import ConcurrencyLimiter
+    from app.proteinmpnn.pool import WorkerPool
+
+    client = TestClient(main.app)
+    results = []
+    for pool_size in pool_sizes:
+        pool = WorkerPool(size=pool_size, engine_factory=engine_factory)
+        pool.start()
+        while pool.warm_count < pool_size:
+            time.sleep(0.1)
+        main.app.state.worker_pool = pool
+        try:
+            for level in concurrency:
+                # Admit every benchmark request; 429s would skew the latencies
+                main.design_limiter = ConcurrencyLimiter(limit=level)
+                for path, backbone in inputs:
+                    results.append(_run_level(
+                        client, pool, path, backbone, level, num_sequences, repeats
+                    ) | {"pool_size": pool_size})
+        finally:
+            main.app.state.worker_pool = None
+            pool.shutdown()
+    return results
+
+
+def _run_level(client, pool, path, backbone, level, num_sequences, repeats) -> dict:
+    data = path.read_bytes()
+    form = {
+        "chains": json.dumps(chains_of(backbone)),
+        "num_sequences": str(num_sequences),
+        "use_cache": "false",
+    }
+
+    def one(_):
+        start = time.perf_counter()
+        resp = client.post(
+            "/design",
+            files={"pdb_file": (path.name, data, "chemical/x-pdb")},
+            data=form,
+        )
+        resp.raise_for_status()
+        return time.perf_counter() - start
+
+    requests = repeats * level
+    with RssSampler(pool) as rss, ThreadPoolExecutor(max_workers=level) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(one, range(requests)))
+        wall = time.perf_counter() - start
+    return {
+        "suite": "end_to_end",
+        "stage": "design",
+        "structure": path.name,
+        "residues": backbone.num_residues(chains_of(backbone)),
+        "concurrency": level,
+        **summarize(latencies, requests * num_sequences, wall),
+        "peak_rss_bytes": rss.peak,
+        "peak_pss_bytes": rss.peak_pss,
+    }
+
+
+# --- Output ---
+
+def result_key(r: dict) -> tuple:
+    return (
+        r["suite"], r["stage"], r["structure"],
+        r.get("concurrency"), r.get("pool_size"),
+    )
+
+
+def compare(baseline: dict, current: dict) -> int:
+    """Print p50 changes against ``baseline``; return the number of regressions."""
+    old = {result_key(r): r for r in baseline["results"]}
+    regressions = 0
+    print(f"\n{'suite/stage':<22}{'structure':<26}{'c':>3}{'pool':>5}"
+          f"{'old p50':>10}{'new p50':>10}{'change':>9}")
+    for r in current["results"]:
+        before = old.get(result_key(r))
+        if before is None:
+            continue
+        change = r["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        flag = ""
+        slower_ms = r["p50_ms"] - before["p50_ms"]
+        if change > REGRESSION_THRESHOLD and slower_ms > REGRESSION_MIN_MS:
+            regressions += 1
+            flag = "  <- slower"
+        print(f"{r['suite'] + '/' + r['stage']:<22}{r['structure']:<26}"
+              f"{r.get('concurrency') or '':>3}{r.get('pool_size') or '':>5}"
+              f"{before['p50_ms']:>10.1f}{r['p50_ms']:>10.1f}{change:>+9.1%}{flag}")
+    if baseline.get("engine") != current.get("engine"):
+        print(f"\nNote: engines differ ({baseline.get('engine')} vs {current.get('engine')})")
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: list[dict]) -> None:
+    print(f"{'suite/stage':<22}{'structure':<26}{'res':>6}{'c':>3}{'pool':>5}"
+          f"{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'seq/s':>11}{'peak MB':>9}")
+    for r in results:
+        peak = r.get("peak_rss_bytes", r.get("peak_mem_bytes", 0)) / 2**20
+        seqs = r.get("sequences_per_sec")
+        print(f"{r['suite'] + '/' + r['stage']:<22}{r['structure']:<26}{r['residues']:>6}"
+              f"{r.get('concurrency') or '':>3}{r.get('pool_size') or '':>5}"
+              f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{'' if seqs is None else f'{seqs:.1f}':>11}{peak:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--num-sequences", type=int, default=5)
+    parser.add_argument("--copies", type=int, nargs="*", default=[10, 40],
+                        help="synthetic assemblies of N 1UBQ chains")
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4])
+    parser.add_argument("--pool-sizes", type=int, nargs="*", default=[1, 2])
+    parser.add_argument("--engine", choices=("auto", "model", "stub"), default="auto")
+    parser.add_argument("--skip-end-to-end", action="store_true")
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"))
+    parser.add_argument("--compare", type=Path, help="baseline results JSON")
+    args = parser.parse_args()
+
+    engine_name = args.engine
+    if engine_name == "auto":
+        engine_name = "model" if model_available() else "stub"
+    if engine_name == "stub":
+        print("Using the stub engine: inference numbers exclude the model\n")
+    factory = real_engine_factory if engine_name == "model" else stub_engine_factory
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = load_inputs(args.copies, Path(tmp))
+        results = bench_stages(
+            inputs, factory(MODEL_WEIGHTS_FILE), args.num_sequences, args.repeats
+        )
+        if not args.skip_end_to_end:
+            results += bench_end_to_end(
+                inputs, factory, args.pool_sizes, args.concurrency,
+                args.num_sequences, args.repeats,
+            )
+
+    report = {
+        "schema_version": SCHEMA_VERSION,
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "engine": engine_name,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "num_sequences": args.num_sequences,
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n")
+    print_table(results)
+    print(f"\nWrote {args.output}")
+
+    if args.compare is not None:
+        regressions = compare(json.loads(args.compare.read_text()), report)
+        if regressions:
+            sys.exit(f"{regressions} result(s) more than "
+                     f"{REGRESSION_THRESHOLD:.0%} slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare CPU inference profiles against the fp32 baseline.
+
+For each profile, designs every structure in test_pdbs/ plus a synthetic
+380-residue assembly (the size range the tuning targets). Reports mean
+sequence recovery and score next to the fp32 run, and throughput per
+thread. Exits non-zero if a profile loses more accuracy than the
+tolerances allow. Needs torch, the vendored ProteinMPNN and the weights.
+
+    python scripts/check_precision.py [--profiles bf16 int8 int8+compile] \\
+        [--threads 1] [--num-sequences 8]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_validation import synthetic_assembly  # noqa: E402
+
+from app.config import MODEL_WEIGHTS_FILE, TEST_PDBS_DIR  # noqa: E402
+from app.proteinmpnn.engine import DesignEngine  # noqa: E402
+from app.proteinmpnn.tuning import CpuProfile  # noqa: E402
+from app.validation import validate_pdb  # noqa: E402
+
+# Largest acceptable loss against fp32, averaged over all structures
+MAX_RECOVERY_DROP = 0.02
+MAX_SCORE_INCREASE = 0.05
+
+
+def parse_profile(spec: str, threads: int) -> CpuProfile:
+    """``"bf16"``, ``"int8+compile"``, ``"fp32+compile"`` and so on."""
+    precision, _, compile_mode = spec.partition("+")
+    return CpuProfile(
+        threads=threads, precision=precision, compile=compile_mode or "none"
+    )
+
+
+def run_profile(profile: CpuProfile, inputs, num_sequences: int) -> dict:
+    engine = DesignEngine(MODEL_WEIGHTS_FILE, profile=profile)
+    recoveries, scores = [], []
+    residues, seconds = 0, 0.0
+    for backbone in inputs:
+        chains = list(backbone.chains)
+        engine.design(backbone, chains, 1)  # warm-up (and compilation)
+        start = time.perf_counter()
+        result = engine.design(backbone, chains, num_sequences)
+        seconds += time.perf_counter() - start
+        residues += backbone.num_residues(chains) * num_sequences
+        recoveries += result.seq_recoveries
+        scores += result.scores
+    return {
+        "recovery": statistics.mean(recoveries),
+        "score": statistics.mean(scores),
+        "residues_per_sec_per_thread": residues / seconds / max(1, profile.threads),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="*", default=["bf16", "int8", "fp32+compile"])
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--num-sequences", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = sorted(TEST_PDBS_DIR.glob("*.pdb"))
+        synthetic = Path(tmp) / "synthetic_5x1UBQ.pdb"
+        synthetic.write_bytes(synthetic_assembly(5))
+        paths.append(synthetic)
+        inputs = [validate_pdb(p, ["A"], max_size_mb=float("inf")) for p in paths]
+
+    baseline = run_profile(CpuProfile(threads=args.threads), inputs, args.num_sequences)
+    print(f"{'profile':<16}{'recovery':>10}{'score':>9}{'res/s/thread':>14}{'speedup':>9}")
+    print(f"{'fp32':<16}{baseline['recovery']:>10.4f}{baseline['score']:>9.4f}"
+          f"{baseline['residues_per_sec_per_thread']:>14.1f}{1.0:>8.2f}x")
+
+    failures = []
+    for spec in args.profiles:
+        result = run_profile(
+            parse_profile(spec, args.threads), inputs, args.num_sequences
+        )
+        speedup = (
+            result["residues_per_sec_per_thread"]
+            / baseline["residues_per_sec_per_thread"]
+        )
+        print(f"{spec:<16}{result['recovery']:>10.4f}{result['score']:>9.4f}"
+              f"{result['residues_per_sec_per_thread']:>14.1f}{speedup:>8.2f}x")
+        if baseline["recovery"] - result["recovery"] > MAX_RECOVERY_DROP:
+            failures.append(f"{spec}: recovery dropped more than {MAX_RECOVERY_DROP}")
+        if result["score"] - baseline["score"] > MAX_SCORE_INCREASE:
+            failures.append(f"{spec}: score rose more than {MAX_SCORE_INCREASE}")
+
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
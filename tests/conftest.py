@@ -0,0 +1,104 @@
+"""Fixtures shared across test modules: the result cache and a stub worker pool."""
+
+import os
+import time
+
+import pytest
+
+from app.main import design_cache
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta
+from app.proteinmpnn.pool import WorkerPool
+
+
+class FakeEngine:
+    """Stands in for DesignEngine so tests don't need torch or weights."""
+
+    def __init__(self, weights_path):
+        self.weights_path = weights_path
+
+    def design(
+        self, backbone, chains, num_sequences=3, sampling_temp=0.1, progress=None,
+        on_sample=None, include_log_probs=False, constraints=None,
+    ):
+        if chains == ["boom"]:
+            raise ValueError("bad chain")
+        if chains == ["crash"]:
+            time.sleep(0.2)  # let a second job queue up behind this one
+            os._exit(1)
+        if chains == ["slow"]:
+            # One sampling pass after another until cancelled
+            for _ in range(600):
+                progress(1, num_sequences)
+                time.sleep(0.1)
+        if progress is not None:
+            for i in range(num_sequences):
+                progress(i + 1, num_sequences)
+        if on_sample is not None:
+            for i in range(num_sequences):
+                on_sample(DesignedSample(i, "A" * (i + 1), score=1.0, seq_recovery=0.5))
+        return ParsedFasta(
+            native_sequence=backbone.name,
+            designed_sequences=["A" * (i + 1) for i in range(num_sequences)],
+        )
+
+    def design_batch(self, items, num_sequences=3, sampling_temp=0.1, progress=None):
+        if any(chains == ["boom"] for _, chains in items):
+            raise ValueError("bad chain")
+        return [
+            self.design(backbone, chains, num_sequences, sampling_temp)
+            for backbone, chains in items
+        ]
+
+
+def fake_engine_factory(weights_path):
+    return FakeEngine(weights_path)
+
+
+def _wait_warm(pool: WorkerPool, count: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while pool.warm_count < count:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"only {pool.warm_count} workers warmed up")
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def empty_cache():
+    """A result cache with nothing in it, cleared again afterwards."""
+    design_cache.clear()
+    yield
+    design_cache.clear()
+
+
+@pytest.fixture
+def wait_warm():
+    """``wait_warm(pool, count)``: block until ``count`` workers are warm."""
+    return _wait_warm
+
+
+@pytest.fixture
+def start_pool():
+    """``start_pool(size, **kwargs)``: a started pool of stub engines, warm,
+    shut down after the test."""
+    pools: list[WorkerPool] = []
+
+    def start(size: int = 2, **kwargs) -> WorkerPool:
+        pool = WorkerPool(size=size, engine_factory=fake_engine_factory, **kwargs)
+        pools.append(pool)
+        pool.start()
+        _wait_warm(pool, size)
+        return pool
+
+    yield start
+    for pool in pools:
+        pool.shutdown()
+
+
+@pytest.fixture(scope="module")
+def fake_pool():
+    """Two warm stub workers, shared by a module's tests."""
+    pool = WorkerPool(size=2, engine_factory=fake_engine_factory)
+    pool.start()
+    _wait_warm(pool, 2)
+    yield pool
+    pool.shutdown()
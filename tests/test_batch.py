@@ -0,0 +1,170 @@
+"""Tests for POST /design/batch and batch grouping helpers."""
+
+import io
+import json
+import tarfile
+import zipfile
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.dependencies import SpooledUpload, extract_archive, parse_batch_chains
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.proteinmpnn.wrapper import group_batch_items
+
+client = TestClient(app)
+
+UBQ_BYTES = (TEST_PDBS_DIR / "1UBQ.pdb").read_bytes()
+LZM_BYTES = (TEST_PDBS_DIR / "2LZM.pdb").read_bytes()
+
+
+def _fake_design_batch(items, num_sequences=3, **kwargs):
+    return [
+        ParsedFasta(f"NATIVE{item.num_residues}", ["AAAA"] * num_sequences)
+        for item in items
+    ]
+
+
+def _zip_bytes(members: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _tar_bytes(members: dict[str, bytes]) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+class TestBatchEndpoint:
+    @patch("app.main.design_batch", side_effect=_fake_design_batch)
+    def test_multipart_files(self, mock_batch):
+        resp = client.post(
+            "/design/batch",
+            files=[
+                ("pdb_files", ("ubq.pdb", UBQ_BYTES, "chemical/x-pdb")),
+                ("pdb_files", ("lzm.pdb", LZM_BYTES, "chemical/x-pdb")),
+            ],
+            data={"chains": json.dumps(["A"]), "num_sequences": "2"},
+        )
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "success"
+        assert data["num_succeeded"] == 2
+        assert [r["filename"] for r in data["results"]] == ["ubq.pdb", "lzm.pdb"]
+        assert data["results"][0]["result"]["native_sequence"] == "NATIVE76"
+        assert data["results"][1]["result"]["metadata"]["num_residues"] == 164
+        assert len(data["results"][1]["result"]["sequences"]) == 2
+        mock_batch.assert_called_once()
+
+    @pytest.mark.parametrize("make_archive", [_zip_bytes, _tar_bytes])
+    @patch("app.main.design_batch", side_effect=_fake_design_batch)
+    def test_archive_with_per_file_chains(self, mock_batch, make_archive):
+        archive = make_archive(
+            {"set/ubq.pdb": UBQ_BYTES, "set/lzm.pdb": LZM_BYTES, "README": b"x"}
+        )
+        resp = client.post(
+            "/design/batch",
+            files={"archive": ("set.bin", archive, "application/octet-stream")},
+            data={"chains": json.dumps({"ubq.pdb": ["A"], "lzm.pdb": ["A"]})},
+        )
+        assert resp.status_code == 200
+        assert resp.json()["num_succeeded"] == 2
+
+    @patch("app.main.design_batch", side_effect=_fake_design_batch)
+    def test_invalid_item_reported_others_designed(self, mock_batch):
+        resp = client.post(
+            "/design/batch",
+            files=[
+                ("pdb_files", ("ubq.pdb", UBQ_BYTES, "chemical/x-pdb")),
+                ("pdb_files", ("empty.pdb", b"HEADER\n", "chemical/x-pdb")),
+            ],
+            data={"chains": json.dumps(["A"])},
+        )
+        data = resp.json()
+        assert data["status"] == "partial"
+        assert data["results"][0]["status"] == "success"
+        assert data["results"][1]["status"] == "error"
+        assert "no ATOM records" in data["results"][1]["detail"]
+        assert len(mock_batch.call_args.args[0]) == 1
+
+    @patch(
+        "app.main.design_batch",
+        side_effect=lambda items, **kw: [RuntimeError("boom")] * len(items),
+    )
+    def test_design_failure_per_item(self, mock_batch):
+        resp = client.post(
+            "/design/batch",
+            files=[("pdb_files", ("ubq.pdb", UBQ_BYTES, "chemical/x-pdb"))],
+            data={"chains": json.dumps(["A"])},
+        )
+        result = resp.json()["results"][0]
+        assert result["status"] == "error"
+        assert result["detail"] == "Design failed"
+
+    def test_no_files(self):
+        resp = client.post("/design/batch", data={"chains": json.dumps(["A"])})
+        assert resp.status_code == 400
+
+    def test_missing_chain_mapping(self):
+        resp = client.post(
+            "/design/batch",
+            files=[("pdb_files", ("ubq.pdb", UBQ_BYTES, "chemical/x-pdb"))],
+            data={"chains": json.dumps({"other.pdb": ["A"]})},
+        )
+        assert resp.status_code == 400
+        assert "ubq.pdb" in resp.json()["detail"]
+
+
+def test_group_batch_items_sorted_and_bounded():
+    groups = group_batch_items([100, 500, 120, 90, 480], max_residues=1000)
+    assert groups == [[3, 0, 2], [4, 1]]
+    assert sorted(i for g in groups for i in g) == [0, 1, 2, 3, 4]
+
+
+def test_group_batch_items_oversized_alone():
+    assert group_batch_items([5000, 10], max_residues=1000) == [[1], [0]]
+
+
+def test_extract_archive_ignores_member_paths():
+    archive = SpooledUpload("a.zip", data=_zip_bytes({"../../evil.pdb": UBQ_BYTES}))
+    entries = extract_archive(archive)
+    assert [name for name, _ in entries] == ["evil.pdb"]
+    assert entries[0][1].path is None
+    assert entries[0][1].read_bytes() == UBQ_BYTES
+
+
+def test_extract_archive_spills_large_members(tmp_path):
+    archive = tmp_path / "a.tar"
+    with tarfile.open(archive, "w") as tf:
+        tf.add(TEST_PDBS_DIR / "1UBQ.pdb", arcname="dir/1ubq.pdb")
+    entries = extract_archive(SpooledUpload("a.tar", path=archive), spill_mb=0.01)
+    (name, upload), = entries
+    assert name == "1ubq.pdb"
+    assert upload.path.suffix == ".pdb"
+    assert upload.read_bytes() == UBQ_BYTES
+    upload.close()
+    assert not upload.path.exists()
+
+
+def test_extract_archive_limit():
+    archive = SpooledUpload("a.zip", data=_zip_bytes({f"{i}.pdb": b"ATOM" for i in range(3)}))
+    with pytest.raises(ValueError, match="more than 2"):
+        extract_archive(archive, max_items=2)
+
+
+def test_parse_batch_chains_shared():
+    assert parse_batch_chains('["A", "B"]', ["x", "y"]) == {
+        "x": ["A", "B"],
+        "y": ["A", "B"],
+    }
@@ -0,0 +1,109 @@
+"""Tests for the offline bulk design CLI."""
+
+import gzip
+import io
+import json
+import shutil
+
+import pytest
+
+from app.bulk import Progress, Target, find_targets, run
+from app.config import TEST_PDBS_DIR
+from app.proteinmpnn.parser import ParsedFasta, parse_fasta, write_fasta
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    src = tmp_path / "in"
+    (src / "nested").mkdir(parents=True)
+    shutil.copy(TEST_PDBS_DIR / "1UBQ.pdb", src)
+    shutil.copy(TEST_PDBS_DIR / "6MRR.pdb", src / "nested")
+    (src / "broken.pdb").write_text("not a structure\n")
+    (src / "notes.txt").write_text("ignored\n")
+    return src
+
+
+def _summary(out_dir):
+    return [json.loads(line) for line in (out_dir / "summary.jsonl").read_text().splitlines()]
+
+
+def _quiet(total):
+    return Progress(total, stream=io.StringIO())
+
+
+def test_find_targets(inputs):
+    targets = find_targets([str(inputs)])
+    assert [t.name for t in targets] == ["1UBQ", "broken", "6MRR"]
+    assert [t.name for t in find_targets([str(inputs / "*.pdb")])] == ["1UBQ", "broken"]
+
+
+def test_find_targets_rejects_duplicate_names(inputs):
+    shutil.copy(TEST_PDBS_DIR / "1UBQ.pdb", inputs / "nested")
+    with pytest.raises(ValueError, match="1UBQ"):
+        find_targets([str(inputs)])
+
+
+def test_run_writes_fasta_and_summary(inputs, tmp_path, fake_pool):
+    out = tmp_path / "out"
+    targets = find_targets([str(inputs)])
+    progress = run(targets, out, fake_pool, num_sequences=3, progress=_quiet(len(targets)))
+    assert (progress.done, progress.failed, progress.skipped) == (3, 1, 0)
+
+    fasta = parse_fasta(out / "1UBQ.fa")
+    assert fasta.native_sequence == "1UBQ"  # the fake engine echoes the name
+    assert fasta.designed_sequences == ["A", "AA", "AAA"]
+    rows = {row["target"]: row for row in _summary(out)}
+    assert rows["1UBQ"]["status"] == "ok"
+    assert rows["6MRR"]["num_sequences"] == 3
+    assert rows["broken"]["status"] == "failed"
+    assert not (out / "broken.fa").exists()
+
+
+def test_run_resumes(inputs, tmp_path, fake_pool):
+    out = tmp_path / "out"
+    targets = find_targets([str(inputs)])
+    run(targets, out, fake_pool, num_sequences=1, progress=_quiet(len(targets)))
+    # Interrupted between writing a FASTA and its summary line
+    lines = (out / "summary.jsonl").read_text().splitlines()
+    (out / "summary.jsonl").write_text(
+        "".join(line + "\n" for line in lines if '"6MRR"' not in line)
+    )
+
+    progress = run(targets, out, fake_pool, progress=_quiet(len(targets)))
+    assert (progress.skipped, progress.failed) == (2, 1)  # broken.pdb is retried
+    rows = _summary(out)
+    # One row per target; the rebuilt one takes its chains from the FASTA
+    assert sorted(row["target"] for row in rows) == ["1UBQ", "6MRR", "broken"]
+    assert {row["target"]: row["chains"] for row in rows if row["status"] == "ok"} == {
+        "1UBQ": ["A"], "6MRR": ["A"],
+    }
+
+
+def test_run_reads_gzipped_and_survives_unreadable(tmp_path, fake_pool):
+    src = tmp_path / "in"
+    src.mkdir()
+    (src / "1UBQ.pdb.gz").write_bytes(gzip.compress((TEST_PDBS_DIR / "1UBQ.pdb").read_bytes()))
+    (src / "bad.cif.gz").write_bytes(b"not gzip")
+    out = tmp_path / "out"
+    # Vanishes before it is read: an OSError, not a validation failure
+    targets = [*find_targets([str(src)]), Target("gone", src / "gone.pdb.gz")]
+    progress = run(targets, out, fake_pool, num_sequences=1, progress=_quiet(len(targets)))
+    assert (progress.done, progress.failed) == (3, 2)
+    rows = {row["target"]: row for row in _summary(out)}
+    assert rows["1UBQ"]["status"] == "ok"
+    assert parse_fasta(out / "1UBQ.fa").native_sequence == "1UBQ"
+    assert rows["bad"]["error"].startswith("Corrupt gzip file")
+    assert rows["gone"]["error"].startswith("FileNotFoundError")
+
+
+def test_write_fasta_round_trips(tmp_path):
+    result = ParsedFasta(
+        native_sequence="MKV/GG",
+        designed_sequences=["MKA/GG", "MRV/GA"],
+        scores=[0.91, 1.02],
+        seq_recoveries=[0.5, 0.25],
+        global_scores=[1.1, 1.2],
+    )
+    path = tmp_path / "x.fa"
+    write_fasta(path, "x", result, ["B", "A"], sampling_temp=0.1)
+    assert parse_fasta(path) == result
@@ -0,0 +1,111 @@
+"""Tests for the content-addressed design result and feature caches."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.cache import DesignCache, FeatureCache, design_cache_key, structure_digest
+from app.config import TEST_PDBS_DIR
+from app.structure import load_backbone
+
+UBQ_BYTES = (TEST_PDBS_DIR / "1UBQ.pdb").read_bytes()
+
+ATOM = b"ATOM      1  N   MET A   1      27.340  24.430   2.614  1.00  9.67           N\n"
+
+
+def test_digest_ignores_serial_bfactor_and_headers():
+    renumbered = ATOM.replace(b"    1  N", b"   99  N").replace(b"9.67", b"0.00")
+    assert structure_digest(ATOM) == structure_digest(b"REMARK x\n" + renumbered)
+
+
+def test_digest_sensitive_to_coordinates():
+    moved = ATOM.replace(b"27.340", b"27.341")
+    assert structure_digest(ATOM) != structure_digest(moved)
+
+
+def test_key_depends_on_params():
+    base = design_cache_key(UBQ_BYTES, ["A"], 3, 0.1)
+    assert base == design_cache_key(UBQ_BYTES, ["A"], 3, 0.1)
+    assert base != design_cache_key(UBQ_BYTES, ["A"], 4, 0.1)
+    assert base != design_cache_key(UBQ_BYTES, ["A"], 3, 0.2)
+    assert base != design_cache_key(UBQ_BYTES, ["B"], 3, 0.1)
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("INFERENCE_PRECISION", "bf16"),
+    ("INFERENCE_COMPILE", "compile"),
+    ("SAMPLE_BATCH_MEMORY_MB", 1),
+    ("MAX_SAMPLE_BATCH", 1),
+])
+def test_key_depends_on_engine_settings(setting, value):
+    base = design_cache_key(UBQ_BYTES, ["A"], 3, 0.1)
+    with patch(f"app.cache.{setting}", value):
+        assert design_cache_key(UBQ_BYTES, ["A"], 3, 0.1) != base
+
+
+def test_memory_lru_eviction():
+    cache = DesignCache(max_entries=2, disk_dir=None)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"  # a is now most recent
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    stats = cache.stats()
+    assert stats["memory_hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    DesignCache(disk_dir=tmp_path).put("k", "value")
+    cache = DesignCache(disk_dir=tmp_path)
+    assert cache.get("k") == "value"
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("k") == "value"
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_disk_entry_evicted_during_read_is_a_miss(tmp_path):
+    DesignCache(disk_dir=tmp_path).put("k", "value")
+    cache = DesignCache(disk_dir=tmp_path)
+    with patch("app.cache.os.utime", side_effect=FileNotFoundError):
+        assert cache.get("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_evicts_by_size(tmp_path):
+    cache = DesignCache(disk_dir=tmp_path, disk_max_mb=2500 / (1024 * 1024))
+    cache.put("old", "x" * 1000)
+    os.utime(tmp_path / "old.json", (1, 1))
+    cache.put("mid", "x" * 1000)
+    cache.put("new", "x" * 1000)
+    assert sorted(p.stem for p in tmp_path.glob("*.json")) == ["mid", "new"]
+
+
+def test_feature_cache_evicts_by_bytes():
+    cache = FeatureCache(max_mb=1)
+    cache.put("a", "A", 400_000)
+    cache.put("b", "B", 400_000)
+    assert cache.get("a") == "A"  # a is now most recent
+    cache.put("c", "C", 400_000)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+    assert stats["bytes"] == 800_000
+
+
+def test_feature_cache_skips_oversized():
+    cache = FeatureCache(max_mb=1)
+    cache.put("big", "X", 2 * 1024 * 1024)
+    assert cache.get("big") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_backbone_digest_tracks_coordinates():
+    backbone = load_backbone(UBQ_BYTES, name="a")
+    assert backbone.digest() == load_backbone(UBQ_BYTES, name="b").digest()
+    backbone.chains["A"].coords[0, 0, 0] += 0.1
+    assert backbone.digest() != load_backbone(UBQ_BYTES).digest()
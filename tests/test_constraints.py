@@ -0,0 +1,127 @@
+"""Tests for fixed/tied/bias constraints and their compilation."""
+
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.main import app
+from app.proteinmpnn.constraints import ConstraintError, compile_constraints
+from app.proteinmpnn.parser import ALPHABET, ParsedFasta
+from app.proteinmpnn.wrapper import _constraint_args
+from app.schemas import DesignConstraints
+from app.structure import load_backbone
+
+client = TestClient(app)
+
+HBA_PATH = TEST_PDBS_DIR / "1A3N.pdb"
+
+
+@pytest.fixture(scope="module")
+def hemoglobin():
+    return load_backbone(HBA_PATH.read_bytes(), name="1A3N")
+
+
+def _compile(backbone, chains, **constraints):
+    return compile_constraints(backbone, chains, DesignConstraints(**constraints))
+
+
+def test_layout_follows_featurization(hemoglobin):
+    compiled = _compile(hemoglobin, ["C", "A"])
+    assert compiled.chain_order == ["A", "C", "B", "D"]
+    assert compiled.offsets["C"] == len(hemoglobin.chains["A"].sequence)
+    assert compiled.fixed.shape == (sum(len(c.sequence) for c in hemoglobin.chains.values()),)
+    assert not compiled.fixed.any() and not compiled.tied
+
+
+def test_fixed_positions_use_residue_numbers(hemoglobin):
+    first = int(hemoglobin.chains["C"].residue_numbers[0])
+    compiled = _compile(hemoglobin, ["A", "C"], fixed_positions={"C": [first, first + 2]})
+    offset = compiled.offsets["C"]
+    assert np.flatnonzero(compiled.fixed).tolist() == [offset, offset + 2]
+
+
+def test_tied_chains_pair_every_position(hemoglobin):
+    compiled = _compile(hemoglobin, ["A", "C"], tied_chains=[["A", "C"]])
+    length = len(hemoglobin.chains["A"].sequence)
+    assert len(compiled.tied) == length
+    assert compiled.tied[5].tolist() == [5, length + 5]
+
+
+def test_bias_and_omit(hemoglobin):
+    compiled = _compile(hemoglobin, ["A"], bias_aa={"A": -1.5}, omit_aa="CW")
+    assert compiled.bias[ALPHABET.index("A")] == -1.5
+    assert [aa for aa, o in zip(ALPHABET, compiled.omit) if o] == ["C", "W"]
+
+
+@pytest.mark.parametrize("constraints, message", [
+    ({"fixed_positions": {"D": [2]}}, "not designed"),
+    ({"fixed_positions": {"A": [9999]}}, "not found"),
+    ({"tied_chains": [["A", "B"]]}, "differ in length"),
+    ({"tied_positions": [{"A": [1, 2], "C": [1]}]}, "equally long"),
+    ({"tied_chains": [["A", "C"]], "tied_positions": [{"A": [1], "C": [2]}]}, "more than one"),
+    ({"tied_chains": [["A", "C"]], "fixed_positions": {"A": [1]}}, "all fixed"),
+])
+def test_invalid_constraints(hemoglobin, constraints, message):
+    with pytest.raises(ConstraintError, match=message):
+        _compile(hemoglobin, ["A", "B", "C"], **constraints)
+
+
+def test_subprocess_jsonl_inputs(hemoglobin, tmp_path):
+    first = int(hemoglobin.chains["A"].residue_numbers[0])
+    compiled = _compile(
+        hemoglobin, ["A", "C"],
+        fixed_positions={"A": [first + 3]},
+        tied_positions=[{"A": [first + 9], "C": [first + 9]}],
+        bias_aa={"G": 0.5},
+        omit_aa="C",
+    )
+    args = _constraint_args(compiled, "1A3N", ["A", "C"], tmp_path)
+    assert args[:2] == ["--omit_AAs", "CX"]
+    fixed = json.loads((tmp_path / "fixed_positions.jsonl").read_text())
+    assert fixed == {"1A3N": {"A": [4], "C": []}}
+    tied = json.loads((tmp_path / "tied_positions.jsonl").read_text())
+    assert tied == {"1A3N": [{"A": [10], "C": [10]}]}
+    assert json.loads((tmp_path / "bias_AA.jsonl").read_text()) == {"G": 0.5}
+
+
+@patch("app.main.design_sequences")
+def test_design_endpoint_compiles_constraints(mock_design, empty_cache):
+    mock_design.return_value = ParsedFasta("N", ["A"])
+    with open(HBA_PATH, "rb") as f:
+        resp = client.post(
+            "/design",
+            files={"pdb_file": ("1A3N.pdb", f, "chemical/x-pdb")},
+            data={
+                "chains": json.dumps(["A", "C"]),
+                "num_sequences": "1",
+                "constraints": json.dumps({"tied_chains": [["A", "C"]]}),
+            },
+        )
+    assert resp.status_code == 200
+    compiled = mock_design.call_args.kwargs["constraints"]
+    assert len(compiled.tied) == 141
+
+
+@pytest.mark.parametrize("constraints, message", [
+    ({"omit_aa": "B"}, "Unknown amino acid"),
+    ({"tied_chains": [["A"]]}, "at least two"),
+    ({"fixed_positions": {"D": [2]}}, "not designed"),
+    ("{not json", "Invalid constraints JSON"),
+])
+def test_design_endpoint_rejects_bad_constraints(constraints, message):
+    with open(HBA_PATH, "rb") as f:
+        resp = client.post(
+            "/design",
+            files={"pdb_file": ("1A3N.pdb", f, "chemical/x-pdb")},
+            data={
+                "chains": json.dumps(["A"]),
+                "constraints": constraints if isinstance(constraints, str)
+                else json.dumps(constraints),
+            },
+        )
+    assert resp.status_code == 400
+    assert message in resp.json()["detail"]
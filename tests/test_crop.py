@@ -0,0 +1,73 @@
+"""Tests for large-structure mode: context cropping and the memory budget."""
+
+import numpy as np
+import pytest
+
+from app.config import TEST_PDBS_DIR
+from app.proteinmpnn.tuning import check_memory_budget, design_memory_bytes, knn_chunked
+from app.proteinmpnn.wrapper import _link_as_pdb
+from app.structure import crop_context, load_backbone, num_positions
+from app.validation import PDBValidationError
+
+HBA_PATH = TEST_PDBS_DIR / "1A3N.pdb"
+
+
+@pytest.fixture
+def hemoglobin():
+    return load_backbone(HBA_PATH.read_bytes(), name="1A3N")
+
+
+def test_small_structures_untouched(hemoglobin):
+    assert crop_context(hemoglobin, ["A"]) is hemoglobin
+
+
+def test_crop_keeps_only_nearby_context(hemoglobin):
+    cropped = crop_context(hemoglobin, ["A"], radius=10, min_positions=0)
+    assert cropped.cropped
+    assert num_positions(cropped) < num_positions(hemoglobin)
+    assert cropped.chains["A"] is hemoglobin.chains["A"]
+
+    designed = hemoglobin.chains["A"].coords[:, 1, :]
+    designed = designed[np.isfinite(designed).all(axis=1)]
+    for chain_id, chain in cropped.chains.items():
+        assert len(chain_id) == 1
+        if chain_id == "A":
+            continue
+        ca = chain.coords[:, 1, :]
+        ca = ca[np.isfinite(ca).all(axis=1)]
+        nearest = np.linalg.norm(ca[:, None] - designed[None], axis=-1).min(axis=1)
+        assert (nearest <= 10).all()
+    # Still writable for the subprocess path
+    assert cropped.to_pdb().count("TER") == len(cropped.chains)
+
+
+def test_crop_bridges_missing_residues(hemoglobin):
+    chain = hemoglobin.chains["B"]
+    chain.coords[5] = np.nan  # a gap deep inside chain B
+    cropped = crop_context(hemoglobin, ["A"], radius=1000, min_positions=0)
+    assert len(cropped.chains["B"].sequence) == len(chain.sequence)
+
+
+def test_cropped_backbone_written_for_subprocess(tmp_path, hemoglobin):
+    cropped = crop_context(hemoglobin, ["A"], radius=10, min_positions=0)
+    dest = tmp_path / "in.pdb"
+    _link_as_pdb(HBA_PATH, dest, cropped)
+    assert not dest.is_symlink()
+    assert num_positions(load_backbone(dest.read_bytes())) <= num_positions(cropped)
+
+
+def test_memory_budget():
+    assert design_memory_bytes(1000, copies=2) == 2 * design_memory_bytes(1000)
+    check_memory_budget(1000, budget_mb=8192)
+    with pytest.raises(PDBValidationError, match="too large"):
+        check_memory_budget(50_000, budget_mb=8192)
+
+
+def test_knn_chunked_matches_full_matrix():
+    torch = pytest.importorskip("torch")
+    X = torch.rand(2, 300, 3) * 40
+    mask = (torch.rand(2, 300) > 0.1).float()
+    full = knn_chunked(torch, X, mask, 48, max_pairs=2**30)
+    chunked = knn_chunked(torch, X, mask, 48, max_pairs=2 * 300 * 7)
+    assert torch.equal(full[1], chunked[1])
+    assert torch.allclose(full[0], chunked[0])
@@ -2,20 +2,28 @@
 
 import json
 import subprocess
+import time
 from unittest.mock import patch
 
+import numpy as np
+import pytest
 from fastapi.testclient import TestClient
 
 from app.config import TEST_PDBS_DIR
+from app.executors import ConcurrencyLimiter
 from app.main import app
 from app.proteinmpnn.parser import ParsedFasta
+from app.schemas import ResidueLogProbs
 
 client = TestClient(app)
 
 UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
 
 
-def _post_design(pdb_path, chains=None, num_sequences=3):
+pytestmark = pytest.mark.usefixtures("empty_cache")
+
+
+def _post_design(pdb_path, chains=None, num_sequences=3, **extra):
     """Helper to POST /design with a real PDB file."""
     with open(pdb_path, "rb") as f:
         return client.post(
@@ -24,6 +32,7 @@ def _post_design(pdb_path, chains=None, num_sequences=3):
             data={
                 "chains": json.dumps(chains or ["A"]),
                 "num_sequences": str(num_sequences),
+                **extra,
             },
         )
 
@@ -46,6 +55,25 @@ class TestDesignEndpoint:
         assert data["metadata"]["num_sequences"] == 3
         assert data["metadata"]["num_residues"] == 76
         assert len(data["sequences"]) == 3
+        assert data["scores"] is None and data["log_probs"] is None
+
+    @patch("app.main.design_sequences")
+    def test_scores_and_log_probs(self, mock_design):
+        log_probs = np.log(np.full((4, 21), 1 / 21, dtype=np.float32))
+        mock_design.return_value = ParsedFasta(
+            "NATIVE", ["AAAA"], scores=[1.1], seq_recoveries=[0.4],
+            global_scores=[1.2], log_probs=[log_probs],
+        )
+        resp = _post_design(UBQ_PATH, num_sequences=1, include_log_probs="true")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert mock_design.call_args.kwargs["include_log_probs"] is True
+        assert (data["scores"], data["global_scores"], data["seq_recoveries"]) == (
+            [1.1], [1.2], [0.4]
+        )
+        decoded = ResidueLogProbs(**data["log_probs"][0]).to_array()
+        assert decoded.shape == (4, 21)
+        np.testing.assert_allclose(decoded, log_probs, rtol=1e-3)
 
     @patch("app.main.design_sequences")
     def test_multichain(self, mock_design):
@@ -92,4 +120,63 @@ class TestDesignEndpoint:
     def test_model_error_returns_500(self, mock_design):
         resp = _post_design(UBQ_PATH)
         assert resp.status_code == 500
-        assert resp.json()["detail"] == "Internal server error"
\ No newline at end of file
+        assert resp.json()["detail"] == "Internal server error"
+
+    @patch("app.main.design_limiter", ConcurrencyLimiter(limit=0))
+    def test_saturated_returns_429(self):
+        resp = _post_design(UBQ_PATH)
+        assert resp.status_code == 429
+        assert int(resp.headers["Retry-After"]) > 0
+
+    @patch("app.main.REQUEST_TIMEOUT_SECONDS", 0.5)
+    @patch("app.main.design_sequences", side_effect=lambda **kw: time.sleep(2))
+    def test_request_timeout_enforced(self, mock_design):
+        start = time.monotonic()
+        resp = _post_design(UBQ_PATH)
+        assert resp.status_code == 504
+        assert time.monotonic() - start < 2
+        assert mock_design.call_args.kwargs["timeout"] <= 0.5
+
+    @patch("app.main.design_sequences")
+    def test_limiter_released_after_request(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+        from app.main import design_limiter
+
+        _post_design(UBQ_PATH, num_sequences=1)
+        assert design_limiter.active == 0
+
+    @patch("app.main.design_sequences")
+    def test_repeat_request_served_from_cache(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+        first = _post_design(UBQ_PATH, num_sequences=1)
+        second = _post_design(UBQ_PATH, num_sequences=1)
+        assert first.json() == second.json()
+        assert mock_design.call_count == 1
+        assert client.get("/cache/stats").json()["memory_hits"] == 1
+
+    @patch("app.main.design_sequences")
+    def test_cache_bypass(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+        _post_design(UBQ_PATH, num_sequences=1)
+        _post_design(UBQ_PATH, num_sequences=1, use_cache="false")
+        assert mock_design.call_count == 2
+
+    @patch("app.main.design_sequences")
+    def test_subprocess_results_not_cached(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"], from_subprocess=True)
+        _post_design(UBQ_PATH, num_sequences=1)
+        _post_design(UBQ_PATH, num_sequences=1)
+        assert mock_design.call_count == 2
+
+    @patch("app.main.design_sequences")
+    def test_different_params_not_shared(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+        _post_design(UBQ_PATH, num_sequences=1)
+        _post_design(UBQ_PATH, num_sequences=2)
+        _post_design(UBQ_PATH, num_sequences=2, sampling_temp="0.3")
+        assert mock_design.call_count == 3
+        assert mock_design.call_args.kwargs["sampling_temp"] == 0.3
+
+    @pytest.mark.parametrize("temp", ["0", "-0.1", "1.5"])
+    def test_sampling_temp_out_of_range(self, temp):
+        assert _post_design(UBQ_PATH, sampling_temp=temp).status_code == 400
@@ -0,0 +1,131 @@
+"""Tests for the compact MessagePack response encoding."""
+
+import json
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.encoding import decode_design, encode_design, negotiate, residue_matrix
+from app.main import app
+from app.proteinmpnn.parser import ALPHABET, ParsedFasta
+from app.schemas import DesignMetadata, DesignResponse, ResidueLogProbs
+
+client = TestClient(app)
+
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+MSGPACK = "application/x-msgpack"
+
+
+def _response(sequences, native="MKV/GGA", log_probs=None) -> DesignResponse:
+    return DesignResponse(
+        metadata=DesignMetadata(num_residues=6, chains=["A", "B"], num_sequences=len(sequences)),
+        native_sequence=native,
+        sequences=sequences,
+        scores=[1.0 + i for i in range(len(sequences))],
+        log_probs=log_probs,
+    )
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("application/json", None),
+    ("", None),
+    (MSGPACK, "matrix"),
+    ("application/json;q=0.5, application/vnd.msgpack", "matrix"),
+    (f"{MSGPACK}; sequences=mutations", "mutations"),
+    (f"{MSGPACK}; sequences=other", "matrix"),
+    (f"{MSGPACK}; q=0", None),
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept) == expected
+
+
+def test_residue_matrix():
+    matrix = residue_matrix(["AC/D", "XW/Y"])
+    assert matrix.dtype == np.uint8
+    assert matrix.tolist() == [[ALPHABET.index(c) for c in "ACD"], [ALPHABET.index(c) for c in "XWY"]]
+    with pytest.raises(ValueError, match="length"):
+        residue_matrix(["AC", "A"])
+    with pytest.raises(ValueError, match="alphabet"):
+        residue_matrix(["AB"])
+
+
+@pytest.mark.parametrize("encoding", ["matrix", "mutations"])
+def test_round_trip(encoding):
+    log_probs = [ResidueLogProbs.from_array(np.full((6, 21), -i, np.float32)) for i in range(3)]
+    response = _response(["MKV/GGA", "MRV/GGC", "AKV/WGA"], log_probs=log_probs)
+    doc = decode_design(encode_design(response, encoding))
+    assert doc["sequences"] == response.sequences
+    assert doc["native_sequence"] == "MKV/GGA"
+    assert doc["scores"] == [1.0, 2.0, 3.0]
+    assert doc["metadata"]["chains"] == ["A", "B"]
+    assert doc["log_probs"][2].shape == (6, 21)
+    assert (doc["log_probs"][2] == -2).all()
+
+
+def test_mutations_only_store_differences():
+    import msgpack
+
+    response = _response(["MKV/GGA", "MRV/GGC"])
+    seqs = msgpack.unpackb(encode_design(response, "mutations"))["sequences"]
+    assert np.frombuffer(seqs["offsets"], "<u4").tolist() == [0, 0, 2]
+    assert np.frombuffer(seqs["positions"], "<u4").tolist() == [1, 5]
+
+
+def test_smaller_than_json_for_large_libraries():
+    rng = np.random.default_rng(0)
+    letters = np.array(list(ALPHABET[:20]))
+    native = rng.choice(letters, 1000)
+    library = [
+        "".join(np.where(rng.random(1000) < 0.05, rng.choice(letters, 1000), native))
+        for _ in range(200)
+    ]
+    response = _response(library, native="".join(native))
+    json_size = len(response.model_dump_json())
+    assert len(encode_design(response, "mutations")) < json_size * 0.3
+
+
+@patch("app.main.design_sequences")
+def test_design_endpoint_negotiates(mock_design, empty_cache):
+    mock_design.return_value = ParsedFasta("NATIVE", ["NATIVA", "MATIVE"], scores=[0.5, 0.6])
+
+    def post(accept):
+        with open(UBQ_PATH, "rb") as f:
+            return client.post(
+                "/design",
+                files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+                data={"chains": json.dumps(["A"]), "num_sequences": "2"},
+                headers={"Accept": accept},
+            )
+
+    packed = post(MSGPACK)
+    assert packed.headers["content-type"] == MSGPACK
+    assert decode_design(packed.content)["sequences"] == ["NATIVA", "MATIVE"]
+    # The cached JSON is re-encoded on a hit, and JSON stays the default
+    assert decode_design(post(f"{MSGPACK}; sequences=mutations").content)["scores"] == [0.5, 0.6]
+    assert post("application/json").json()["sequences"] == ["NATIVA", "MATIVE"]
+    assert mock_design.call_count == 1
+
+
+@patch("app.main.design_sequences")
+def test_job_result_gzipped(mock_design):
+    mock_design.return_value = ParsedFasta("M" * 400, ["A" * 400] * 50)
+    with open(UBQ_PATH, "rb") as f:
+        job_id = client.post(
+            "/jobs",
+            files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+            data={"chains": json.dumps(["A"]), "num_sequences": "50"},
+        ).json()["job_id"]
+    deadline = time.monotonic() + 10
+    while client.get(f"/jobs/{job_id}").json()["status"] != "succeeded":
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+    resp = client.get(
+        f"/jobs/{job_id}/result", headers={"Accept": MSGPACK, "Accept-Encoding": "gzip"}
+    )
+    assert resp.headers["content-encoding"] == "gzip"
+    assert decode_design(resp.content)["sequences"][0] == "A" * 400
@@ -1,6 +1,11 @@
+import asyncio
+import subprocess
+import sys
+import time
+
 from fastapi.testclient import TestClient
 
-from app.main import app
+from app.main import _warm_up, app
 
 client = TestClient(app)
 
@@ -11,6 +16,32 @@ def test_health():
     data = resp.json()
     assert data["status"] == "ok"
     assert "model_loaded" in data
+    assert data["workers_warm"] == 0
+
+
+def test_import_defers_heavy_modules():
+    code = "import sys, app.main; print(sorted({'Bio', 'torch'} & set(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_not_ready_before_warm_up():
+    resp = client.get("/ready")
+    assert resp.status_code == 503
+    assert resp.json()["workers_warm"] == 0
+
+
+def test_ready_after_warm_up(start_pool):
+    pool = start_pool(size=2)
+    try:
+        asyncio.run(_warm_up(pool, started=time.monotonic() - 1.0))
+        resp = client.get("/ready")
+        assert resp.status_code == 200
+        assert resp.json()["cold_start_seconds"] >= 1.0
+        assert "mpnn_cold_start_seconds" in client.get("/metrics").text
+    finally:
+        app.state.model_ready = False
+        app.state.cold_start_seconds = None
 
 
 def test_root():
@@ -0,0 +1,179 @@
+"""Tests for the asynchronous /jobs API and job stores."""
+
+import json
+import threading
+import time
+from concurrent.futures import CancelledError
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.jobs import InMemoryJobStore, JobManager, SQLiteJobStore
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.schemas import JobInfo, JobProgress, JobStatus
+
+client = TestClient(app)
+
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+
+
+def _post_job(chains=None, num_sequences=2):
+    with open(UBQ_PATH, "rb") as f:
+        return client.post(
+            "/jobs",
+            files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+            data={
+                "chains": json.dumps(chains or ["A"]),
+                "num_sequences": str(num_sequences),
+            },
+        )
+
+
+def _wait_finished(job_id: str, timeout: float = 10.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.get(f"/jobs/{job_id}").json()
+        if data["status"] in ("succeeded", "failed", "cancelled"):
+            return data
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+class TestJobsEndpoint:
+    @patch("app.main.design_sequences")
+    def test_submit_and_fetch_result(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+        resp = _post_job(num_sequences=2)
+        assert resp.status_code == 202
+        job_id = resp.json()["job_id"]
+
+        status = _wait_finished(job_id)
+        assert status["status"] == "succeeded"
+        assert status["progress"] == {"completed": 2, "total": 2}
+
+        result = client.get(f"/jobs/{job_id}/result")
+        assert result.status_code == 200
+        data = result.json()
+        assert data["native_sequence"] == "NATIVE"
+        assert data["metadata"]["num_residues"] == 76
+        assert data["sequences"] == ["AAAA", "CCCC"]
+
+    def test_invalid_pdb_rejected_at_submit(self):
+        resp = _post_job(chains=["Z"])
+        assert resp.status_code == 400
+        assert "not found" in resp.json()["detail"]
+
+    def test_unknown_job(self):
+        assert client.get("/jobs/nope").status_code == 404
+        assert client.get("/jobs/nope/result").status_code == 404
+        assert client.delete("/jobs/nope").status_code == 404
+
+    @patch("app.main.design_sequences", side_effect=RuntimeError("model crashed"))
+    def test_failed_job(self, mock_design):
+        job_id = _post_job().json()["job_id"]
+        status = _wait_finished(job_id)
+        assert status["status"] == "failed"
+        assert "model crashed" in status["error"]
+        assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+    def test_cancel_running_job(self):
+        started = threading.Event()
+
+        def slow_design(cancel_event, progress, **kwargs):
+            progress(1, 2)
+            started.set()
+            if cancel_event.wait(10):
+                raise CancelledError()
+            return ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+
+        with patch("app.main.design_sequences", side_effect=slow_design):
+            job_id = _post_job().json()["job_id"]
+            assert started.wait(5)
+            assert client.get(f"/jobs/{job_id}").json()["progress"]["completed"] == 1
+
+            resp = client.delete(f"/jobs/{job_id}")
+            assert resp.status_code == 200
+            assert resp.json()["status"] == "cancelled"
+            assert _wait_finished(job_id)["status"] == "cancelled"
+            assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_roundtrip(backend, tmp_path):
+    store = (
+        InMemoryJobStore() if backend == "memory"
+        else SQLiteJobStore(tmp_path / "jobs.db")
+    )
+    job = JobInfo(job_id="j1", progress=JobProgress(total=3), created_at=1.0)
+    store.create(job)
+    updated = store.update("j1", status=JobStatus.RUNNING)
+    assert updated.status == JobStatus.RUNNING
+    assert store.get("j1").status == JobStatus.RUNNING
+    assert store.get_result("j1") is None
+    store.set_result("j1", '{"ok": true}')
+    assert store.get_result("j1") == '{"ok": true}'
+    assert store.get("missing") is None
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_update_expected_status(backend, tmp_path):
+    store = (
+        InMemoryJobStore() if backend == "memory"
+        else SQLiteJobStore(tmp_path / "jobs.db")
+    )
+    store.create(JobInfo(job_id="j1", progress=JobProgress(total=1), created_at=1.0))
+    store.update("j1", status=JobStatus.SUCCEEDED)
+    running = (JobStatus.QUEUED, JobStatus.RUNNING)
+    assert store.update("j1", expected=running, status=JobStatus.CANCELLED) is None
+    assert store.get("j1").status == JobStatus.SUCCEEDED
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_store_drops_expired_jobs(backend, tmp_path):
+    store = (
+        InMemoryJobStore(retention_seconds=60) if backend == "memory"
+        else SQLiteJobStore(tmp_path / "jobs.db", retention_seconds=60)
+    )
+    for job_id in ("old", "recent", "running"):
+        store.create(JobInfo(job_id=job_id, progress=JobProgress(total=1), created_at=1.0))
+    store.update("old", status=JobStatus.SUCCEEDED, finished_at=time.time() - 120)
+    store.set_result("old", "{}")
+    store.update("recent", status=JobStatus.FAILED, finished_at=time.time())
+    store.create(JobInfo(job_id="new", progress=JobProgress(total=1), created_at=1.0))
+    assert store.get("old") is None
+    assert store.get_result("old") is None
+    assert all(store.get(j) is not None for j in ("recent", "running", "new"))
+
+
+def test_memory_store_keeps_bounded_finished_jobs():
+    store = InMemoryJobStore(max_finished=2)
+    for i in range(4):
+        store.create(JobInfo(job_id=f"j{i}", progress=JobProgress(total=1), created_at=1.0))
+        store.update(f"j{i}", status=JobStatus.SUCCEEDED, finished_at=time.time())
+    store.create(JobInfo(job_id="next", progress=JobProgress(total=1), created_at=1.0))
+    assert [store.get(f"j{i}") is not None for i in range(4)] == [False, False, True, True]
+
+
+def test_cancel_keeps_finished_outcome():
+    manager = JobManager(InMemoryJobStore(), max_workers=1)
+    job = manager.submit(lambda progress, event: JobProgress(total=1), total=1)
+    deadline = time.monotonic() + 5
+    while manager.get(job.job_id).status != JobStatus.SUCCEEDED:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert manager.cancel(job.job_id).status == JobStatus.SUCCEEDED
+    manager.shutdown()
+
+
+def test_sqlite_marks_interrupted_jobs_failed(tmp_path):
+    path = tmp_path / "jobs.db"
+    store = SQLiteJobStore(path)
+    store.create(JobInfo(job_id="j1", progress=JobProgress(total=1), created_at=1.0))
+
+    reopened = SQLiteJobStore(path)
+    job = reopened.get("j1")
+    assert job.status == JobStatus.FAILED
+    assert "restart" in job.error
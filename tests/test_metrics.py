@@ -0,0 +1,130 @@
+"""Tests for stage timing and the /metrics endpoint."""
+
+import asyncio
+import json
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.executors import run_blocking
+from app.main import app
+from app.metrics import (
+    RESPONSES,
+    STAGE_SECONDS,
+    STREAM_ERRORS,
+    Histogram,
+    Timings,
+    current_timings,
+    process_age_seconds,
+    timed,
+)
+from app.proteinmpnn.parser import ParsedFasta
+
+client = TestClient(app)
+
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+
+
+pytestmark = pytest.mark.usefixtures("empty_cache")
+
+
+def _post(path="/design", chains=None, headers=None):
+    with open(UBQ_PATH, "rb") as f:
+        return client.post(
+            path,
+            files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+            data={"chains": json.dumps(chains or ["A"]), "num_sequences": "2"},
+            headers=headers,
+        )
+
+
+def test_histogram_buckets_are_cumulative():
+    hist = Histogram("h", "test", buckets=(1.0, 5.0))
+    for value in (0.5, 2.0, 9.0):
+        hist.observe(value)
+    lines = hist.render()
+    assert 'h_bucket{le="1"} 1' in lines
+    assert 'h_bucket{le="5"} 2' in lines
+    assert 'h_bucket{le="+Inf"} 3' in lines
+    assert "h_count 3" in lines
+
+
+def test_process_age_seconds():
+    age = process_age_seconds()
+    if age is None:
+        pytest.skip("/proc not available")
+    # This process started before the test, and not days ago
+    assert 0 < age < 24 * 3600
+
+
+def test_timings_follow_into_executor_threads():
+    def work():
+        with timed("work"):
+            time.sleep(0.01)
+
+    async def run():
+        timings = Timings()
+        current_timings.set(timings)
+        with ThreadPoolExecutor(1) as executor:
+            await run_blocking(executor, work)
+        return timings
+
+    timings = asyncio.run(run())
+    assert [stage for stage, _ in timings.spans] == ["work"]
+    assert timings.spans[0][1] >= 0.01
+
+
+@patch("app.main.design_sequences")
+def test_design_stages_recorded(mock_design):
+    mock_design.return_value = ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+    before = {s: STAGE_SECONDS.count(s) for s in ("upload", "validate", "inference")}
+    resp = _post(headers={"X-Timing": "1"})
+    assert resp.status_code == 200
+    for stage, count in before.items():
+        assert STAGE_SECONDS.count(stage) == count + 1
+
+    stages = [part.split(";")[0] for part in resp.headers["X-Timing"].split(", ")]
+    assert stages == [
+        "upload", "cache_key", "validate", "scheduler_queue", "inference", "total"
+    ]
+
+
+@patch("app.main.design_sequences")
+def test_timing_header_is_opt_in(mock_design):
+    mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+    assert "X-Timing" not in _post().headers
+
+
+def test_status_codes_counted():
+    before = RESPONSES.value("POST", "/design", "400")
+    assert _post(chains=["Z"]).status_code == 400
+    assert RESPONSES.value("POST", "/design", "400") == before + 1
+
+
+@patch("app.main.design_sequences", side_effect=subprocess.TimeoutExpired("mpnn", 1))
+def test_stream_timeouts_counted(_mock_design):
+    before = STREAM_ERRORS.value("504")
+    _post("/design/stream")
+    assert STREAM_ERRORS.value("504") == before + 1
+
+
+@patch("app.main.design_sequences")
+def test_metrics_endpoint(mock_design):
+    mock_design.return_value = ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+    _post()
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    text = resp.text
+    assert 'mpnn_stage_seconds_bucket{stage="validate",le="+Inf"}' in text
+    assert 'mpnn_responses_total{method="POST",path="/design",status="200"}' in text
+    assert "mpnn_requests_in_flight 1" in text  # the scrape itself
+    assert 'mpnn_queue_depth{queue="jobs"} 0' in text
+    assert 'mpnn_process_rss_bytes{process="api"}' in text
+    assert 'mpnn_process_pss_bytes{process="api"}' in text
+    assert "mpnn_residues_designed_total" in text
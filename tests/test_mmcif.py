@@ -0,0 +1,241 @@
+"""mmCIF and BinaryCIF input: columnar readers and /design support."""
+
+import gzip
+import io
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from Bio.PDB import MMCIFIO, PDBParser
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.structure import (
+    Backbone,
+    parse_mmcif_backbone,
+    parse_pdb_backbone,
+    scan_bcif_backbone,
+    scan_mmcif_backbone,
+    structure_format,
+)
+from app.structure.mmcif import _bcif_decode, _unpack_integers
+from app.validation import PDBValidationError, validate_pdb
+
+client = TestClient(app)
+
+PDB_FILES = sorted(TEST_PDBS_DIR.glob("*.pdb"))
+BCIF_COLUMNS = [
+    "group_PDB", "label_atom_id", "label_comp_id", "auth_asym_id",
+    "auth_seq_id", "pdbx_PDB_ins_code", "Cartn_x", "Cartn_y", "Cartn_z",
+    "occupancy", "pdbx_PDB_model_num",
+]
+
+
+def _to_mmcif(path, rename: dict[str, str] | None = None) -> bytes:
+    structure = PDBParser(QUIET=True).get_structure(path.stem, path)
+    for old, new in (rename or {}).items():
+        structure[0][old].id = new
+    writer = MMCIFIO()
+    writer.set_structure(structure)
+    buf = io.StringIO()
+    writer.save(buf)
+    return buf.getvalue().encode()
+
+
+def _assert_same(a: Backbone, b: Backbone) -> None:
+    assert a.chain_ids == b.chain_ids
+    assert list(a.chains) == list(b.chains)
+    for chain_id, chain in a.chains.items():
+        other = b.chains[chain_id]
+        assert chain.sequence == other.sequence
+        np.testing.assert_array_equal(chain.residue_numbers, other.residue_numbers)
+        np.testing.assert_array_equal(chain.standard, other.standard)
+        np.testing.assert_allclose(chain.coords, other.coords, atol=1e-3)
+
+
+def _string_column(values: list[str]) -> dict:
+    unique = sorted(set(values))
+    offsets = np.cumsum([0] + [len(v) for v in unique]).astype(np.int32)
+    indices = np.array([unique.index(v) for v in values], dtype=np.int32)
+    return {
+        "data": indices.tobytes(),
+        "encoding": [{
+            "kind": "StringArray",
+            "dataEncoding": [{"kind": "ByteArray", "type": 3}],
+            "stringData": "".join(unique),
+            "offsetEncoding": [{"kind": "ByteArray", "type": 3}],
+            "offsets": offsets.tobytes(),
+        }],
+    }
+
+
+def _int_column(values) -> dict:
+    # Delta + IntegerPacking (int8), as molstar writes residue numbers
+    deltas = np.diff(np.asarray(values, dtype=np.int64), prepend=values[0])
+    packed = []
+    for d in deltas:
+        while d >= 127:
+            packed.append(127)
+            d -= 127
+        while d <= -128:
+            packed.append(-128)
+            d += 128
+        packed.append(d)
+    return {
+        "data": np.array(packed, dtype=np.int8).tobytes(),
+        "encoding": [
+            {"kind": "Delta", "origin": int(values[0]), "srcType": 3},
+            {"kind": "IntegerPacking", "byteCount": 1, "isUnsigned": False,
+             "srcSize": len(values)},
+            {"kind": "ByteArray", "type": 1},
+        ],
+    }
+
+
+def _float_column(values) -> dict:
+    return {
+        "data": np.round(np.asarray(values) * 1000).astype(np.int32).tobytes(),
+        "encoding": [
+            {"kind": "FixedPoint", "factor": 1000, "srcType": 33},
+            {"kind": "ByteArray", "type": 3},
+        ],
+    }
+
+
+def _to_bcif(mmcif: bytes) -> bytes:
+    """Encode the atom_site columns of an mmCIF as BinaryCIF."""
+    msgpack = pytest.importorskip("msgpack")
+    lines = mmcif.decode().splitlines()
+    names = [line.split(".", 1)[1].strip() for line in lines if line.startswith("_atom_site.")]
+    rows = [line.split() for line in lines if line.startswith(("ATOM", "HETATM"))]
+    cols = {n: [r[i] for r in rows] for i, n in enumerate(names)}
+
+    columns = []
+    for name in BCIF_COLUMNS:
+        values = cols[name]
+        if name in ("auth_seq_id", "pdbx_PDB_model_num"):
+            data = _int_column([int(v) for v in values])
+        elif name.startswith("Cartn_") or name == "occupancy":
+            data = _float_column([float(v) for v in values])
+        else:
+            data = _string_column(values)
+        columns.append({"name": name, "data": data, "mask": None})
+    doc = {
+        "version": "0.3.0",
+        "encoder": "test",
+        "dataBlocks": [{
+            "header": "TEST",
+            "categories": [
+                {"name": "_atom_site", "columns": columns, "rowCount": len(rows)}
+            ],
+        }],
+    }
+    return msgpack.packb(doc, use_bin_type=True)
+
+
+@pytest.mark.parametrize("path", PDB_FILES, ids=lambda p: p.name)
+def test_mmcif_matches_pdb(path):
+    expected = parse_pdb_backbone(path.read_bytes(), path.stem)
+    mmcif = _to_mmcif(path)
+    _assert_same(scan_mmcif_backbone(mmcif, path.stem), expected)
+    _assert_same(parse_mmcif_backbone(mmcif, path.stem), expected)
+
+
+@pytest.mark.parametrize("path", PDB_FILES, ids=lambda p: p.name)
+def test_bcif_matches_pdb(path):
+    expected = parse_pdb_backbone(path.read_bytes(), path.stem)
+    _assert_same(scan_bcif_backbone(_to_bcif(_to_mmcif(path)), path.stem), expected)
+
+
+def test_mmcif_quoted_values():
+    mmcif = b"""data_q
+loop_
+_atom_site.group_PDB
+_atom_site.label_atom_id
+_atom_site.label_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_seq_id
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+ATOM N GLY A 1 1.0 0.0 0.0
+ATOM "CA" GLY A 1 2.0 0.0 0.0
+HETATM "O5'" LIG A 2 3.0 0.0 0.0
+ATOM 'CA' ALA A 3 4.0 0.0 0.0
+#
+"""
+    backbone = scan_mmcif_backbone(mmcif)
+    chain = backbone.chains["A"]
+    assert chain.sequence == "GXA"
+    assert chain.coords[0, 1, 0] == 2.0
+    assert chain.coords[2, 1, 0] == 4.0
+
+
+def test_unpack_integers():
+    packed = np.array([127, 127, 3, -128, -2, 5], dtype=np.int8)
+    assert _unpack_integers(packed, unsigned=False).tolist() == [257, -130, 5]
+
+
+def test_run_length_decode():
+    data = np.array([7, 3, 9, 2], dtype=np.int32).tobytes()
+    decoded = _bcif_decode(
+        data,
+        [{"kind": "RunLength", "srcType": 3, "srcSize": 5}, {"kind": "ByteArray", "type": 3}],
+    )
+    assert decoded.tolist() == [7, 7, 7, 9, 9]
+
+
+def test_structure_format():
+    assert structure_format("x.pdb") == "pdb"
+    assert structure_format("x.CIF.gz") == "mmcif"
+    assert structure_format("x.bcif") == "bcif"
+    assert structure_format("noext") == "pdb"
+
+
+def test_validate_mmcif(tmp_path):
+    path = tmp_path / "2lzm.cif"
+    path.write_bytes(_to_mmcif(TEST_PDBS_DIR / "2LZM.pdb"))
+    assert validate_pdb(path, ["A"]).num_residues(["A"]) == 164
+    with pytest.raises(PDBValidationError, match=r"Chain\(s\) \['Z'\] not found"):
+        validate_pdb(path, ["Z"])
+
+
+def test_validate_rejects_multi_character_chain_ids(tmp_path):
+    path = tmp_path / "1ubq.cif"
+    path.write_bytes(_to_mmcif(TEST_PDBS_DIR / "1UBQ.pdb", rename={"A": "AA"}))
+    with pytest.raises(PDBValidationError, match=r"chain ID\(s\) \['AA'\] are longer"):
+        validate_pdb(path, ["AA"])
+
+
+def test_validate_mmcif_without_atoms(tmp_path):
+    path = tmp_path / "empty.cif"
+    path.write_bytes(b"data_x\n#\n")
+    with pytest.raises(PDBValidationError, match="mmCIF file contains no ATOM records"):
+        validate_pdb(path, ["A"])
+
+
+@pytest.mark.usefixtures("empty_cache")
+class TestDesignFormats:
+    @pytest.mark.parametrize(
+        "filename, encode",
+        [
+            ("1ubq.cif", lambda d: d),
+            ("1ubq.cif.gz", gzip.compress),
+            ("1ubq.bcif", _to_bcif),
+        ],
+    )
+    @patch("app.main.design_sequences")
+    def test_design_accepts_format(self, mock_design, filename, encode):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA"])
+        data = encode(_to_mmcif(TEST_PDBS_DIR / "1UBQ.pdb"))
+        resp = client.post(
+            "/design",
+            files={"pdb_file": (filename, data, "application/octet-stream")},
+            data={"chains": json.dumps(["A"]), "num_sequences": "1"},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["metadata"]["num_residues"] == 76
+        assert mock_design.call_args.kwargs["backbone"].num_residues(["A"]) == 76
@@ -0,0 +1,88 @@
+"""The fixed-column scanner must agree with the BioPython path."""
+
+import numpy as np
+import pytest
+
+from app.config import TEST_PDBS_DIR
+from app.structure import Backbone, parse_pdb_backbone, scan_pdb_backbone
+from app.validation.pdb import PDBValidationError, validate_pdb
+
+PDB_FILES = sorted(TEST_PDBS_DIR.glob("*.pdb"))
+
+
+def _atom(serial, name, resname, chain, resseq, x, altloc=" ", occ=1.0, record="ATOM  "):
+    return (
+        f"{record}{serial:5d} {name:<4}{altloc}{resname:>3} {chain}{resseq:4d}    "
+        f"{x:8.3f}{0.0:8.3f}{0.0:8.3f}{occ:6.2f}{0.0:6.2f}\n"
+    )
+
+
+def _assert_same(a: Backbone, b: Backbone) -> None:
+    assert a.chain_ids == b.chain_ids
+    assert list(a.chains) == list(b.chains)
+    for chain_id, chain in a.chains.items():
+        other = b.chains[chain_id]
+        assert chain.sequence == other.sequence
+        np.testing.assert_array_equal(chain.residue_numbers, other.residue_numbers)
+        np.testing.assert_array_equal(chain.standard, other.standard)
+        np.testing.assert_array_equal(chain.coords, other.coords)
+
+
+@pytest.mark.parametrize("path", PDB_FILES, ids=lambda p: p.name)
+def test_scan_matches_biopython(path):
+    data = path.read_bytes()
+    _assert_same(scan_pdb_backbone(data, path.stem), parse_pdb_backbone(data, path.stem))
+
+
+def test_scan_edge_cases_match_biopython():
+    data = "".join([
+        # altloc: the higher-occupancy B position wins
+        _atom(1, "N", "GLY", "A", 1, 1.0),
+        _atom(2, "CA", "GLY", "A", 1, 2.0, altloc="A", occ=0.4),
+        _atom(3, "CA", "GLY", "A", 1, 9.0, altloc="B", occ=0.6),
+        # gap at 2, insertion code at 3
+        _atom(4, "CA", "ALA", "A", 3, 3.0),
+        "ATOM      5  CA  SER A   3A      4.000   0.000   0.000  1.00  0.00\n",
+        # selenomethionine is read as M
+        _atom(6, "CA", "MSE", "A", 4, 5.0, record="HETATM"),
+        # water-only chain is listed but has no backbone
+        _atom(7, "O", "HOH", "W", 1, 6.0, record="HETATM"),
+        "ENDMDL\n",
+        _atom(8, "CA", "GLY", "B", 1, 7.0),
+    ]).encode()
+    scanned = scan_pdb_backbone(data)
+    _assert_same(scanned, parse_pdb_backbone(data))
+    chain = scanned.chains["A"]
+    assert chain.sequence == "GXASM"
+    assert chain.coords[0, 1, 0] == 9.0
+    assert scanned.chain_ids == ["A", "W"]
+
+
+def test_scan_rejects_bad_coordinates():
+    data = _atom(1, "CA", "GLY", "A", 1, 1.0).replace("   1.000", "   1.0x0").encode()
+    with pytest.raises(ValueError):
+        scan_pdb_backbone(data)
+
+
+def test_fast_and_biopython_errors_identical(tmp_path):
+    bad = tmp_path / "bad.pdb"
+    bad.write_bytes(
+        _atom(1, "CA", "GLY", "A", 1, 1.0).replace("   1.000", "   1.0x0").encode()
+    )
+    messages = []
+    for parser in ("fast", "biopython"):
+        with pytest.raises(PDBValidationError) as exc:
+            validate_pdb(bad, ["A"], parser=parser)
+        messages.append(str(exc.value))
+    assert messages[0] == messages[1]
+    assert messages[0].startswith("Failed to parse PDB file")
+
+
+def test_missing_chain_message_identical():
+    path = TEST_PDBS_DIR / "1A3N.pdb"
+    messages = []
+    for parser in ("fast", "biopython"):
+        with pytest.raises(PDBValidationError) as exc:
+            validate_pdb(path, ["Z"], parser=parser)
+        messages.append(str(exc.value))
+    assert messages[0] == messages[1]
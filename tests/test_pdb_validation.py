@@ -1,8 +1,7 @@
 import pytest
 from pathlib import Path
 
-from Bio.PDB.Structure import Structure
-
+from app.structure import Backbone
 from app.validation.pdb import PDBValidationError, validate_pdb
 from app.config import TEST_PDBS_DIR
 
@@ -14,9 +13,10 @@ def test_valid_pdb_1ubq():
     assert result is not None
 
 
-def test_valid_pdb_returns_structure():
+def test_valid_pdb_returns_backbone():
     result = validate_pdb(TEST_PDBS_DIR / "1UBQ.pdb", chains=["A"])
-    assert isinstance(result, Structure)
+    assert isinstance(result, Backbone)
+    assert result.chains["A"].sequence.startswith("MQIFVKTL")
 
 
 # --- File-level failures ---
@@ -1,19 +1,18 @@
 from app.validation.pdb import count_hetatm, validate_pdb
 from app.config import TEST_PDBS_DIR
 
-from Bio.PDB.Structure import Structure
+from app.structure import Backbone
 
 
-def _count_residues(structure: Structure, chain_id: str) -> int:
-    chain = structure[0][chain_id]
-    return len([r for r in chain if r.get_id()[0] == " "])
+def _count_residues(backbone: Backbone, chain_id: str) -> int:
+    return backbone.num_residues([chain_id])
 
 
 # --- 1UBQ: baseline single-chain monomer ---
 
 def test_1ubq_validates():
     result = validate_pdb(TEST_PDBS_DIR / "1UBQ.pdb", ["A"])
-    assert isinstance(result, Structure)
+    assert isinstance(result, Backbone)
     assert _count_residues(result, "A") == 76
 
 
@@ -21,7 +20,7 @@ def test_1ubq_validates():
 
 def test_6mrr_incomplete():
     result = validate_pdb(TEST_PDBS_DIR / "6MRR.pdb", ["A"])
-    assert isinstance(result, Structure)
+    assert isinstance(result, Backbone)
     assert _count_residues(result, "A") == 68
 
 
@@ -29,7 +28,7 @@ def test_6mrr_incomplete():
 
 def test_1a3n_multi_chain():
     result = validate_pdb(TEST_PDBS_DIR / "1A3N.pdb", ["A"])
-    assert isinstance(result, Structure)
+    assert isinstance(result, Backbone)
     n_res = _count_residues(result, "A")
     assert n_res == 141
 
@@ -38,10 +37,30 @@ def test_1a3n_multi_chain():
 
 def test_2lzm_validates():
     result = validate_pdb(TEST_PDBS_DIR / "2LZM.pdb", ["A"])
-    assert isinstance(result, Structure)
+    assert isinstance(result, Backbone)
     assert _count_residues(result, "A") == 164
 
 
+def test_2lzm_backbone_arrays():
+    result = validate_pdb(TEST_PDBS_DIR / "2LZM.pdb", ["A"])
+    chain = result.chains["A"]
+    assert chain.coords.shape == (len(chain.sequence), 4, 3)
+    assert chain.sequence.startswith("MNIFEMLRIDE")
+    # Waters/ligands are not part of the backbone
+    assert len(chain.sequence) == 164
+
+
+def test_1a3n_mpnn_dict_layout():
+    result = validate_pdb(TEST_PDBS_DIR / "1A3N.pdb", ["A"])
+    entry = result.to_mpnn_dict()
+    chain_keys = [k for k in entry if k.startswith("seq_chain_")]
+    assert chain_keys == sorted(chain_keys)
+    assert entry["num_of_chains"] == len(chain_keys)
+    assert entry["seq"] == "".join(entry[k] for k in chain_keys)
+    coords = entry["coords_chain_A"]["CA_chain_A"]
+    assert len(coords) == len(entry["seq_chain_A"])
+
+
 def test_2lzm_has_hetatm():
     hetatm_count = count_hetatm(str(TEST_PDBS_DIR / "2LZM.pdb"))
     assert hetatm_count > 0
@@ -0,0 +1,179 @@
+"""Tests for the warm ProteinMPNN worker pool, using the stub engine in conftest."""
+
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from app.metrics import FEATURE_CACHE_LOOKUPS, WORKER_RESTARTS
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta
+from app.proteinmpnn.pool import WorkerPool
+from app.proteinmpnn.wrapper import BatchItem, design_batch
+from app.structure import Backbone
+
+
+def _bb(name: str) -> Backbone:
+    return Backbone(name=name, chains={})
+
+
+def test_all_workers_warm(fake_pool):
+    assert fake_pool.warm_count == 2
+
+
+def test_submit_returns_parsed_fasta(fake_pool):
+    result = fake_pool.submit(
+        backbone=_bb("x.pdb"), chains=["A"], num_sequences=3, sampling_temp=0.1
+    ).result(timeout=10)
+    assert isinstance(result, ParsedFasta)
+    assert result.native_sequence == "x.pdb"
+    assert result.designed_sequences == ["A", "AA", "AAA"]
+
+
+def test_concurrent_jobs(fake_pool):
+    futures = [
+        fake_pool.submit(backbone=_bb(f"{i}.pdb"), chains=["A"], num_sequences=1)
+        for i in range(8)
+    ]
+    natives = [f.result(timeout=10).native_sequence for f in futures]
+    assert natives == [f"{i}.pdb" for i in range(8)]
+
+
+def test_engine_error_propagates(fake_pool):
+    future = fake_pool.submit(backbone=_bb("x.pdb"), chains=["boom"])
+    with pytest.raises(ValueError, match="bad chain"):
+        future.result(timeout=10)
+
+
+def test_progress_reported(fake_pool):
+    seen = []
+    fake_pool.submit(
+        progress=lambda done, total: seen.append((done, total)),
+        backbone=_bb("x.pdb"),
+        chains=["A"],
+        num_sequences=3,
+    ).result(timeout=10)
+    assert seen == [(1, 3), (2, 3), (3, 3)]
+
+
+def test_samples_relayed(fake_pool):
+    seen = []
+    fake_pool.submit(
+        on_sample=seen.append, backbone=_bb("x.pdb"), chains=["A"], num_sequences=2
+    ).result(timeout=10)
+    assert seen == [
+        DesignedSample(0, "A", 1.0, 0.5),
+        DesignedSample(1, "AA", 1.0, 0.5),
+    ]
+
+
+def _wait_started(seen: list, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not seen:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_cancel_running_job_stops_it_without_restart(start_pool):
+    p = start_pool(size=1)
+    pids = p.worker_pids()
+    started = []
+    future = p.submit(
+        progress=lambda done, total: started.append(done),
+        backbone=_bb("x.pdb"),
+        chains=["slow"],
+        num_sequences=2,
+    )
+    _wait_started(started)
+    assert p.cancel(future)
+    with pytest.raises(CancelledError):
+        future.result(timeout=1)
+
+    # The same worker stops after its current pass and takes the next job
+    result = p.submit(backbone=_bb("after.pdb"), chains=["A"]).result(timeout=5)
+    assert result.native_sequence == "after.pdb"
+    assert p.worker_pids() == pids
+
+
+def test_cancel_queued_job_is_skipped(start_pool):
+    p = start_pool(size=1)
+    pids = p.worker_pids()
+    started, skipped = [], []
+    running = p.submit(
+        progress=lambda done, total: started.append(done),
+        backbone=_bb("x.pdb"),
+        chains=["slow"],
+    )
+    queued = p.submit(
+        progress=lambda done, total: skipped.append(done),
+        backbone=_bb("queued.pdb"),
+        chains=["A"],
+    )
+    after = p.submit(backbone=_bb("after.pdb"), chains=["A"], num_sequences=1)
+    _wait_started(started)
+    assert p.cancel(queued)
+    assert p.cancel(running)
+    assert after.result(timeout=5).native_sequence == "after.pdb"
+    assert skipped == []
+    assert p.worker_pids() == pids
+
+
+def test_cancel_finished_job_is_noop(fake_pool):
+    future = fake_pool.submit(backbone=_bb("x.pdb"), chains=["A"], num_sequences=1)
+    future.result(timeout=10)
+    assert not fake_pool.cancel(future)
+
+
+def test_design_batch_fans_out_groups(fake_pool):
+    items = [
+        BatchItem(
+            f"{i}.pdb",
+            ["boom"] if i == 1 else ["A"],
+            3000 if i < 2 else 100,
+            _bb(f"{i}.pdb"),
+        )
+        for i in range(4)
+    ]
+    results = design_batch(items, num_sequences=2, pool=fake_pool, timeout=10)
+    assert results[0].native_sequence == "0.pdb"
+    assert isinstance(results[1], ValueError)
+    assert [r.native_sequence for r in results[2:]] == ["2.pdb", "3.pdb"]
+    assert results[3].designed_sequences == ["A", "AA"]
+
+
+def test_crashed_worker_restarted_and_its_queue_failed(start_pool, wait_warm):
+    p = start_pool(size=1, check_interval=0.05)
+    restarts = WORKER_RESTARTS.value("crash")
+    crashed = p.submit(backbone=_bb("x.pdb"), chains=["crash"])
+    queued = p.submit(backbone=_bb("queued.pdb"), chains=["A"], num_sequences=1)
+    with pytest.raises(RuntimeError, match="crashed"):
+        crashed.result(timeout=10)
+    with pytest.raises(RuntimeError, match="with this job queued"):
+        queued.result(timeout=10)
+    assert WORKER_RESTARTS.value("crash") - restarts == 1
+
+    wait_warm(p, 1)
+    after = p.submit(backbone=_bb("after.pdb"), chains=["A"], num_sequences=1)
+    assert after.result(timeout=10).native_sequence == "after.pdb"
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        WorkerPool(size=0)
+
+
+def test_submit_before_warm_fails():
+    p = WorkerPool(size=1)  # never started
+    with pytest.raises(RuntimeError, match="No warm"):
+        p.submit(backbone=_bb("x.pdb"), chains=["A"])
+
+
+def test_feature_cache_stats_become_counters():
+    pool = WorkerPool(size=1)  # not started
+    hits = FEATURE_CACHE_LOOKUPS.value("hit")
+    misses = FEATURE_CACHE_LOOKUPS.value("miss")
+    pool._record_cache_stats(0, {"hits": 2, "misses": 1, "evictions": 0})
+    pool._record_cache_stats(0, {"hits": 3, "misses": 1, "evictions": 0})
+    # A restarted worker reports from zero again
+    pool._record_cache_stats(0, {"hits": 0, "misses": 1, "evictions": 0})
+    assert FEATURE_CACHE_LOOKUPS.value("hit") - hits == 3
+    assert FEATURE_CACHE_LOOKUPS.value("miss") - misses == 2
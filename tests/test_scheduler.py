@@ -0,0 +1,278 @@
+"""Tests for cost-based admission and scheduling."""
+
+import json
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.executors import ConcurrencyLimiter, inference_executor
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.scheduler import (
+    DesignScheduler,
+    DesignTooSlowError,
+    SchedulerBusyError,
+    design_work,
+)
+from app.validation import PDBValidationError
+
+client = TestClient(app)
+
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+
+
+class _Occupied:
+    """Holds scheduler slots with calls that block until released."""
+
+    def __init__(self, scheduler: DesignScheduler):
+        self.scheduler = scheduler
+        self.executor = ThreadPoolExecutor(max_workers=8)
+        self.gate = threading.Event()
+        self.order: list[str] = []
+
+    def hold(self, client="holder", work=1.0):
+        future = self.executor.submit(
+            self.scheduler.run, client, work, lambda: self.gate.wait(10), learn=False
+        )
+        _until(lambda: self.scheduler.running and not self.scheduler.queued)
+        return future
+
+    def submit(self, name: str, client: str, work: float):
+        future = self.executor.submit(
+            self.scheduler.run, client, work, lambda: self.order.append(name)
+        )
+        return future
+
+
+def _until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def _scheduler(**kwargs) -> DesignScheduler:
+    """A calibrated scheduler with no fixed overhead."""
+    return DesignScheduler(**{"overhead_seconds": 0, "min_observations": 0, **kwargs})
+
+
+def test_work_counts_sampling_passes():
+    # Small structures decode all their samples in one pass
+    assert design_work(76, 1) == design_work(76, 8) == 76
+    # Large ones need a pass per sample batch
+    assert design_work(3000, 10) == 3000 * 10
+
+
+def test_requests_in_flight_exceed_slots():
+    # Otherwise the limiter turns designs away before the scheduler can order them
+    slots = DesignScheduler().slots
+    assert ConcurrencyLimiter().limit > slots
+    assert inference_executor._max_workers > slots
+
+
+def test_too_slow_rejected_before_queueing():
+    scheduler = _scheduler(residues_per_second=100)
+    assert scheduler.admit(1000, limit=20) == 10.0
+    with pytest.raises(DesignTooSlowError, match="30s exceeds the 20s limit; use /jobs"):
+        scheduler.admit(3000, limit=20, hint="use /jobs")
+    assert issubclass(DesignTooSlowError, PDBValidationError)
+
+
+def test_too_slow_deferred_until_calibrated():
+    scheduler = DesignScheduler(
+        residues_per_second=100, overhead_seconds=0, min_observations=2
+    )
+    with pytest.raises(SchedulerBusyError, match="not calibrated yet") as e:
+        scheduler.admit(3000, limit=20)
+    assert e.value.retry_after > 0
+    scheduler.observe(1000, 10)
+    scheduler.observe(1000, 10)
+    assert scheduler.calibrated
+    with pytest.raises(DesignTooSlowError):
+        scheduler.admit(3000, limit=20)
+
+
+def test_busy_when_queue_would_miss_deadline():
+    scheduler = _scheduler(slots=1, residues_per_second=100)
+    occupied = _Occupied(scheduler)
+    occupied.hold(work=1000)  # predicted 10s
+    with pytest.raises(SchedulerBusyError) as e:
+        scheduler.admit(100, limit=20, remaining=5)
+    assert 9 < e.value.retry_after <= 10
+    assert scheduler.admit(100, limit=20, remaining=15) == 1.0
+    occupied.gate.set()
+
+
+def test_shortest_job_first():
+    scheduler = DesignScheduler(slots=1, residues_per_second=1000)
+    occupied = _Occupied(scheduler)
+    held = occupied.hold()
+    futures = [occupied.submit("long", "a", 900)]
+    _until(lambda: scheduler.queued == 1)
+    futures.append(occupied.submit("short", "b", 10))
+    _until(lambda: scheduler.queued == 2)
+    occupied.gate.set()
+    for future in [held, *futures]:
+        future.result(timeout=5)
+    assert occupied.order == ["short", "long"]
+
+
+def test_waiting_time_prevents_starvation():
+    scheduler = DesignScheduler(slots=1, residues_per_second=1000)
+    occupied = _Occupied(scheduler)
+    held = occupied.hold()
+    futures = [occupied.submit("long", "a", 300)]
+    time.sleep(0.5)  # the long design has now waited longer than it takes
+    futures.append(occupied.submit("short", "b", 100))
+    _until(lambda: scheduler.queued == 2)
+    occupied.gate.set()
+    for future in [held, *futures]:
+        future.result(timeout=5)
+    assert occupied.order == ["long", "short"]
+
+
+def test_per_client_limit():
+    scheduler = DesignScheduler(slots=2, client_limit=1)
+    occupied = _Occupied(scheduler)
+    held = occupied.hold(client="a")
+    second = occupied.submit("a2", "a", 1)
+    other = occupied.submit("b1", "b", 1)
+    other.result(timeout=2)
+    assert occupied.order == ["b1"]
+    assert scheduler.queued == 1
+    occupied.gate.set()
+    held.result(timeout=2)
+    second.result(timeout=2)
+    assert occupied.order == ["b1", "a2"]
+
+
+def test_queued_design_times_out_or_cancels():
+    scheduler = DesignScheduler(slots=1)
+    occupied = _Occupied(scheduler)
+    occupied.hold()
+    with pytest.raises(TimeoutError):
+        scheduler.run("x", 1, lambda: None, timeout=0.05)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(CancelledError):
+        scheduler.run("x", 1, lambda: None, cancel_event=cancel)
+    assert scheduler.queued == 0
+    occupied.gate.set()
+
+
+def test_overhead_and_rate_fit_from_finished_designs():
+    scheduler = DesignScheduler(residues_per_second=1000, overhead_seconds=5)
+    # 1s overhead, 500 positions/s
+    scheduler.observe(1000, 3.0)
+    scheduler.observe(3000, 7.0)
+    assert scheduler.overhead_seconds == pytest.approx(1.0)
+    assert scheduler.residues_per_second == pytest.approx(500)
+    assert scheduler.predict(2000) == pytest.approx(5.0)
+
+
+def test_finished_designs_refit_the_estimate():
+    scheduler = DesignScheduler(residues_per_second=1000, overhead_seconds=0)
+    scheduler.run("x", 100, lambda: time.sleep(0.2))  # about 500 positions/s
+    assert scheduler.observations == 1
+    assert scheduler.residues_per_second < 1000
+    scheduler.run("x", 100, lambda: None, learn=False)
+    assert scheduler.observations == 1
+    with pytest.raises(RuntimeError):
+        scheduler.run("x", 100, lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert scheduler.observations == 1
+    assert scheduler.running == 0
+
+
+@pytest.mark.usefixtures("empty_cache")
+class TestEndpoints:
+    def _post(self, path="/design", num_sequences=5, headers=None):
+        with open(UBQ_PATH, "rb") as f:
+            return client.post(
+                path,
+                files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+                data={"chains": json.dumps(["A"]), "num_sequences": str(num_sequences)},
+                headers=headers,
+            )
+
+    @patch("app.main.design_sequences")
+    def test_too_slow_design_is_400(self, mock_design):
+        with patch("app.main.scheduler", _scheduler(residues_per_second=0.1)):
+            resp = self._post()
+        assert resp.status_code == 400
+        assert "use POST /jobs" in resp.json()["detail"]
+        mock_design.assert_not_called()
+
+    @patch("app.main.design_sequences")
+    def test_too_slow_job_is_400(self, mock_design):
+        with patch("app.main.scheduler", _scheduler(residues_per_second=0.01)):
+            resp = self._post("/jobs")
+        assert resp.status_code == 400
+        assert "fewer sequences" in resp.json()["detail"]
+
+    @patch("app.main.design_sequences")
+    def test_too_slow_job_before_calibration_is_429(self, mock_design):
+        scheduler = DesignScheduler(residues_per_second=0.01, min_observations=1)
+        with patch("app.main.scheduler", scheduler):
+            resp = self._post("/jobs")
+        assert resp.status_code == 429
+        assert "not calibrated yet" in resp.json()["detail"]
+        assert "Retry-After" in resp.headers
+        mock_design.assert_not_called()
+
+    @patch("app.main.design_sequences")
+    def test_too_slow_before_calibration_is_429(self, mock_design):
+        scheduler = DesignScheduler(residues_per_second=0.1, min_observations=1)
+        with patch("app.main.scheduler", scheduler):
+            resp = self._post()
+        assert resp.status_code == 429
+        assert "Retry-After" in resp.headers
+        mock_design.assert_not_called()
+
+    def test_busy_queue_is_429_with_predicted_wait(self):
+        scheduler = _scheduler(slots=1, residues_per_second=10)
+        occupied = _Occupied(scheduler)
+        occupied.hold(work=1500)  # 150s left, past the 120s request timeout
+        with patch("app.main.scheduler", scheduler):
+            resp = self._post("/design/stream", num_sequences=1)
+        occupied.gate.set()
+        assert resp.status_code == 429
+        assert 140 <= int(resp.headers["Retry-After"]) <= 150
+
+    @patch("app.main.design_sequences")
+    def test_client_header_counts_per_client(self, mock_design):
+        seen = []
+        mock_design.side_effect = lambda **kw: seen.append(kw) or ParsedFasta("N", ["A"])
+        scheduler = DesignScheduler()
+        with (
+            patch("app.main.scheduler", scheduler),
+            patch.object(scheduler, "run", wraps=scheduler.run) as run,
+        ):
+            assert self._post(headers={"X-Client-ID": "lab-7"}).status_code == 200
+        # 76 positions, all five samples in one pass
+        assert run.call_args.args[:2] == ("lab-7", 76)
+        assert seen[0]["timeout"] > 0
+
+    @patch("app.main.design_batch")
+    def test_batch_takes_a_slot(self, mock_batch):
+        mock_batch.side_effect = lambda items, **kw: [ParsedFasta("N", ["A"]) for _ in items]
+        scheduler = DesignScheduler()
+        with (
+            patch("app.main.scheduler", scheduler),
+            patch.object(scheduler, "run", wraps=scheduler.run) as run,
+            open(UBQ_PATH, "rb") as f,
+        ):
+            resp = client.post(
+                "/design/batch",
+                files=[("pdb_files", ("a.pdb", f.read(), "chemical/x-pdb"))] * 2,
+                data={"chains": json.dumps(["A"]), "num_sequences": "1"},
+                headers={"X-Client-ID": "lab-7"},
+            )
+        assert resp.status_code == 200
+        assert run.call_args.args[:2] == ("lab-7", 2 * 76)
+        assert run.call_args.kwargs["learn"] is False
+        assert scheduler.observations == 0
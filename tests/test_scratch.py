@@ -0,0 +1,103 @@
+"""Tests for scratch files and the in-memory path to the subprocess."""
+
+import os
+import subprocess
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.config import SCRATCH_MAX_AGE_SECONDS, TEST_PDBS_DIR
+from app.proteinmpnn.parser import ParsedFasta
+from app.proteinmpnn.wrapper import design_sequences
+from app.scratch import scratch_prefix, sweep_scratch, temp_path
+from app.validation import validate_pdb
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen(["true"])
+    proc.wait()
+    return proc.pid
+
+
+def test_sweep_removes_only_dead_processes_entries(tmp_path):
+    dead = _dead_pid()
+    (tmp_path / f"mpnn_{dead}_abc").mkdir()
+    (tmp_path / f"mpnn_{dead}_abc" / "seqs").mkdir()
+    (tmp_path / f"mpnn_{dead}_def.pdb").write_text("ATOM")
+    mine = temp_path(".pdb", tmp_path)
+    mine.write_text("ATOM")
+    (tmp_path / "mpnn_legacy.pdb").write_text("ATOM")
+    (tmp_path / "other").mkdir()
+
+    assert sweep_scratch([tmp_path]) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted(
+        [mine.name, "mpnn_legacy.pdb", "other"]
+    )
+
+
+def test_sweep_removes_entries_of_an_earlier_process_with_our_pid(tmp_path):
+    # A restarted container's server often gets its predecessor's PID
+    (tmp_path / f"mpnn_{os.getpid()}-0badc0de_abc.pdb").write_text("ATOM")
+    (tmp_path / f"mpnn_{os.getpid()}_def.pdb").write_text("ATOM")
+    mine = temp_path(".pdb", tmp_path)
+    mine.write_text("ATOM")
+
+    assert sweep_scratch([tmp_path]) == 2
+    assert [p.name for p in tmp_path.iterdir()] == [mine.name]
+
+
+def test_sweep_removes_old_entries_of_live_pids(tmp_path):
+    # PID 1 is always alive, but an entry this old can't be its own
+    old = tmp_path / "mpnn_1-0badc0de_abc.pdb"
+    old.write_text("ATOM")
+    recent = tmp_path / "mpnn_1-0badc0de_def.pdb"
+    recent.write_text("ATOM")
+    stamp = time.time() - SCRATCH_MAX_AGE_SECONDS - 60
+    os.utime(old, (stamp, stamp))
+
+    assert sweep_scratch([tmp_path]) == 1
+    assert [p.name for p in tmp_path.iterdir()] == [recent.name]
+
+
+def test_subprocess_gets_in_memory_structure(tmp_path):
+    backbone = validate_pdb(TEST_PDBS_DIR / "1UBQ.pdb", ["A"])
+    seen = {}
+
+    def run(cmd, timeout, cancel_event=None):
+        pdb_input = cmd[cmd.index("--pdb_path") + 1]
+        seen["dir"] = os.path.dirname(pdb_input)
+        seen["pdb"] = open(pdb_input).read()
+        return ""
+
+    with (
+        patch("app.scratch.SCRATCH_DIR", tmp_path),
+        patch("app.proteinmpnn.wrapper._check_mpnn_script"),
+        patch("app.proteinmpnn.wrapper._run_script", side_effect=run),
+        patch("app.proteinmpnn.wrapper._read_fasta", return_value=ParsedFasta("M", ["A"])),
+    ):
+        design_sequences(None, ["A"], 1, backbone=backbone)
+
+    assert os.path.basename(seen["dir"]).startswith(scratch_prefix())
+    assert seen["pdb"].startswith("ATOM")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_killed_subprocess_leaves_no_scratch(tmp_path):
+    backbone = validate_pdb(TEST_PDBS_DIR / "1UBQ.pdb", ["A"])
+    with (
+        patch("app.scratch.SCRATCH_DIR", tmp_path),
+        patch("app.proteinmpnn.wrapper._check_mpnn_script"),
+        patch(
+            "app.proteinmpnn.wrapper._run_script",
+            side_effect=subprocess.TimeoutExpired("mpnn", 1),
+        ),
+        pytest.raises(subprocess.TimeoutExpired),
+    ):
+        design_sequences(None, ["A"], 1, backbone=backbone)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_needs_path_or_backbone():
+    with pytest.raises(ValueError, match="pdb_path or backbone"):
+        design_sequences(None, ["A"], 1)
@@ -0,0 +1,123 @@
+"""Tests for POST /design/stream (NDJSON and Server-Sent Events)."""
+
+import json
+import subprocess
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.executors import ConcurrencyLimiter
+from app.main import app
+from app.proteinmpnn.parser import DesignedSample, ParsedFasta, parse_fasta
+
+client = TestClient(app)
+
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+
+
+def _fake_design(**kwargs):
+    samples = [
+        DesignedSample(i, "A" * (i + 1), score=1.5, seq_recovery=0.25, global_score=1.25)
+        for i in range(kwargs["num_sequences"])
+    ]
+    for sample in samples:
+        kwargs["on_sample"](sample)
+    return ParsedFasta("NATIVE", [s.sequence for s in samples])
+
+
+def _post_stream(chains=None, num_sequences=2, headers=None):
+    with open(UBQ_PATH, "rb") as f:
+        return client.post(
+            "/design/stream",
+            files={"pdb_file": ("test.pdb", f, "chemical/x-pdb")},
+            data={
+                "chains": json.dumps(chains or ["A"]),
+                "num_sequences": str(num_sequences),
+            },
+            headers=headers,
+        )
+
+
+def _ndjson(resp) -> list[dict]:
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+@patch("app.main.design_sequences", side_effect=_fake_design)
+def test_ndjson_event_order(mock_design):
+    resp = _post_stream(num_sequences=2)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    events = _ndjson(resp)
+    assert [e["event"] for e in events] == ["native", "sequence", "sequence", "done"]
+
+    native = events[0]
+    assert native["metadata"]["num_residues"] == 76
+    assert native["native_sequence"].startswith("MQIFVKTL")
+    assert events[1] == {
+        "event": "sequence", "index": 0, "sequence": "A",
+        "score": 1.5, "seq_recovery": 0.25, "global_score": 1.25,
+    }
+    done = events[-1]
+    assert done["num_sequences"] == 2
+    assert 0 <= done["time_to_first_sequence"] <= done["elapsed"]
+    assert mock_design.call_args.kwargs["backbone"].num_residues(["A"]) == 76
+
+
+@patch("app.main.design_sequences", side_effect=_fake_design)
+def test_sse_framing(_mock_design):
+    resp = _post_stream(num_sequences=1, headers={"Accept": "text/event-stream"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in resp.text.split("\n\n") if f]
+    assert [f.splitlines()[0] for f in frames] == [
+        "event: native", "event: sequence", "event: done",
+    ]
+    data = json.loads(frames[1].splitlines()[1].removeprefix("data: "))
+    assert data["sequence"] == "A"
+
+
+@patch("app.main.design_sequences", side_effect=subprocess.TimeoutExpired("mpnn", 1))
+def test_error_event_after_native(_mock_design):
+    events = _ndjson(_post_stream())
+    assert [e["event"] for e in events] == ["native", "error"]
+    assert events[1]["status_code"] == 504
+
+
+def test_invalid_chain_is_plain_400():
+    resp = _post_stream(chains=["Z"])
+    assert resp.status_code == 400
+    assert "not found" in resp.json()["detail"]
+
+
+@patch("app.main.design_limiter", ConcurrencyLimiter(limit=0))
+def test_busy_429():
+    resp = _post_stream()
+    assert resp.status_code == 429
+    assert "Retry-After" in resp.headers
+
+
+@patch("app.main.design_sequences", side_effect=_fake_design)
+def test_limiter_released_after_stream(_mock_design):
+    with patch("app.main.design_limiter", ConcurrencyLimiter(limit=1)) as limiter:
+        for _ in range(2):
+            assert _post_stream().status_code == 200
+        assert limiter.active == 0
+
+
+@pytest.mark.parametrize("with_scores", [True, False])
+def test_parse_fasta_header_scores(tmp_path, with_scores):
+    header = ", score=0.9123, global_score=0.9000, seq_recovery=0.4200" if with_scores else ""
+    path = tmp_path / "x.fa"
+    path.write_text(
+        ">x, score=1.2, global_score=1.1, fixed_chains=[]\nMKV\n"
+        f">T=0.1, sample=1{header}\nMRV\n"
+    )
+    parsed = parse_fasta(path)
+    assert parsed.designed_sequences == ["MRV"]
+    sample = parsed.samples()[0]
+    assert sample.sequence == "MRV"
+    assert sample.score == (0.9123 if with_scores else None)
+    assert sample.seq_recovery == (0.42 if with_scores else None)
+    assert sample.global_score == (0.9 if with_scores else None)
@@ -0,0 +1,171 @@
+"""Tests for the registered structure store and designs by structure ID."""
+
+import json
+import pickle
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.cache import structure_digest
+from app.config import TEST_PDBS_DIR
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.structure import StructureNotFoundError, StructureStore
+from app.validation import validate_pdb
+
+client = TestClient(app)
+
+HBA_PATH = TEST_PDBS_DIR / "1A3N.pdb"
+UBQ_PATH = TEST_PDBS_DIR / "1UBQ.pdb"
+
+
+def _put(store: StructureStore, path=HBA_PATH):
+    backbone = validate_pdb(path, [])
+    data = path.read_bytes()
+    return backbone, store.put(backbone, structure_digest(data), "pdb", len(data))
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = StructureStore(tmp_path / "structures")
+    monkeypatch.setattr(main, "structure_store", store)
+    return store
+
+
+def test_round_trip_maps_without_copying(store):
+    backbone, info = _put(store)
+    assert info.chains["A"]["ca_atoms"] == backbone.chains["A"].num_ca
+
+    loaded = store.get(info.structure_id)
+    assert loaded.digest() == backbone.digest()
+    assert loaded.chain_ids == backbone.chain_ids
+    for chain_id, chain in backbone.chains.items():
+        mapped = loaded.chains[chain_id]
+        assert mapped.sequence == chain.sequence
+        np.testing.assert_array_equal(mapped.coords, chain.coords)
+        np.testing.assert_array_equal(mapped.residue_numbers, chain.residue_numbers)
+        np.testing.assert_array_equal(mapped.standard, chain.standard)
+        # Views into the read-only mapping
+        assert not mapped.coords.flags.owndata
+        assert not mapped.coords.flags.writeable
+
+
+def test_mapped_backbone_pickles(store):
+    backbone, info = _put(store)
+    # Designs on the worker pool send the backbone to another process
+    copy = pickle.loads(pickle.dumps(store.get(info.structure_id)))
+    assert copy.digest() == backbone.digest()
+
+
+def test_reopened_store_indexes_existing_files(store):
+    _, info = _put(store)
+    (store.directory / "junk.mpnnbb").write_bytes(b"not a structure")
+
+    reopened = StructureStore(store.directory)
+    assert [s.structure_id for s in reopened.structures()] == [info.structure_id]
+    assert reopened.info(info.structure_id) == info
+    # Same coordinates, same entry
+    assert _put(reopened)[1] == info
+
+
+def test_hot_set_is_bounded(tmp_path):
+    sizes = []
+    for path in (HBA_PATH, UBQ_PATH):
+        _, info = _put(StructureStore(tmp_path / path.stem), path)
+        sizes.append((tmp_path / path.stem / f"{info.structure_id}.mpnnbb").stat().st_size)
+    # Room for the larger one, but not both
+    hot_mb = max(sizes) / (1024 * 1024)
+    store = StructureStore(tmp_path / "both", hot_mb=hot_mb)
+    ids = [_put(store, path)[1].structure_id for path in (HBA_PATH, UBQ_PATH)]
+    for structure_id in ids:
+        store.get(structure_id)
+    first = store.get(ids[0])
+    assert store.get(ids[0]) is first
+    stats = store.stats()
+    assert stats["structures"] == 2
+    assert stats["hot_entries"] == 1
+    assert stats["hot_bytes"] == max(sizes)
+
+
+def test_delete(store):
+    _, info = _put(store)
+    store.get(info.structure_id)
+    store.delete(info.structure_id)
+    with pytest.raises(StructureNotFoundError):
+        store.get(info.structure_id)
+    with pytest.raises(StructureNotFoundError):
+        store.delete(info.structure_id)
+    assert not list(store.directory.iterdir())
+
+
+def _register(path=UBQ_PATH):
+    with open(path, "rb") as f:
+        return client.post(
+            "/structures", files={"pdb_file": (path.name, f, "chemical/x-pdb")}
+        )
+
+
+def test_register_endpoints(store):
+    resp = _register()
+    assert resp.status_code == 201
+    info = resp.json()
+    assert info["name"] == "1UBQ"
+    assert info["chains"]["A"]["standard_residues"] == 76
+    assert "digest" not in info
+    # Registering again returns the same entry
+    assert _register().json() == info
+
+    structure_id = info["structure_id"]
+    assert client.get(f"/structures/{structure_id}").json() == info
+    assert client.get("/structures").json() == [info]
+    assert client.delete(f"/structures/{structure_id}").status_code == 200
+    assert client.get(f"/structures/{structure_id}").status_code == 404
+
+
+def test_register_rejects_invalid(store):
+    resp = client.post(
+        "/structures", files={"pdb_file": ("empty.pdb", b"HEADER\n", "chemical/x-pdb")}
+    )
+    assert resp.status_code == 400
+    assert len(store) == 0
+
+
+@patch("app.main.design_sequences")
+def test_design_by_structure_id(mock_design, store, empty_cache):
+    mock_design.return_value = ParsedFasta("NATIVE", ["NATIVA"], scores=[0.5])
+    structure_id = _register().json()["structure_id"]
+
+    def post(**fields):
+        return client.post(
+            "/design",
+            data={"chains": json.dumps(["A"]), "num_sequences": "1", **fields},
+        )
+
+    resp = post(structure_id=structure_id)
+    assert resp.status_code == 200
+    assert resp.json()["metadata"]["num_residues"] == 76
+    kwargs = mock_design.call_args.kwargs
+    assert kwargs["pdb_path"] is None
+    assert kwargs["backbone"].name == "1UBQ"
+
+    # Shares the result cache with uploads of the same file
+    with open(UBQ_PATH, "rb") as f:
+        uploaded = client.post(
+            "/design",
+            files={"pdb_file": ("1UBQ.pdb", f, "chemical/x-pdb")},
+            data={"chains": json.dumps(["A"]), "num_sequences": "1"},
+        )
+    assert uploaded.json() == resp.json()
+    assert mock_design.call_count == 1
+
+    assert post(structure_id="0" * 16).status_code == 404
+    assert post().status_code == 400
+    missing_chain = client.post(
+        "/design",
+        data={"chains": json.dumps(["B"]), "structure_id": structure_id},
+    )
+    assert missing_chain.status_code == 400
+    assert "not found" in missing_chain.json()["detail"]
@@ -0,0 +1,88 @@
+"""Tests for the CPU inference profile (torch-free parts)."""
+
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from app.config import TEST_PDBS_DIR
+from app.proteinmpnn import tuning
+from app.proteinmpnn.parser import ParsedFasta
+from app.proteinmpnn.tuning import (
+    CpuProfile,
+    sample_batch_size,
+    thread_env,
+    threads_per_process,
+)
+from app.proteinmpnn.wrapper import _run_script, design_sequences
+
+
+def test_default_profile_is_fp32():
+    profile = CpuProfile()
+    assert profile.precision == "fp32"
+    assert profile.compile == "none"
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"precision": "fp16"}, {"compile": "jit"}, {"interop_threads": 0}]
+)
+def test_invalid_profile_rejected(kwargs):
+    with pytest.raises(ValueError):
+        CpuProfile(**kwargs)
+
+
+def test_threads_split_between_processes():
+    with patch.object(tuning, "CPU_COUNT", 8):
+        assert threads_per_process(4, threads=0) == 2
+        assert threads_per_process(16, threads=0) == 1
+        assert threads_per_process(4, threads=3) == 3
+
+
+def test_thread_env_caps_native_pools():
+    env = thread_env(2)
+    assert env["OMP_NUM_THREADS"] == env["MKL_NUM_THREADS"] == "2"
+    assert "PATH" in env
+
+
+def test_subprocess_gets_thread_limit():
+    with patch("app.proteinmpnn.wrapper.subprocess.Popen") as popen:
+        popen.return_value.communicate.return_value = ("out", "")
+        popen.return_value.returncode = 0
+        assert _run_script(["true"], timeout=5, threads=3) == "out"
+    assert popen.call_args.kwargs["env"]["OMP_NUM_THREADS"] == "3"
+    assert popen.call_args.kwargs["stdout"] is subprocess.PIPE
+
+
+@pytest.mark.parametrize("residues,num_sequences,expected", [
+    (76, 5, 5),        # all samples in one pass
+    (76, 100, 25),     # 4 even passes rather than 32+32+32+4
+    (76, 500, 32),     # capped at MAX_SAMPLE_BATCH
+    (1000, 100, 3),    # limited by the memory budget
+    (50000, 10, 1),    # larger than the budget: one sample at a time
+])
+def test_sample_batch_size(residues, num_sequences, expected):
+    assert sample_batch_size(residues, num_sequences, memory_mb=1024) == expected
+
+
+def test_parsed_fasta_head():
+    parsed = ParsedFasta("MKV", ["A", "B", "C"], [1.0, 2.0, 3.0], [0.1, 0.2, 0.3])
+    head = parsed.head(2)
+    assert head.designed_sequences == ["A", "B"]
+    assert head.scores == [1.0, 2.0]
+    assert head.seq_recoveries == [0.1, 0.2]
+    assert ParsedFasta("MKV", ["A", "B"]).head(1).scores is None
+
+
+def test_subprocess_samples_in_whole_batches():
+    fasta = ParsedFasta("MKV", [f"S{i}" for i in range(100)])
+    with (
+        patch("app.proteinmpnn.wrapper._check_mpnn_script"),
+        patch("app.proteinmpnn.wrapper._run_script", return_value="") as run,
+        patch("app.proteinmpnn.wrapper._read_fasta", return_value=fasta),
+        patch("app.proteinmpnn.wrapper.sample_batch_size", return_value=32),
+    ):
+        result = design_sequences(str(TEST_PDBS_DIR / "1UBQ.pdb"), ["A"], 70)
+    cmd = run.call_args.args[0]
+    assert cmd[cmd.index("--batch_size") + 1] == "32"
+    assert cmd[cmd.index("--num_seq_per_target") + 1] == "96"
+    assert len(result.designed_sequences) == 70
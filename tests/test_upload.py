@@ -0,0 +1,119 @@
+"""Tests for streamed upload handling."""
+
+import asyncio
+import gzip
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from app.config import TEST_PDBS_DIR
+from app.dependencies import UploadTooLargeError, save_upload
+from app.main import app
+from app.proteinmpnn.parser import ParsedFasta
+from app.validation import PDBValidationError
+
+client = TestClient(app)
+
+UBQ_BYTES = (TEST_PDBS_DIR / "1UBQ.pdb").read_bytes()
+
+
+def _save(data: bytes, filename: str = "x.pdb", **kwargs):
+    upload = UploadFile(io.BytesIO(data), filename=filename)
+    return asyncio.run(save_upload(upload, **kwargs))
+
+
+def test_held_in_memory():
+    upload = _save(UBQ_BYTES, require_atom_records=True)
+    assert upload.path is None
+    assert upload.read_bytes() == UBQ_BYTES
+    assert upload.name == "x.pdb"
+
+
+def test_large_upload_spills_to_disk():
+    with patch("app.dependencies.UPLOAD_CHUNK_BYTES", 1024):
+        upload = _save(UBQ_BYTES, spill_mb=0.01)
+    try:
+        assert upload.path.suffix == ".pdb"
+        assert upload.read_bytes() == UBQ_BYTES
+    finally:
+        upload.close()
+    assert not upload.path.exists()
+
+
+def test_gzip_decompressed_transparently():
+    upload = _save(gzip.compress(UBQ_BYTES), filename="1ubq.pdb.gz")
+    assert upload.read_bytes() == UBQ_BYTES
+    assert upload.name == "1ubq.pdb"
+
+
+def test_size_limit_enforced_while_streaming():
+    with patch("app.dependencies.UPLOAD_CHUNK_BYTES", 1024):
+        with pytest.raises(UploadTooLargeError, match="exceeds"):
+            _save(UBQ_BYTES, max_size_mb=0.01)
+
+
+def test_gzip_limit_applies_to_decompressed_size():
+    bomb = gzip.compress(b"ATOM  " + b" " * (2 * 1024 * 1024))
+    assert len(bomb) < 10 * 1024
+    with pytest.raises(UploadTooLargeError):
+        _save(bomb, filename="bomb.pdb.gz", max_size_mb=1)
+
+
+def test_atom_record_split_across_chunks():
+    data = b"REMARK" + b" " * 1017 + b"\nATOM  " + UBQ_BYTES[UBQ_BYTES.index(b"ATOM  ") + 6:]
+    with patch("app.dependencies.UPLOAD_CHUNK_BYTES", 1026):
+        assert _save(data, require_atom_records=True).read_bytes() == data
+
+
+def test_no_atom_records_rejected():
+    with pytest.raises(PDBValidationError, match="no ATOM records"):
+        _save(b"HEADER\nEND\n", require_atom_records=True)
+
+
+def test_corrupt_gzip_rejected():
+    with pytest.raises(PDBValidationError, match="gzip"):
+        _save(gzip.compress(UBQ_BYTES)[:200], filename="x.pdb.gz")
+
+
+@pytest.mark.usefixtures("empty_cache")
+class TestDesignUploads:
+    def _post(self, data: bytes, filename: str = "test.pdb"):
+        return client.post(
+            "/design",
+            files={"pdb_file": (filename, data, "chemical/x-pdb")},
+            data={"chains": json.dumps(["A"]), "num_sequences": "2"},
+        )
+
+    @patch("app.main.design_sequences")
+    def test_design_passes_no_path(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+        assert self._post(UBQ_BYTES).status_code == 200
+        assert mock_design.call_args.kwargs["pdb_path"] is None
+        assert mock_design.call_args.kwargs["backbone"].num_residues(["A"]) == 76
+
+    @patch("app.main.design_sequences")
+    def test_gzip_design(self, mock_design):
+        mock_design.return_value = ParsedFasta("NATIVE", ["AAAA", "CCCC"])
+        resp = self._post(gzip.compress(UBQ_BYTES), filename="1ubq.pdb.gz")
+        assert resp.status_code == 200
+        assert resp.json()["metadata"]["num_residues"] == 76
+
+    def test_oversized_upload_413(self):
+        resp = self._post(UBQ_BYTES + b"REMARK\n" * (2 * 1024 * 1024))
+        assert resp.status_code == 413
+        assert "exceeds" in resp.json()["detail"]
+
+    def test_oversized_gzip_upload_413(self):
+        resp = self._post(
+            gzip.compress(b"ATOM  " + b" " * (11 * 1024 * 1024)), filename="big.pdb.gz"
+        )
+        assert resp.status_code == 413
+
+    def test_no_atom_records_400(self):
+        resp = self._post(b"HEADER\n")
+        assert resp.status_code == 400
+        assert "no ATOM records" in resp.json()["detail"]